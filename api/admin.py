@@ -33,4 +33,14 @@ class MembershipAdmin(admin.ModelAdmin):
     pass
 
 
+@admin.register(Token)
+class TokenAdmin(admin.ModelAdmin):
+    pass
+
+
+@admin.register(PresentationUpload)
+class PresentationUploadAdmin(admin.ModelAdmin):
+    pass
+
+
 admin.site.register(User, UserAdmin)
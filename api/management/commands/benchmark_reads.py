@@ -0,0 +1,83 @@
+"""
+Load benchmark of the async read path
+
+Requests are sent right to ASGI application by many concurrent clients in one event loop, first with
+sync views only, then with async read path (API_ASYNC_READS). Network and server are left out, so numbers
+show the cost of request handling itself. To measure the whole stack, serve 'courses.asgi:application'
+with uvicorn (API_ASYNC_READS = True) and load it with HTTP benchmark tool, e.g. wrk.
+"""
+import asyncio
+import time
+from types import ModuleType
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.urls import include, path
+from api import models
+from api.urls import router
+from api.utils.async_views import async_read_urls
+from api.utils.authentication import issue_token, revoke_token
+
+
+class Command(BaseCommand):
+    help = 'Compare requests/sec of sync and async read paths under ASGI with many concurrent connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='User on whose behalf requests are sent')
+        parser.add_argument('--url', default='/api/courses', help='Url to request, cached listings by default')
+        parser.add_argument('--requests', type=int, default=2000, help='Number of requests for each path')
+        parser.add_argument('--concurrency', type=int, default=100, help='Number of concurrent clients')
+
+    def handle(self, *args, **options):
+        try:
+            user = models.User.objects.get(username=options['username'])
+        except models.User.DoesNotExist:
+            raise CommandError(f'User {options["username"]} does not exist')
+        token = issue_token(user).key
+        try:
+            for name, urls in (('sync', router.urls), ('async', async_read_urls(router.urls))):
+                urlconf = ModuleType(f'{name}_urls')
+                urlconf.urlpatterns = [path('api/', include(urls))]
+                with override_settings(ROOT_URLCONF=urlconf, ALLOWED_HOSTS=['*']):
+                    elapsed = asyncio.run(self.load(ASGIHandler(), token, **options))
+                self.stdout.write(f'{name}: {options["requests"] / elapsed:.0f} requests/sec')
+        finally:
+            revoke_token(token)
+
+    async def load(self, application, token, url, requests, concurrency, **options):
+        """
+        Seconds which concurrent clients spend to send all requests. Cache is warmed up beforehand
+        """
+        path, _, query = url.partition('?')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+            'headers': [(b'host', b'localhost'), (b'authorization', f'Token {token}'.encode())],
+            'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+        }
+        status = await self.request(application, scope)
+        if status != 200:
+            raise CommandError(f'{url} responded with {status}')
+
+        async def client(count):
+            for _ in range(count):
+                await self.request(application, scope)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client(requests // concurrency + (i < requests % concurrency))
+                               for i in range(concurrency)))
+        return time.perf_counter() - started
+
+    @staticmethod
+    async def request(application, scope) -> int:
+        response = {}
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+
+        await application(scope, receive, send)
+        return response['status']
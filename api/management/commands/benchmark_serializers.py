@@ -0,0 +1,57 @@
+"""
+Microbenchmark of listing serialization
+
+Rows of every model are serialized by its ModelSerializer (from model instances) and by compiled fast serializer
+(from '.values()' rows), query included, as list endpoints do. Outputs are rendered and compared, so the command
+fails if fast serializer doesn't produce byte-identical listing.
+"""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from api import models, serializers
+from api.utils.fast_serializers import compile_serializer
+
+SERIALIZERS = {
+    'courses': (models.Course, serializers.CourseSerializer),
+    'lectures': (models.Lecture, serializers.LectureSerializer),
+    'hometasks': (models.Hometask, serializers.HometaskSerializer),
+    'finished_tasks': (models.FinishedTask, serializers.FinishedTaskSerializer),
+    'comments': (models.Comment, serializers.CommentSerializer),
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare serialization time of ModelSerializers and fast serializers over rows in database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Maximum number of rows of each model')
+        parser.add_argument('--repeat', type=int, default=5, help='Number of runs, the best one is reported')
+
+    def handle(self, *args, rows, repeat, **options):
+        for name, (model, serializer_class) in SERIALIZERS.items():
+            queryset = model.objects.order_by('pk')[:rows]
+            fast_serializer = compile_serializer(serializer_class)
+            if fast_serializer is None:
+                raise CommandError(f'{serializer_class.__name__} can not be compiled')
+            slow_seconds, slow_data = self.measure(
+                lambda: serializer_class(list(queryset), many=True).data, repeat)
+            fast_seconds, fast_data = self.measure(
+                lambda: fast_serializer.serialize(list(queryset.values(*fast_serializer.columns)), {}), repeat)
+            if JSONRenderer().render(slow_data) != JSONRenderer().render(fast_data):
+                raise CommandError(f'Listings of {name} differ')
+            count = len(fast_data)
+            speedup = slow_seconds / fast_seconds if fast_seconds else float('inf')
+            self.stdout.write(f'{name}: {count} rows, serializer {slow_seconds * 1000:.1f} ms, '
+                              f'fast {fast_seconds * 1000:.1f} ms, x{speedup:.1f}')
+
+    @staticmethod
+    def measure(serialize, repeat):
+        """
+        Best time of serialization and its result
+        """
+        best, data = float('inf'), None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            data = serialize()
+            best = min(best, time.perf_counter() - started)
+        return best, data
@@ -0,0 +1,14 @@
+"""
+Discard presentation uploads which have got no chunks for PRESENTATION_UPLOAD_EXPIRY seconds (see 'utils.uploads')
+
+Expired uploads are purged whenever upload is started as well, the command frees disk space of idle servers.
+"""
+from django.core.management.base import BaseCommand
+from api.utils import uploads
+
+
+class Command(BaseCommand):
+    help = 'Discard expired presentation uploads along with their temporary files'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Discarded: {uploads.purge_expired()}')
@@ -0,0 +1,19 @@
+"""
+Rebuild rollups of course analytics from finished tasks (see 'utils.analytics')
+
+Rollups follow finished tasks incrementally, so rebuild is needed only after rows have been changed behind
+application's back (raw SQL, 'update()' of results and so on).
+"""
+from django.core.management.base import BaseCommand
+from api.utils import analytics
+
+
+class Command(BaseCommand):
+    help = 'Rebuild rollups of course analytics from finished tasks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('courses', nargs='*', type=int, help='Ids of courses to rebuild, all if omitted')
+
+    def handle(self, *args, **options):
+        analytics.rebuild(options['courses'] or None)
+        self.stdout.write(f'Rebuilt: {", ".join(map(str, options["courses"])) or "all courses"}')
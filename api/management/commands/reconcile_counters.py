@@ -0,0 +1,23 @@
+"""
+Recount denormalized counters of children (see 'utils.counters')
+
+Counters are kept in sync by signals and bulk operations of the API, so normally nothing is fixed. Counters
+drift only when rows are changed behind application's back: by raw SQL, by 'update()' of foreign keys and so on.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.utils import counters
+
+
+class Command(BaseCommand):
+    help = 'Recount denormalized counters of lectures, hometasks, finished tasks and comments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report wrong counters')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            wrong_counts = counters.reconcile(dry_run=options['dry_run'])
+        action = 'wrong' if options['dry_run'] else 'fixed'
+        for counter, count in wrong_counts.items():
+            self.stdout.write(f'{counter}: {count} {action}')
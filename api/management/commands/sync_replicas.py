@@ -0,0 +1,31 @@
+"""
+Copy primary SQLite database to read replicas
+
+SQLite has no replication, so replica files are refreshed by hand (or by cron), which also shows how
+replication lag looks to clients. Copy is made by SQLite online backup, primary stays available.
+"""
+import sqlite3
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = 'Copy primary SQLite database to read replicas listed in API_READ_REPLICAS'
+
+    def handle(self, *args, **options):
+        replicas = getattr(settings, 'API_READ_REPLICAS', [])
+        if not replicas:
+            raise CommandError('No read replicas configured')
+        primary = connections['default']
+        if primary.vendor != 'sqlite' or any(connections[alias].vendor != 'sqlite' for alias in replicas):
+            raise CommandError('Only SQLite replicas can be synced')
+        primary.ensure_connection()
+        for alias in replicas:
+            connections[alias].close()
+            target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f'{alias}: synced')
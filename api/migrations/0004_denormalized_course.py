@@ -0,0 +1,57 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def populate_course(apps, schema_editor):
+    Lecture = apps.get_model('api', 'Lecture')
+    Hometask = apps.get_model('api', 'Hometask')
+    FinishedTask = apps.get_model('api', 'FinishedTask')
+    Comment = apps.get_model('api', 'Comment')
+    Hometask.objects.update(
+        course_id=Subquery(Lecture.objects.filter(pk=OuterRef('lecture_id')).values('course_id')))
+    FinishedTask.objects.update(
+        course_id=Subquery(Hometask.objects.filter(pk=OuterRef('task_id')).values('course_id')))
+    Comment.objects.update(
+        course_id=Subquery(FinishedTask.objects.filter(pk=OuterRef('finished_task_id')).values('course_id')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hometask',
+            name='course',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='hometasks', to='api.course', verbose_name='Course'),
+        ),
+        migrations.AddField(
+            model_name='finishedtask',
+            name='course',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='finished_tasks', to='api.course', verbose_name='Course'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='course',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='api.course', verbose_name='Course'),
+        ),
+        migrations.RunPython(populate_course, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='hometask',
+            name='course',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='hometasks', to='api.course', verbose_name='Course'),
+        ),
+        migrations.AlterField(
+            model_name='finishedtask',
+            name='course',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='finished_tasks', to='api.course', verbose_name='Course'),
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='course',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='api.course', verbose_name='Course'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.1.4 on 2026-10-18 04:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_denormalized_course'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['finished_task', 'id'], name='comment_finished_task_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['course', 'id'], name='comment_course_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='finishedtask',
+            index=models.Index(fields=['task', 'user'], name='finishedtask_task_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='finishedtask',
+            index=models.Index(fields=['course', 'id'], name='finishedtask_course_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hometask',
+            index=models.Index(fields=['lecture', 'id'], name='hometask_lecture_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hometask',
+            index=models.Index(fields=['course', 'id'], name='hometask_course_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lecture',
+            index=models.Index(fields=['course', 'id'], name='lecture_course_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='membership',
+            index=models.Index(fields=['user', 'course'], name='membership_user_course_idx'),
+        ),
+    ]
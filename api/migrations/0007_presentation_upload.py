@@ -0,0 +1,32 @@
+# Generated by Django 3.1.4 on 2026-10-18 04:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PresentationUpload',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filename', models.CharField(max_length=255, verbose_name='File name')),
+                ('size', models.BigIntegerField(verbose_name='Size')),
+                ('checksum', models.CharField(blank=True, max_length=64, verbose_name='Checksum')),
+                ('offset', models.BigIntegerField(default=0, verbose_name='Offset')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Date of creation')),
+                ('lecture', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='presentation_uploads', to='api.lecture', verbose_name='Lecture')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='presentation_uploads', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Presentation upload',
+                'verbose_name_plural': 'Presentation uploads',
+            },
+        ),
+    ]
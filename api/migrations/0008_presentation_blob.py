@@ -0,0 +1,41 @@
+# Generated by Django 3.1.4 on 2026-10-18 04:49
+
+import api.utils.storage
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_references(apps, schema_editor):
+    Lecture = apps.get_model('api', 'Lecture')
+    PresentationBlob = apps.get_model('api', 'PresentationBlob')
+    references = (Lecture.objects.exclude(presentation__isnull=True).exclude(presentation='')
+                  .values('presentation').annotate(references=Count('pk')))
+    PresentationBlob.objects.bulk_create(PresentationBlob(name=row['presentation'], references=row['references'])
+                                         for row in references)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_presentation_upload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PresentationBlob',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Name')),
+                ('references', models.PositiveIntegerField(default=0, verbose_name='Number of lectures')),
+            ],
+            options={
+                'verbose_name': 'Presentation blob',
+                'verbose_name_plural': 'Presentation blobs',
+            },
+        ),
+        migrations.AlterField(
+            model_name='lecture',
+            name='presentation',
+            field=models.FileField(blank=True, null=True, storage=api.utils.storage.ContentAddressedStorage(), upload_to='presentations/', verbose_name='Presentation file'),
+        ),
+        migrations.RunPython(count_references, migrations.RunPython.noop),
+    ]
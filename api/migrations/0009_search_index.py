@@ -0,0 +1,46 @@
+"""
+Full-text index of hometasks, finished tasks and comments (see 'utils.search')
+
+SQLite FTS5 table is kept in sync by triggers, so bulk inserts and updates, which don't send signals,
+are indexed too. Row of index is addressed by id of indexed object and its kind: rowid = id * 4 + kind.
+Triggers are defined in 'utils.search', migrations altering indexed tables drop them before and create them after.
+"""
+from django.db import migrations
+from api.utils.search import SOURCES, TABLE, drop_triggers_sql, triggers_sql
+
+
+def forwards_sql():
+    statements = [f"CREATE VIRTUAL TABLE {TABLE} USING fts5("
+                  f"body, course_id UNINDEXED, owner_id UNINDEXED, tokenize='unicode61 remove_diacritics 2')"]
+    statements += [f'INSERT INTO {TABLE}(rowid, body, course_id, owner_id) '
+                   f'SELECT new.id * 4 + {kind}, new.{column}, new.course_id, {owner} FROM {table} AS new'
+                   for kind, table, column, owner, _ in SOURCES]
+    return statements + triggers_sql()
+
+
+def backwards_sql():
+    return drop_triggers_sql() + [f'DROP TABLE IF EXISTS {TABLE}']
+
+
+def create_index(apps, schema_editor):
+    #  Other databases are searched without index
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in forwards_sql():
+            schema_editor.execute(statement)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in backwards_sql():
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_presentation_blob'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 3.1.4 on 2026-10-18 05:13
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from api.utils import search
+
+#  Parent model, counter field, child model, foreign key of child, filter of counted children
+COUNTERS = [
+    ('Course', 'lectures_count', 'Lecture', 'course', {}),
+    ('Lecture', 'hometasks_count', 'Hometask', 'lecture', {}),
+    ('Hometask', 'finished_tasks_count', 'FinishedTask', 'task', {}),
+    ('Hometask', 'ungraded_count', 'FinishedTask', 'task', {'result__isnull': True}),
+    ('FinishedTask', 'comments_count', 'Comment', 'finished_task', {}),
+]
+
+
+def count_children(apps, schema_editor):
+    for parent, field, child, foreign_key, condition in COUNTERS:
+        children = (apps.get_model('api', child).objects.filter(**{foreign_key: OuterRef('pk')}, **condition)
+                    .order_by().values(foreign_key).annotate(count=Count('pk')).values('count'))
+        apps.get_model('api', parent).objects.update(**{field: Coalesce(Subquery(children), Value(0))})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_search_index'),
+    ]
+
+    operations = [
+        #  Search triggers refer to tables which are remade by adding fields
+        migrations.RunPython(search.drop_triggers, search.create_triggers),
+        migrations.AddField(
+            model_name='course',
+            name='lectures_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Number of lectures'),
+        ),
+        migrations.AddField(
+            model_name='finishedtask',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Number of comments'),
+        ),
+        migrations.AddField(
+            model_name='hometask',
+            name='finished_tasks_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Number of finished tasks'),
+        ),
+        migrations.AddField(
+            model_name='hometask',
+            name='ungraded_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Number of finished tasks without result'),
+        ),
+        migrations.AddField(
+            model_name='lecture',
+            name='hometasks_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Number of hometasks'),
+        ),
+        migrations.RunPython(search.create_triggers, search.drop_triggers),
+        migrations.RunPython(count_children, migrations.RunPython.noop),
+    ]
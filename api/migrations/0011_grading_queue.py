@@ -0,0 +1,33 @@
+# Generated by Django 3.1.4 on 2026-10-18 05:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from api.utils import search
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_counters'),
+    ]
+
+    operations = [
+        #  Search triggers refer to tables which are remade by adding fields
+        migrations.RunPython(search.drop_triggers, search.create_triggers),
+        migrations.AddField(
+            model_name='finishedtask',
+            name='claimed_by',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='claimed', to=settings.AUTH_USER_MODEL, verbose_name='Grader'),
+        ),
+        migrations.AddField(
+            model_name='finishedtask',
+            name='claimed_until',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='End of grading lease'),
+        ),
+        migrations.AddIndex(
+            model_name='finishedtask',
+            index=models.Index(condition=models.Q(result__isnull=True), fields=['course', 'id'], name='finishedtask_ungraded_idx'),
+        ),
+        migrations.RunPython(search.create_triggers, search.drop_triggers),
+    ]
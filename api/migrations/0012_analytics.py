@@ -0,0 +1,76 @@
+# Generated by Django 3.1.4 on 2026-10-18 05:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import Coalesce
+
+
+def rebuild_rollups(apps, schema_editor):
+    FinishedTask = apps.get_model('api', 'FinishedTask')
+    HometaskResult = apps.get_model('api', 'HometaskResult')
+    StudentResult = apps.get_model('api', 'StudentResult')
+    finished_tasks = FinishedTask.objects.order_by()
+    histograms = (finished_tasks.filter(result__isnull=False).values('course_id', 'task_id', 'result')
+                  .annotate(count=models.Count('pk')))
+    HometaskResult.objects.bulk_create(
+        HometaskResult(course_id=row['course_id'], hometask_id=row['task_id'], result=row['result'],
+                       count=row['count']) for row in histograms.iterator())
+    students = finished_tasks.values('course_id', 'user_id').annotate(
+        submitted=models.Count('pk'), graded=models.Count('result'),
+        total=Coalesce(models.Sum('result'), models.Value(0)))
+    StudentResult.objects.bulk_create(
+        StudentResult(course_id=row['course_id'], user_id=row['user_id'], submitted=row['submitted'],
+                      graded=row['graded'], total=row['total']) for row in students.iterator())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_grading_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentResult',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('submitted', models.PositiveIntegerField(default=0, verbose_name='Number of finished tasks')),
+                ('graded', models.PositiveIntegerField(default=0, verbose_name='Number of graded finished tasks')),
+                ('total', models.IntegerField(default=0, verbose_name='Sum of results')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_results', to='api.course', verbose_name='Course')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to=settings.AUTH_USER_MODEL, verbose_name='Student')),
+            ],
+            options={
+                'verbose_name': 'Student result',
+                'verbose_name_plural': 'Student results',
+            },
+        ),
+        migrations.CreateModel(
+            name='HometaskResult',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('result', models.IntegerField(verbose_name='Result')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Number of finished tasks')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='result_counts', to='api.course', verbose_name='Course')),
+                ('hometask', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='result_counts', to='api.hometask', verbose_name='Hometask')),
+            ],
+            options={
+                'verbose_name': 'Hometask result',
+                'verbose_name_plural': 'Hometask results',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='studentresult',
+            constraint=models.UniqueConstraint(fields=('course', 'user'), name='unique_course_student'),
+        ),
+        migrations.AddIndex(
+            model_name='hometaskresult',
+            index=models.Index(fields=['course', 'hometask'], name='hometaskresult_course_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='hometaskresult',
+            constraint=models.UniqueConstraint(fields=('hometask', 'result'), name='unique_hometask_result'),
+        ),
+        migrations.RunPython(rebuild_rollups, migrations.RunPython.noop),
+    ]
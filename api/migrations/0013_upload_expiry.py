@@ -0,0 +1,25 @@
+# Generated by Django 3.1.4 on 2026-10-18 09:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_analytics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='presentationupload',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now,
+                                       verbose_name='Date of last chunk'),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='presentationupload',
+            index=models.Index(fields=['updated_at'], name='upload_updated_at_idx'),
+        ),
+    ]
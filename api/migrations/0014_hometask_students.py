@@ -0,0 +1,48 @@
+# Generated by Django 3.1.4 on 2026-10-18 06:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def count_students(apps, schema_editor):
+    FinishedTask = apps.get_model('api', 'FinishedTask')
+    HometaskStudent = apps.get_model('api', 'HometaskStudent')
+    rows = (FinishedTask.objects.order_by().values('course_id', 'task_id', 'user_id')
+            .annotate(submitted=models.Count('pk')))
+    HometaskStudent.objects.bulk_create(
+        HometaskStudent(course_id=row['course_id'], hometask_id=row['task_id'], user_id=row['user_id'],
+                        submitted=row['submitted']) for row in rows.iterator())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_upload_expiry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HometaskStudent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('submitted', models.PositiveIntegerField(default=0, verbose_name='Number of finished tasks')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hometask_students', to='api.course', verbose_name='Course')),
+                ('hometask', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_counts', to='api.hometask', verbose_name='Hometask')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hometask_submissions', to=settings.AUTH_USER_MODEL, verbose_name='Student')),
+            ],
+            options={
+                'verbose_name': 'Hometask student',
+                'verbose_name_plural': 'Hometask students',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='hometaskstudent',
+            index=models.Index(fields=['course', 'hometask'], name='hometaskstudent_course_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='hometaskstudent',
+            constraint=models.UniqueConstraint(fields=('hometask', 'user'), name='unique_hometask_student'),
+        ),
+        migrations.RunPython(count_students, migrations.RunPython.noop),
+    ]
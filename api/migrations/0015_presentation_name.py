@@ -0,0 +1,19 @@
+# Generated by Django 3.1.4 on 2026-10-18 06:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_hometask_students'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lecture',
+            name='presentation_name',
+            field=models.CharField(blank=True, editable=False, max_length=255,
+                                   verbose_name='Original name of presentation file'),
+        ),
+    ]
@@ -1,5 +1,7 @@
-from django.db import models
+import secrets
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
+from .utils.storage import presentation_storage
 
 
 class User(AbstractUser):
@@ -24,11 +26,91 @@ class User(AbstractUser):
     def is_lecturer(self):
         return self.LECTURER == self.role
 
+    @property
+    def available_course_ids(self):
+        """
+        Subquery of ids of courses available for user. Objects attached to course carry 'course_id' column,
+        so their visibility is checked by single lookup in membership table
+        """
+        return Membership.objects.filter(user=self).values('course_id')
+
     class Meta:
         verbose_name = 'User'
         verbose_name_plural = 'Users'
 
 
+class Token(models.Model):
+    """
+    Authentication token. Issued on login, so password is checked only once per session
+    """
+    key = models.CharField(max_length=40, primary_key=True, verbose_name='Key')
+    user = models.ForeignKey(User, related_name='auth_tokens',
+                             verbose_name='User', on_delete=models.CASCADE)
+    created = models.DateTimeField(auto_now_add=True, verbose_name='Date of creation')
+
+    def save(self, *args, **kwargs):
+        if not self.key:
+            self.key = secrets.token_hex(20)
+        return super().save(*args, **kwargs)
+
+    def __str__(self):
+        return self.key
+
+    class Meta:
+        verbose_name = 'Token'
+        verbose_name_plural = 'Tokens'
+
+
+class CourseTrackingModel(models.Model):
+    """
+    Remembers course and parent as they were loaded from database, so moving object
+    to another parent (and probably another course) can be detected on save
+    """
+    #  Name of foreign key to parent
+    parent_field: str = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_course()
+        return instance
+
+    def remember_course(self):
+        self._loaded_course_id = self.__dict__.get('course_id')
+        self._loaded_parent_id = self.__dict__.get(f'{self.parent_field}_id')
+
+    def remembered(self) -> dict:
+        return {name: value for name, value in vars(self).items() if name.startswith('_loaded_')}
+
+    def save(self, *args, **kwargs):
+        loaded = self.remembered()
+        self.remember_course()
+        changed = self.remembered() != loaded
+        self.__dict__.update(loaded)
+        if self._state.adding or not changed:
+            return super().save(*args, **kwargs)
+        #  Counters and rollups are changed by difference from remembered values (see 'utils.counters'),
+        #  which concurrent save could have outdated, so they are read again under lock of the row
+        with transaction.atomic(savepoint=False):
+            current = type(self)._base_manager.select_for_update().filter(pk=self.pk).first()
+            if current is not None:
+                self.__dict__.update(current.remembered())
+            super().save(*args, **kwargs)
+
+    @property
+    def parent_changed(self):
+        loaded_parent_id = getattr(self, '_loaded_parent_id', None)
+        return loaded_parent_id is not None and loaded_parent_id != getattr(self, f'{self.parent_field}_id')
+
+    @property
+    def course_changed(self):
+        loaded_course_id = getattr(self, '_loaded_course_id', None)
+        return loaded_course_id is not None and loaded_course_id != self.course_id
+
+    class Meta:
+        abstract = True
+
+
 class Course(models.Model):
     """
     Course. Can be created by lecturer.
@@ -37,6 +119,9 @@ class Course(models.Model):
     as lectures or hometasks are marked as available for invited users.
     """
     title = models.CharField(max_length=100, verbose_name='Title')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Date of modification')
+    #  Denormalized counter, see 'utils.counters'
+    lectures_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Number of lectures')
 
     def __str__(self):
         return self.title
@@ -46,15 +131,30 @@ class Course(models.Model):
         verbose_name_plural = 'Courses'
 
 
-class Lecture(models.Model):
+class Lecture(CourseTrackingModel):
     """
     Lecture that must be attached to particular course. Can be created by lecturer.
     """
     theme = models.CharField(max_length=100, verbose_name='Theme')
-    presentation = models.FileField(upload_to='presentations/',
+    #  Identical files are stored once, see 'utils.storage'
+    presentation = models.FileField(upload_to='presentations/', storage=presentation_storage,
                                     verbose_name='Presentation file', null=True, blank=True)
+    #  Stored file is named by its digest, name given by uploader is kept for downloads
+    presentation_name = models.CharField(max_length=255, blank=True, editable=False,
+                                         verbose_name='Original name of presentation file')
     course = models.ForeignKey(Course, related_name='lectures',
                                verbose_name='Course', on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Date of modification')
+    #  Denormalized counter, see 'utils.counters'
+    hometasks_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Number of hometasks')
+
+    parent_field = 'course'
+
+    def remember_course(self):
+        super().remember_course()
+        #  Blob of replaced presentation is released on save
+        presentation = self.__dict__.get('presentation')
+        self._loaded_presentation = getattr(presentation, 'name', presentation)
 
     def __str__(self):
         return self.theme
@@ -62,15 +162,27 @@ class Lecture(models.Model):
     class Meta:
         verbose_name = 'Lecture'
         verbose_name_plural = 'Lectures'
+        indexes = [models.Index(fields=['course', 'id'], name='lecture_course_id_idx')]
 
 
-class Hometask(models.Model):
+class Hometask(CourseTrackingModel):
     """
     Hometask that must attached to particular lecture. Can be created by lecturer
     """
     task = models.TextField(verbose_name='Task')
     lecture = models.ForeignKey(Lecture, related_name='hometasks',
                                 verbose_name='Lecture', on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Date of modification')
+    #  Denormalized course of lecture. Populated on save
+    course = models.ForeignKey(Course, related_name='hometasks', editable=False,
+                               verbose_name='Course', on_delete=models.CASCADE)
+    #  Denormalized counters, see 'utils.counters'
+    finished_tasks_count = models.PositiveIntegerField(default=0, editable=False,
+                                                       verbose_name='Number of finished tasks')
+    ungraded_count = models.PositiveIntegerField(default=0, editable=False,
+                                                 verbose_name='Number of finished tasks without result')
+
+    parent_field = 'lecture'
 
     def __str__(self):
         return self.task
@@ -78,9 +190,11 @@ class Hometask(models.Model):
     class Meta:
         verbose_name = 'Hometask'
         verbose_name_plural = 'Hometasks'
+        indexes = [models.Index(fields=['lecture', 'id'], name='hometask_lecture_id_idx'),
+                   models.Index(fields=['course', 'id'], name='hometask_course_id_idx')]
 
 
-class FinishedTask(models.Model):
+class FinishedTask(CourseTrackingModel):
     """
     Hometask finished by user. Field 'result' can be modified by lecturer.
     """
@@ -90,6 +204,24 @@ class FinishedTask(models.Model):
     user = models.ForeignKey(User, related_name='finished',
                              verbose_name='Student', on_delete=models.CASCADE)
     answer = models.TextField(verbose_name='Answer')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Date of modification')
+    #  Denormalized course of hometask. Populated on save
+    course = models.ForeignKey(Course, related_name='finished_tasks', editable=False,
+                               verbose_name='Course', on_delete=models.CASCADE)
+    #  Denormalized counter, see 'utils.counters'
+    comments_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Number of comments')
+    #  Lecturer grading the task and end of his lease, see 'utils.grading_queue'
+    claimed_by = models.ForeignKey(User, related_name='claimed', null=True, editable=False,
+                                   verbose_name='Grader', on_delete=models.SET_NULL)
+    claimed_until = models.DateTimeField(null=True, editable=False, verbose_name='End of grading lease')
+
+    parent_field = 'task'
+
+    def remember_course(self):
+        super().remember_course()
+        #  Grading is counted on save, see 'utils.counters' and 'utils.analytics'
+        self._loaded_result = self.__dict__.get('result')
+        self._loaded_user_id = self.__dict__.get('user_id')
 
     def __str__(self):
         return f'{self.answer}: {self.result}'
@@ -97,6 +229,11 @@ class FinishedTask(models.Model):
     class Meta:
         verbose_name = 'Finished task'
         verbose_name_plural = 'Finished tasks'
+        indexes = [models.Index(fields=['task', 'user'], name='finishedtask_task_user_idx'),
+                   models.Index(fields=['course', 'id'], name='finishedtask_course_id_idx'),
+                   #  Grading queue, ungraded tasks are usually a small part of all
+                   models.Index(fields=['course', 'id'], condition=models.Q(result__isnull=True),
+                                name='finishedtask_ungraded_idx')]
 
 
 class Membership(models.Model):
@@ -115,9 +252,11 @@ class Membership(models.Model):
         verbose_name = 'Course membership'
         verbose_name_plural = 'Course memberships'
         constraints = [models.UniqueConstraint(fields=['course', 'user'], name='unique_course_user')]
+        #  Courses are looked up from user's side
+        indexes = [models.Index(fields=['user', 'course'], name='membership_user_course_idx')]
 
 
-class Comment(models.Model):
+class Comment(CourseTrackingModel):
     """
     Comment that can be left to finished task. Can be created by either lecturer or student
     """
@@ -126,6 +265,12 @@ class Comment(models.Model):
     user = models.ForeignKey(User, related_name='comments',
                              verbose_name='User', on_delete=models.CASCADE)
     comment = models.TextField(verbose_name='Comment')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Date of modification')
+    #  Denormalized course of finished task. Populated on save
+    course = models.ForeignKey(Course, related_name='comments', editable=False,
+                               verbose_name='Course', on_delete=models.CASCADE)
+
+    parent_field = 'finished_task'
 
     def __str__(self):
         return self.comment
@@ -133,3 +278,112 @@ class Comment(models.Model):
     class Meta:
         verbose_name = 'Comment'
         verbose_name_plural = 'Comments'
+        indexes = [models.Index(fields=['finished_task', 'id'], name='comment_finished_task_id_idx'),
+                   models.Index(fields=['course', 'id'], name='comment_course_id_idx')]
+
+
+class HometaskResult(models.Model):
+    """
+    Number of finished tasks of hometask graded with the result. Rollup of analytics, see 'utils.analytics'
+    """
+    hometask = models.ForeignKey(Hometask, related_name='result_counts',
+                                 verbose_name='Hometask', on_delete=models.CASCADE)
+    course = models.ForeignKey(Course, related_name='result_counts',
+                               verbose_name='Course', on_delete=models.CASCADE)
+    result = models.IntegerField(verbose_name='Result')
+    count = models.PositiveIntegerField(default=0, verbose_name='Number of finished tasks')
+
+    def __str__(self):
+        return f'{self.hometask_id}: {self.result} x {self.count}'
+
+    class Meta:
+        verbose_name = 'Hometask result'
+        verbose_name_plural = 'Hometask results'
+        constraints = [models.UniqueConstraint(fields=['hometask', 'result'], name='unique_hometask_result')]
+        indexes = [models.Index(fields=['course', 'hometask'], name='hometaskresult_course_idx')]
+
+
+class StudentResult(models.Model):
+    """
+    Totals of student's finished tasks in course. Rollup of analytics, see 'utils.analytics'
+    """
+    course = models.ForeignKey(Course, related_name='student_results',
+                               verbose_name='Course', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name='results',
+                             verbose_name='Student', on_delete=models.CASCADE)
+    submitted = models.PositiveIntegerField(default=0, verbose_name='Number of finished tasks')
+    graded = models.PositiveIntegerField(default=0, verbose_name='Number of graded finished tasks')
+    total = models.IntegerField(default=0, verbose_name='Sum of results')
+
+    def __str__(self):
+        return f'{self.user_id}:{self.course_id}: {self.total}'
+
+    class Meta:
+        verbose_name = 'Student result'
+        verbose_name_plural = 'Student results'
+        constraints = [models.UniqueConstraint(fields=['course', 'user'], name='unique_course_student')]
+
+
+class HometaskStudent(models.Model):
+    """
+    Number of finished tasks of student for hometask. Rollup of analytics, see 'utils.analytics'
+    """
+    hometask = models.ForeignKey(Hometask, related_name='student_counts',
+                                 verbose_name='Hometask', on_delete=models.CASCADE)
+    course = models.ForeignKey(Course, related_name='hometask_students',
+                               verbose_name='Course', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name='hometask_submissions',
+                             verbose_name='Student', on_delete=models.CASCADE)
+    submitted = models.PositiveIntegerField(default=0, verbose_name='Number of finished tasks')
+
+    def __str__(self):
+        return f'{self.hometask_id}:{self.user_id}: {self.submitted}'
+
+    class Meta:
+        verbose_name = 'Hometask student'
+        verbose_name_plural = 'Hometask students'
+        constraints = [models.UniqueConstraint(fields=['hometask', 'user'], name='unique_hometask_student')]
+        indexes = [models.Index(fields=['course', 'hometask'], name='hometaskstudent_course_idx')]
+
+
+class PresentationBlob(models.Model):
+    """
+    Presentation file stored by its content. Counts lectures referring to it
+    """
+    name = models.CharField(max_length=100, primary_key=True, verbose_name='Name')
+    references = models.PositiveIntegerField(default=0, verbose_name='Number of lectures')
+
+    def __str__(self):
+        return f'{self.name}: {self.references}'
+
+    class Meta:
+        verbose_name = 'Presentation blob'
+        verbose_name_plural = 'Presentation blobs'
+
+
+class PresentationUpload(models.Model):
+    """
+    Resumable upload of lecture presentation. Chunks are written to temporary file, which is attached
+    to lecture when the last chunk arrives
+    """
+    lecture = models.ForeignKey(Lecture, related_name='presentation_uploads',
+                                verbose_name='Lecture', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name='presentation_uploads',
+                             verbose_name='User', on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255, verbose_name='File name')
+    size = models.BigIntegerField(verbose_name='Size')
+    #  SHA-256 of the whole file declared by client, checked when the last chunk arrives
+    checksum = models.CharField(max_length=64, blank=True, verbose_name='Checksum')
+    #  Number of bytes received so far. Next chunk must start here
+    offset = models.BigIntegerField(default=0, verbose_name='Offset')
+    created = models.DateTimeField(auto_now_add=True, verbose_name='Date of creation')
+    #  Moved by every accepted chunk. Upload idle for PRESENTATION_UPLOAD_EXPIRY is discarded
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Date of last chunk')
+
+    def __str__(self):
+        return f'{self.filename}: {self.offset}/{self.size}'
+
+    class Meta:
+        verbose_name = 'Presentation upload'
+        verbose_name_plural = 'Presentation uploads'
+        indexes = [models.Index(fields=['updated_at'], name='upload_updated_at_idx')]
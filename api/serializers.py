@@ -1,32 +1,134 @@
+import os
+from collections import OrderedDict
 from rest_framework import serializers
+from django.conf import settings
+from django.contrib.auth import authenticate
 from django.db.utils import IntegrityError
 from . import models
+from .utils import search
+
+
+class ParentRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key of related object. Parent which has been fetched by view already (passed as 'parent' in context)
+    is taken as it is instead of being queried once more
+    """
+    def to_internal_value(self, data):
+        parent = self.context.get('parent')
+        if isinstance(parent, self.get_queryset().model) and str(parent.pk) == str(data):
+            return parent
+        return super().to_internal_value(data)
+
+
+class SparseFieldsSerializer(serializers.ModelSerializer):
+    """
+    Serializer which leaves only fields listed in context's 'fields', if there are any (see 'utils.sparse_fields').
+    Fields listed in 'Meta.optional_fields' are left only if they are requested
+    """
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = self.context.get('fields')
+        if requested == serializers.ALL_FIELDS:
+            return fields
+        if requested is None:
+            optional = getattr(self.Meta, 'optional_fields', ())
+            return OrderedDict((name, field) for name, field in fields.items() if name not in optional)
+        return OrderedDict((name, field) for name, field in fields.items() if name in requested)
+
+
+class ChildSerializer(SparseFieldsSerializer):
+    """
+    Serializer of object which is created under its parent (see 'ParentModelViewSet.process_child')
+    """
+    serializer_related_field = ParentRelatedField
+
+
+class CourseSerializer(SparseFieldsSerializer):
+    class Meta:
+        model = models.Course
+        fields = ['id', 'title', 'lectures_count']
+        #  Counters of children, see 'utils.counters'
+        optional_fields = ['lectures_count']
 
 
-class CourseSerializer(serializers.ModelSerializer):
+class LectureSerializer(ChildSerializer):
     class Meta:
-        model = models.Course
-        fields = ['id', 'title']
+        model = models.Lecture
+        fields = ['id', 'theme', 'presentation', 'course', 'hometasks_count']
+        optional_fields = ['hometasks_count']
+
+    def validate(self, attrs):
+        if 'presentation' in attrs:
+            #  Stored file is named by its digest (see 'utils.storage')
+            attrs['presentation_name'] = os.path.basename(attrs['presentation'].name) if attrs['presentation'] else ''
+        return attrs
+
+
+class HometaskImportSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.Hometask
+        fields = ['id', 'task']
 
 
-class LectureSerializer(serializers.ModelSerializer):
+class LectureImportSerializer(serializers.ModelSerializer):
+    hometasks = HometaskImportSerializer(many=True, required=False)
+
     class Meta:
         model = models.Lecture
-        fields = ['id', 'theme', 'presentation', 'course']
+        fields = ['id', 'theme', 'hometasks']
+
+
+class CourseImportSerializer(serializers.ModelSerializer):
+    """
+    Tree of course, its lectures and their hometasks, which is created at once (see 'utils.course_import')
+    """
+    lectures = LectureImportSerializer(many=True, required=False)
 
+    class Meta:
+        model = models.Course
+        fields = ['id', 'title', 'lectures']
+
+    def validate(self, attrs):
+        nodes = 1 + sum(1 + len(lecture.get('hometasks', [])) for lecture in attrs.get('lectures', []))
+        max_nodes = getattr(settings, 'API_IMPORT_MAX_NODES', 10000)
+        if nodes > max_nodes:
+            raise serializers.ValidationError(f'Course tree is too large: {nodes} objects, at most {max_nodes} allowed')
+        return attrs
+
+
+class PresentationUploadSerializer(serializers.ModelSerializer):
+    checksum = serializers.RegexField(r'^[0-9a-fA-F]{64}$', required=False, allow_blank=True,
+                                      help_text='SHA-256 of the whole file')
+
+    class Meta:
+        model = models.PresentationUpload
+        fields = ['id', 'lecture', 'filename', 'size', 'checksum', 'offset', 'created']
+        read_only_fields = ['lecture', 'offset', 'created']
+
+    def validate_filename(self, filename):
+        return os.path.basename(filename)
+
+    def validate_size(self, size):
+        if not 0 < size <= settings.PRESENTATION_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f'Size must be between 1 and {settings.PRESENTATION_UPLOAD_MAX_SIZE} bytes')
+        return size
 
-class HometaskSerializer(serializers.ModelSerializer):
+
+class HometaskSerializer(ChildSerializer):
     class Meta:
         model = models.Hometask
-        fields = ['id', 'task', 'lecture']
+        fields = ['id', 'task', 'lecture', 'finished_tasks_count', 'ungraded_count']
+        optional_fields = ['finished_tasks_count', 'ungraded_count']
 
 
-class FinishedTaskSerializer(serializers.ModelSerializer):
+class FinishedTaskSerializer(ChildSerializer):
     result = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = models.FinishedTask
-        fields = ['id', 'task', 'user', 'result', 'answer']
+        fields = ['id', 'task', 'user', 'result', 'answer', 'comments_count']
+        optional_fields = ['comments_count']
 
 
 class FinishedTaskResultSerializer(serializers.ModelSerializer):
@@ -35,7 +137,42 @@ class FinishedTaskResultSerializer(serializers.ModelSerializer):
         fields = ['id', 'result']
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class FinishedTaskSubmissionSerializer(serializers.Serializer):
+    """
+    Item of batch submission. Hometasks are checked for the whole batch at once
+    """
+    task = serializers.IntegerField()
+    answer = serializers.CharField()
+
+
+class FinishedTaskGradeSerializer(serializers.Serializer):
+    """
+    Item of batch grading. Finished tasks are checked for the whole batch at once
+    """
+    id = serializers.IntegerField()
+    result = serializers.IntegerField(allow_null=True)
+
+
+class GradingQueueSerializer(serializers.ModelSerializer):
+    """
+    Ungraded finished task in grading queue (see 'utils.grading_queue')
+    """
+    class Meta:
+        model = models.FinishedTask
+        fields = ['id', 'task', 'user', 'answer', 'course', 'claimed_until']
+
+
+class GradingClaimSerializer(serializers.Serializer):
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10,
+                                     help_text='Maximal number of finished tasks to take')
+
+
+class GradingReleaseSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=1000,
+                                help_text='Finished tasks to release, all claimed ones if omitted')
+
+
+class CommentSerializer(ChildSerializer):
     class Meta:
         model = models.Comment
         fields = ['id', 'finished_task', 'user', 'comment']
@@ -51,6 +188,26 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
 
+class LoginSerializer(serializers.Serializer):
+    username = serializers.CharField()
+    password = serializers.CharField(style={'input_type': 'password'})
+
+    def validate(self, attrs):
+        user = authenticate(username=attrs['username'], password=attrs['password'])
+        if user is None:
+            raise serializers.ValidationError('Unable to log in with provided credentials')
+        attrs['user'] = user
+        return attrs
+
+
+class TokenSerializer(serializers.ModelSerializer):
+    token = serializers.CharField(source='key')
+
+    class Meta:
+        model = models.Token
+        fields = ['token', 'user', 'created']
+
+
 class MembershipSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.Membership
@@ -62,3 +219,34 @@ class MembershipSerializer(serializers.ModelSerializer):
             return membership
         except IntegrityError:
             raise serializers.ValidationError('This user is already a member of this course')
+
+
+class BulkMembershipSerializer(serializers.Serializer):
+    """
+    List of users to add to course or remove from it. Numbers are treated as user ids, strings - as usernames
+    """
+    users = serializers.ListField(child=serializers.JSONField(), allow_empty=False, max_length=1000)
+
+    def validate_users(self, users):
+        for user in users:
+            if isinstance(user, bool) or not isinstance(user, (int, str)):
+                raise serializers.ValidationError('Every user must be either id or username')
+        return users
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    """
+    Query string of search
+    """
+    q = serializers.CharField(help_text='Words to find, all of them must be found')
+    kind = serializers.ChoiceField(choices=list(search.KINDS), required=False)
+    page = serializers.IntegerField(min_value=1, default=1)
+    page_size = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+
+class SearchHitSerializer(serializers.Serializer):
+    kind = serializers.CharField()
+    id = serializers.IntegerField()
+    course = serializers.IntegerField()
+    snippet = serializers.CharField()
+    score = serializers.FloatField()
@@ -0,0 +1,159 @@
+"""
+Signal receivers of the api application. Connected in ApiConfig.ready
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from . import models
+from .utils import analytics, cache, counters, uploads
+from .utils.authentication import principal_cache
+from .utils.storage import presentation_storage
+
+
+@receiver(post_delete, sender=models.Token)
+def revoke_deleted_token(sender, instance, **kwargs):
+    principal_cache.revoke(instance.key)
+
+
+@receiver([post_save, post_delete], sender=models.User)
+def revoke_changed_user_tokens(sender, instance, **kwargs):
+    #  Cached user object is stale now
+    principal_cache.revoke_user(instance.pk)
+
+
+#  Objects which carry denormalized 'course_id' of given model, and lookups from them to it
+COURSE_DEPENDENTS = {
+    models.Lecture: [(models.Hometask, 'lecture'),
+                     (models.FinishedTask, 'task__lecture'),
+                     (models.Comment, 'finished_task__task__lecture')],
+    models.Hometask: [(models.FinishedTask, 'task'),
+                      (models.Comment, 'finished_task__task')],
+    models.FinishedTask: [(models.Comment, 'finished_task')],
+}
+
+
+@receiver(pre_save, sender=models.Hometask)
+@receiver(pre_save, sender=models.FinishedTask)
+@receiver(pre_save, sender=models.Comment)
+def populate_course(sender, instance, **kwargs):
+    if instance.course_id is None or instance.parent_changed:
+        instance.course_id = getattr(instance, instance.parent_field).course_id
+
+
+@receiver([post_save, post_delete], sender=models.Membership)
+def invalidate_memberships(sender, instance, **kwargs):
+    cache.invalidate_user(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=models.Course)
+def invalidate_course(sender, instance, **kwargs):
+    cache.invalidate_course(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=models.Lecture)
+@receiver([post_save, post_delete], sender=models.Hometask)
+def invalidate_course_tree(sender, instance, **kwargs):
+    #  Must run before 'propagate_course', which forgets course object was loaded with
+    for course_id in {instance.course_id, getattr(instance, '_loaded_course_id', None)} - {None}:
+        cache.invalidate_course(course_id)
+    if sender is models.Lecture:
+        cache.invalidate_lecture(instance.pk)
+
+
+@receiver(post_save, sender=models.Lecture)
+def count_presentation_references(sender, instance, created, **kwargs):
+    #  Must run before 'propagate_course', which forgets presentation object was loaded with
+    loaded = None if created else getattr(instance, '_loaded_presentation', None)
+    current = instance.presentation.name or None
+    if current != loaded:
+        if current:
+            presentation_storage.retain(current)
+        if loaded:
+            presentation_storage.release(loaded)
+
+
+@receiver(post_delete, sender=models.Lecture)
+def release_presentation(sender, instance, **kwargs):
+    if instance.presentation:
+        presentation_storage.release(instance.presentation.name)
+
+
+@receiver(post_save, sender=models.Lecture)
+@receiver(post_save, sender=models.Hometask)
+@receiver(post_save, sender=models.FinishedTask)
+@receiver(post_save, sender=models.Comment)
+def count_children(sender, instance, created, **kwargs):
+    #  Must run before 'propagate_course', which forgets parent object was loaded with
+    if created:
+        counters.count_created([instance])
+    else:
+        counters.count_saved(instance)
+
+
+@receiver(post_delete, sender=models.Lecture)
+@receiver(post_delete, sender=models.Hometask)
+@receiver(post_delete, sender=models.FinishedTask)
+@receiver(post_delete, sender=models.Comment)
+def uncount_children(sender, instance, **kwargs):
+    counters.count_deleted(instance)
+
+
+@receiver(post_save, sender=models.FinishedTask)
+def record_results(sender, instance, created, **kwargs):
+    #  Must run before 'propagate_course', which forgets finished task as it was loaded
+    if created:
+        analytics.record(added=[analytics.contribution(instance)])
+    else:
+        analytics.record_changed([instance])
+
+
+@receiver(post_delete, sender=models.FinishedTask)
+def unrecord_results(sender, instance, **kwargs):
+    analytics.record(removed=[analytics.contribution(instance)])
+
+
+#  Pre-delete signals of all collected objects are sent before any of them is deleted
+@receiver(pre_delete, sender=models.Course)
+@receiver(pre_delete, sender=models.Lecture)
+@receiver(pre_delete, sender=models.Hometask)
+@receiver(pre_delete, sender=models.FinishedTask)
+def start_deleting_parent(sender, instance, **kwargs):
+    counters.start_deleting(instance)
+
+
+#  Parent is deleted after its children
+@receiver(post_delete, sender=models.Course)
+@receiver(post_delete, sender=models.Lecture)
+@receiver(post_delete, sender=models.Hometask)
+@receiver(post_delete, sender=models.FinishedTask)
+def finish_deleting_parent(sender, instance, **kwargs):
+    counters.finish_deleting(instance)
+
+
+@receiver(post_save, sender=models.Lecture)
+@receiver(post_save, sender=models.Hometask)
+@receiver(post_save, sender=models.FinishedTask)
+@receiver(post_save, sender=models.Comment)
+def propagate_course(sender, instance, created, **kwargs):
+    if not created and instance.course_changed:
+        for model, lookup in COURSE_DEPENDENTS.get(sender, []):
+            model.objects.filter(**{lookup: instance}).update(course_id=instance.course_id)
+        if sender in (models.Lecture, models.Hometask):
+            #  Totals of students are kept per course, they can't be moved along with finished tasks
+            analytics.rebuild([instance._loaded_course_id, instance.course_id])
+    instance.remember_course()
+
+
+@receiver(post_delete, sender=models.PresentationUpload)
+def discard_upload(sender, instance, **kwargs):
+    uploads.discard(instance)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    #  Readers don't block writer in WAL mode, and commits don't wait for fsync of every transaction
+    if connection.vendor == 'sqlite' and getattr(settings, 'API_SQLITE_WAL', False):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute('PRAGMA synchronous=NORMAL')
@@ -0,0 +1,167 @@
+"""
+Rollups of analytics follow submission, grading and deletion of finished tasks, statistics are read from them
+"""
+from unittest import mock
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from functools import partial
+from api import models
+from api.utils import analytics
+from .utils import BaseTestCase, auth_and_request
+
+
+def reference_percentile(results: list, q: float) -> float:
+    results = sorted(results)
+    position = q / 100 * (len(results) - 1)
+    lower = int(position)
+    upper = min(lower + 1, len(results) - 1)
+    return results[lower] + (results[upper] - results[lower]) * (position - lower)
+
+
+def rollups(course) -> tuple:
+    histograms = (models.HometaskResult.objects.filter(course=course, count__gt=0).order_by('hometask', 'result')
+                  .values_list('hometask', 'result', 'count'))
+    students = (models.StudentResult.objects.filter(course=course, submitted__gt=0).order_by('user')
+                .values_list('user', 'submitted', 'graded', 'total'))
+    return list(histograms), list(students)
+
+
+def submitters(course) -> list:
+    return list(models.HometaskStudent.objects.filter(course=course, submitted__gt=0).order_by('hometask', 'user')
+                .values_list('hometask', 'user', 'submitted'))
+
+
+class TestAnalytics(BaseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        models.Membership.objects.create(user=cls.student_1, course=cls.test_course)
+        models.Membership.objects.create(user=cls.student_2, course=cls.test_course)
+        cls.test_lecture = models.Lecture.objects.create(course=cls.test_course, theme='test')
+        cls.test_hometask = models.Hometask.objects.create(lecture=cls.test_lecture, task='test')
+        cls.other_hometask = models.Hometask.objects.create(lecture=cls.test_lecture, task='other')
+        cls.finished_tasks = [models.FinishedTask.objects.create(task=hometask, user=user, answer='test')
+                              for hometask in (cls.test_hometask, cls.other_hometask)
+                              for user in (cls.student_1, cls.student_2)]
+        cls.url = reverse('courses-analytics', args=[cls.test_course.pk])
+
+    def grade(self, results: dict):
+        request = partial(self.client.patch, reverse('finished_tasks-grade'),
+                          [{'id': pk, 'result': result} for pk, result in results.items()], format='json')
+        response = auth_and_request(self.client, self.lecturer_1, request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def assertRebuiltEqual(self):
+        incremental = rollups(self.test_course), submitters(self.test_course)
+        analytics.rebuild([self.test_course.pk])
+        self.assertEqual((rollups(self.test_course), submitters(self.test_course)), incremental)
+
+    # =======================================================
+    #                      Rollups
+    # =======================================================
+
+    def test_graded_finished_tasks_are_recorded(self):
+        first, second, third, _ = self.finished_tasks
+        self.grade({first.pk: 4, second.pk: 5})
+        url = reverse('finished_tasks-detail', args=[third.pk])
+        auth_and_request(self.client, self.lecturer_1, partial(self.client.patch, url, {'result': 3}))
+        self.assertEqual(rollups(self.test_course), (
+            [(self.test_hometask.pk, 4, 1), (self.test_hometask.pk, 5, 1), (self.other_hometask.pk, 3, 1)],
+            [(self.student_1.pk, 2, 2, 7), (self.student_2.pk, 2, 1, 5)]))
+        self.assertRebuiltEqual()
+
+    def test_large_course_is_graded_in_one_request(self):
+        models.User.objects.bulk_create(
+            models.User(username=f'analytics_student_{i}', role=models.User.STUDENT) for i in range(1100))
+        students = list(models.User.objects.filter(username__startswith='analytics_student_').order_by('pk'))
+        models.FinishedTask.objects.bulk_create(
+            models.FinishedTask(task=self.test_hometask, course=self.test_course, user=student, answer='test')
+            for student in students)
+        analytics.rebuild([self.test_course.pk])
+        finished_tasks = models.FinishedTask.objects.filter(user__in=students).values_list('pk', 'user_id')
+        self.grade({pk: user_id % 7 for pk, user_id in finished_tasks})
+        self.assertEqual(models.StudentResult.objects.filter(user__in=students, graded=1).count(), len(students))
+        self.assertRebuiltEqual()
+
+    def test_regraded_and_deleted_finished_tasks_are_recorded(self):
+        first, second, *_ = self.finished_tasks
+        self.grade({first.pk: 4, second.pk: 4})
+        self.grade({first.pk: 2})
+        models.FinishedTask.objects.get(pk=second.pk).delete()
+        self.assertEqual(rollups(self.test_course), (
+            [(self.test_hometask.pk, 2, 1)], [(self.student_1.pk, 2, 1, 2), (self.student_2.pk, 1, 0, 0)]))
+        self.assertRebuiltEqual()
+
+    def test_submitted_finished_tasks_are_recorded(self):
+        request = partial(self.client.post, reverse('hometasks-submit'),
+                          [{'task': self.test_hometask.pk, 'answer': 'new'}], format='json')
+        auth_and_request(self.client, self.student_1, request)
+        self.assertIn((self.student_1.pk, 3, 0, 0), rollups(self.test_course)[1])
+        self.assertRebuiltEqual()
+
+    def test_rollups_follow_lecture_moved_to_another_course(self):
+        self.grade({self.finished_tasks[0].pk: 5})
+        other_course = models.Course.objects.create(title='other')
+        lecture = models.Lecture.objects.get(pk=self.test_lecture.pk)
+        lecture.course = other_course
+        lecture.save()
+        self.assertEqual(rollups(self.test_course), ([], []))
+        self.assertEqual(rollups(other_course)[0], [(self.test_hometask.pk, 5, 1)])
+
+    def test_rebuild_command_fixes_rollups(self):
+        models.FinishedTask.objects.filter(pk=self.finished_tasks[0].pk).update(result=3)
+        call_command('rebuild_analytics', self.test_course.pk, stdout=mock.Mock())
+        self.assertEqual(rollups(self.test_course)[0], [(self.test_hometask.pk, 3, 1)])
+
+    # =======================================================
+    #                      Statistics
+    # =======================================================
+
+    def test_percentiles_of_histogram_match_percentiles_of_results(self):
+        values, counts, qs = [1, 2, 5, 7, 10], [3, 1, 4, 2, 5], (0, 10, 25, 50, 75, 90, 100)
+        results = [value for value, count in zip(values, counts) for _ in range(count)]
+        expected = [reference_percentile(results, q) for q in qs]
+        with mock.patch.object(analytics, 'numpy', None):
+            fallback = analytics.percentiles(values, counts, qs)
+        for computed in (analytics.percentiles(values, counts, qs), fallback):
+            for actual, value in zip(computed, expected):
+                self.assertAlmostEqual(actual, value)
+
+    def test_rebuild_without_numpy_gives_the_same_rollups(self):
+        self.grade({self.finished_tasks[0].pk: 4, self.finished_tasks[3].pk: 1})
+        analytics.rebuild([self.test_course.pk])
+        expected = rollups(self.test_course)
+        with mock.patch.object(analytics, 'numpy', None):
+            analytics.rebuild([self.test_course.pk])
+        self.assertEqual(rollups(self.test_course), expected)
+
+    def test_lecturer_gets_statistics(self):
+        first, second, third, _ = self.finished_tasks
+        self.grade({first.pk: 2, second.pk: 4, third.pk: 5})
+        response = auth_and_request(self.client, self.lecturer_1, partial(self.client.get, self.url))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['students_count'], 2)
+        self.assertEqual(response.data['results']['graded'], 3)
+        self.assertAlmostEqual(response.data['results']['mean'], 11 / 3)
+        self.assertEqual(response.data['results']['median'], 4)
+        hometask = response.data['hometasks'][0]
+        self.assertEqual((hometask['id'], hometask['submissions'], hometask['submitted_students'],
+                          hometask['submission_rate']), (self.test_hometask.pk, 2, 2, 1))
+        self.assertEqual(hometask['median'], 3)
+        self.assertEqual(response.data['hometasks'][1]['percentiles'][90], 5)
+        self.assertEqual(response.data['students'][0],
+                         {'user': self.student_1.pk, 'submitted': 2, 'graded': 2, 'total': 7, 'mean': 3.5})
+
+    def test_submission_rate_counts_students_of_course(self):
+        models.FinishedTask.objects.create(task=self.test_hometask, user=self.student_1, answer='again')
+        self.assertIn((self.test_hometask.pk, self.student_1.pk, 2), submitters(self.test_course))
+        models.Membership.objects.filter(user=self.student_2).delete()
+        response = auth_and_request(self.client, self.lecturer_1, partial(self.client.get, self.url))
+        hometask = response.data['hometasks'][0]
+        self.assertEqual((hometask['submissions'], hometask['submitted_students'], hometask['submission_rate']),
+                         (3, 1, 1))
+
+    def test_student_cannot_get_statistics(self):
+        response = auth_and_request(self.client, self.student_1, partial(self.client.get, self.url))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,66 @@
+"""
+Async read path: cached listings are served from executor pool, everything else by sync views
+"""
+from unittest import mock
+from django.test import override_settings
+from django.urls import include, path, reverse
+from rest_framework import status
+from api import models
+from api.urls import router
+from api.utils import async_views
+from api.utils.authentication import issue_token
+from .utils import BaseTestCase
+
+urlpatterns = [path('api/', include(async_views.async_read_urls(router.urls)))]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class TestAsyncReads(BaseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.lecture = models.Lecture.objects.create(course=cls.test_course, theme='lecture')
+        cls.urls = [reverse('courses-list'),
+                    reverse('courses-process-child', args=[cls.test_course.pk]),
+                    reverse('lectures-process-child', args=[cls.lecture.pk])]
+
+    def setUp(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {issue_token(self.lecturer_1).key}')
+
+    def test_only_parents_views_are_async(self):
+        wrapped = {url.name for url in urlpatterns[0].url_patterns if url.callback.__name__ == 'async_view'}
+        self.assertIn('courses-process-child', wrapped)
+        self.assertNotIn('comments-list', wrapped)
+
+    def test_cache_miss_is_served_by_sync_view(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_cache_hit_is_not_passed_to_sync_view(self):
+        expected = [self.client.get(url).json() for url in self.urls]
+        with mock.patch.object(async_views, 'sync_to_async', wraps=async_views.sync_to_async) as sync_to_async, \
+                self.assertNumQueries(0):
+            responses = [self.client.get(url) for url in self.urls]
+        #  Blocking cache lookups are run in executor pool, not in the event loop or the sync views' thread
+        self.assertEqual(sync_to_async.call_args_list,
+                         [mock.call(async_views.serve_from_cache, thread_sensitive=False)] * len(self.urls))
+        self.assertEqual([response.json() for response in responses], expected)
+        self.assertTrue(all(response.has_header('ETag') for response in responses))
+
+    def test_not_modified_is_served_from_cache(self):
+        etag = self.client.get(self.urls[1])['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.urls[1], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_writes_are_served_by_sync_view(self):
+        response = self.client.post(self.urls[1], {'theme': 'new'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(self.client.get(self.urls[1]).json()), 2)
+
+    def test_inaccessible_course_is_not_found(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {issue_token(self.lecturer_2).key}')
+        self.client.get(self.urls[0])
+        self.assertEqual(self.client.get(self.urls[1]).status_code, status.HTTP_404_NOT_FOUND)
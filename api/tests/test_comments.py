@@ -223,4 +223,10 @@ class TestDetailComments(CommentsTest):
     def test_student_stranger_cannot_delete_inaccessible_comment(self):
         request = partial(self.client.patch, self.lecturer_url)
         response = auth_and_request(self.client, self.student_2, request)
-        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_denied_comment_costs_single_query(self):
+        self.client.force_authenticate(self.student_1)
+        with self.assertNumQueries(1):
+            response = self.client.delete(self.lecturer_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
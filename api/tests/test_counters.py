@@ -0,0 +1,157 @@
+"""
+Denormalized counters of children follow creation, deletion, moving and grading of children
+"""
+from io import StringIO
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from functools import partial
+from api import models
+from .utils import BaseTestCase, auth_and_request
+
+
+class TestCounters(BaseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        models.Membership.objects.create(user=cls.student_1, course=cls.test_course)
+        models.Membership.objects.create(user=cls.student_2, course=cls.test_course)
+        cls.test_lecture = models.Lecture.objects.create(course=cls.test_course, theme='test')
+        cls.test_hometask = models.Hometask.objects.create(lecture=cls.test_lecture, task='test')
+        cls.test_finished_task = models.FinishedTask.objects.create(task=cls.test_hometask, user=cls.student_1,
+                                                                    answer='test')
+
+    def assertCounters(self, instance, **counters):
+        instance.refresh_from_db()
+        self.assertEqual({name: getattr(instance, name) for name in counters}, counters)
+
+    # =======================================================
+    #                      Maintenance
+    # =======================================================
+
+    def test_created_children_are_counted(self):
+        self.assertCounters(self.test_course, lectures_count=1)
+        self.assertCounters(self.test_lecture, hometasks_count=1)
+        self.assertCounters(self.test_hometask, finished_tasks_count=1, ungraded_count=1)
+        request = partial(self.client.post, reverse('finished_tasks-process-child', args=[self.test_finished_task.pk]),
+                          {'comment': 'new'}, format='json')
+        auth_and_request(self.client, self.student_1, request)
+        self.assertCounters(self.test_finished_task, comments_count=1)
+
+    def test_deleted_children_are_uncounted(self):
+        request = partial(self.client.delete, reverse('finished_tasks-detail', args=[self.test_finished_task.pk]))
+        response = auth_and_request(self.client, self.student_1, request)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertCounters(self.test_hometask, finished_tasks_count=0, ungraded_count=0)
+
+    def test_children_deleted_with_parent_are_uncounted_from_surviving_ancestors(self):
+        models.Hometask.objects.get(pk=self.test_hometask.pk).delete()
+        self.assertCounters(self.test_lecture, hometasks_count=0)
+        self.assertCounters(self.test_course, lectures_count=1)
+
+    def test_moved_children_are_recounted(self):
+        lecture = models.Lecture.objects.create(course=self.test_course, theme='other')
+        hometask = models.Hometask.objects.get(pk=self.test_hometask.pk)
+        hometask.lecture = lecture
+        hometask.save()
+        self.assertCounters(self.test_lecture, hometasks_count=0)
+        self.assertCounters(lecture, hometasks_count=1)
+
+    def test_graded_finished_tasks_are_uncounted_from_ungraded(self):
+        url = reverse('finished_tasks-detail', args=[self.test_finished_task.pk])
+        auth_and_request(self.client, self.lecturer_1, partial(self.client.patch, url, {'result': 5}))
+        self.assertCounters(self.test_hometask, finished_tasks_count=1, ungraded_count=0)
+        self.client.patch(url, {'result': 4})
+        self.assertCounters(self.test_hometask, finished_tasks_count=1, ungraded_count=0)
+
+    def test_concurrently_graded_finished_task_is_uncounted_once(self):
+        models.FinishedTask.objects.create(task=self.test_hometask, user=self.student_2, answer='other')
+        first, second = (models.FinishedTask.objects.get(pk=self.test_finished_task.pk) for _ in range(2))
+        first.result, second.result = 5, 4
+        first.save()
+        second.save()
+        self.assertCounters(self.test_hometask, finished_tasks_count=2, ungraded_count=1)
+        self.assertEqual(list(models.HometaskResult.objects.filter(count__gt=0).values_list('result', 'count')),
+                         [(4, 1)])
+
+    def test_bulk_submission_and_grading_are_counted(self):
+        request = partial(self.client.post, reverse('hometasks-submit'),
+                          [{'task': self.test_hometask.pk, 'answer': 'first'},
+                           {'task': self.test_hometask.pk, 'answer': 'second'}], format='json')
+        response = auth_and_request(self.client, self.student_2, request)
+        self.assertCounters(self.test_hometask, finished_tasks_count=3, ungraded_count=3)
+        results = [{'id': self.test_finished_task.pk, 'result': 5}, {'id': response.data[0]['id'], 'result': 3}]
+        request = partial(self.client.patch, reverse('finished_tasks-grade'), results, format='json')
+        auth_and_request(self.client, self.lecturer_1, request)
+        self.assertCounters(self.test_hometask, finished_tasks_count=3, ungraded_count=1)
+        self.client.patch(reverse('finished_tasks-grade'), [{'id': self.test_finished_task.pk, 'result': None}],
+                          format='json')
+        self.assertCounters(self.test_hometask, finished_tasks_count=3, ungraded_count=2)
+
+    def test_counting_changes_etag_of_parent(self):
+        self.client.force_authenticate(self.lecturer_1)
+        url = reverse('hometasks-detail', args=[self.test_hometask.pk])
+        etag = self.client.get(url)['ETag']
+        models.FinishedTask.objects.create(task=self.test_hometask, user=self.student_2, answer='new')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    # =======================================================
+    #                      Reading
+    # =======================================================
+
+    def test_counters_are_returned_only_if_requested(self):
+        self.client.force_authenticate(self.lecturer_1)
+        url = reverse('hometasks-detail', args=[self.test_hometask.pk])
+        self.assertNotIn('finished_tasks_count', self.client.get(url).data)
+        response = self.client.get(url, {'fields': 'id,finished_tasks_count,ungraded_count'})
+        self.assertEqual(response.data, {'id': self.test_hometask.pk, 'finished_tasks_count': 1, 'ungraded_count': 1})
+
+    def test_counters_are_returned_by_listings(self):
+        self.client.force_authenticate(self.lecturer_1)
+        for fast in (True, False):
+            with override_settings(API_FAST_LISTINGS=fast):
+                response = self.client.get(reverse('courses-list'))
+                self.assertNotIn('lectures_count', response.data[0])
+                response = self.client.get(reverse('courses-list'), {'fields': 'id,lectures_count'})
+                self.assertEqual(response.data, [{'id': self.test_course.pk, 'lectures_count': 1}])
+
+    def test_counters_in_listing_of_children_are_fresh(self):
+        self.client.force_authenticate(self.lecturer_1)
+        url = reverse('lectures-process-child', args=[self.test_lecture.pk])
+        self.client.get(url, {'fields': 'id,ungraded_count'})
+        #  Submission doesn't drop cached listings of hometasks
+        models.FinishedTask.objects.create(task=self.test_hometask, user=self.student_2, answer='new')
+        response = self.client.get(url, {'fields': 'id,ungraded_count'})
+        self.assertEqual(response.data, [{'id': self.test_hometask.pk, 'ungraded_count': 2}])
+
+
+class TestReconcileCounters(BaseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.test_lecture = models.Lecture.objects.create(course=cls.test_course, theme='test')
+        models.Hometask.objects.create(lecture=cls.test_lecture, task='test')
+        #  Update doesn't send signals which count children
+        models.Course.objects.update(lectures_count=5)
+        models.Lecture.objects.update(hometasks_count=0)
+
+    def reconcile(self, *args) -> str:
+        out = StringIO()
+        call_command('reconcile_counters', *args, stdout=out)
+        return out.getvalue()
+
+    def test_wrong_counters_are_fixed(self):
+        output = self.reconcile()
+        self.assertIn('Course.lectures_count: 1 fixed', output)
+        self.assertIn('Lecture.hometasks_count: 1 fixed', output)
+        self.assertIn('Hometask.ungraded_count: 0 fixed', output)
+        self.test_course.refresh_from_db()
+        self.test_lecture.refresh_from_db()
+        self.assertEqual((self.test_course.lectures_count, self.test_lecture.hometasks_count), (1, 1))
+        self.assertIn('Course.lectures_count: 0 fixed', self.reconcile())
+
+    def test_dry_run_changes_nothing(self):
+        self.assertIn('Course.lectures_count: 1 wrong', self.reconcile('--dry-run'))
+        self.test_course.refresh_from_db()
+        self.assertEqual(self.test_course.lectures_count, 5)
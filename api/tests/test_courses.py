@@ -1,7 +1,10 @@
+import csv
+import json
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework import status
 from functools import partial
-from .utils import BaseTestCase, auth_and_request
+from .utils import BaseTestCase, auth_and_request, next_link
 from api import models
 
 
@@ -368,4 +371,298 @@ class TestUsersCourses(CoursesTest):
         request = partial(self.client.post, self.url, {'pk': self.student_2.pk}, format='json')
         response = auth_and_request(self.client, self.student_1, request,
                                     {'user': self.student_1, 'course': self.test_course})
-        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TestPaginationCourses(CoursesTest):
+    """
+    Keyset pagination of /courses and /courses/<course_id>/lectures endpoints
+    """
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for title in ('second', 'third'):
+            course = models.Course.objects.create(title=title)
+            models.Membership.objects.create(user=cls.lecturer_1, course=course)
+        for theme in ('first', 'second', 'third'):
+            models.Lecture.objects.create(theme=theme, course=cls.test_course)
+
+    def collect_pages(self, url):
+        self.client.force_authenticate(self.lecturer_1)
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data)
+            url = next_link(response)
+        return pages
+
+    def test_courses_are_paginated_by_primary_key(self):
+        pages = self.collect_pages(reverse('courses-list') + '?page_size=2')
+        self.assertEqual([[course['title'] for course in page] for page in pages],
+                         [['test', 'second'], ['third']])
+
+    def test_lectures_of_course_are_paginated_by_primary_key(self):
+        pages = self.collect_pages(reverse('courses-process-child', args=[self.test_course.pk]) + '?page_size=2')
+        self.assertEqual([[lecture['theme'] for lecture in page] for page in pages],
+                         [['first', 'second'], ['third']])
+
+    def test_page_is_stable_while_rows_are_inserted(self):
+        self.client.force_authenticate(self.lecturer_1)
+        url = reverse('courses-process-child', args=[self.test_course.pk]) + '?page_size=2'
+        next_url = next_link(self.client.get(url))
+        models.Lecture.objects.create(theme='fourth', course=self.test_course)
+        response = self.client.get(next_url)
+        self.assertEqual([lecture['theme'] for lecture in response.data], ['third', 'fourth'])
+
+    def test_single_page_has_no_links(self):
+        self.client.force_authenticate(self.lecturer_1)
+        response = self.client.get(reverse('courses-list'))
+        self.assertEqual(len(response.data), 3)
+        self.assertNotIn('Link', response)
+
+
+class TestBulkUsersCourses(CoursesTest):
+    """
+    /courses/<course_id>/users/bulk endpoint test
+    """
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        models.Membership.objects.create(user=cls.student_2, course=cls.test_course)
+
+    def setUp(self):
+        self.url = reverse('courses-move-users', args=[self.test_course.pk])
+
+    def test_lecturer_member_can_add_users_by_ids_and_usernames(self):
+        users = [self.student_1.pk, self.lecturer_2.username, self.student_2.pk, 'nobody']
+        request = partial(self.client.post, self.url, {'users': users}, format='json')
+        response = auth_and_request(self.client, self.lecturer_1, request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([outcome['outcome'] for outcome in response.data],
+                         ['added', 'added', 'already_member', 'not_found'])
+        self.assertEqual(set(self.test_course.users.all()),
+                         {self.lecturer_1, self.lecturer_2, self.student_1, self.student_2})
+
+    def test_users_are_resolved_in_constant_number_of_queries(self):
+        users = [self.student_1.pk, self.lecturer_2.username, self.student_2.pk]
+        request = partial(self.client.post, self.url, {'users': users}, format='json')
+        #  Course, users, existing memberships, insert inside transaction
+        with self.assertNumQueries(6):
+            auth_and_request(self.client, self.lecturer_1, request)
+
+    def test_lecturer_member_can_delete_students_but_not_lecturers(self):
+        users = [self.student_2.pk, self.lecturer_1.pk, self.student_1.username]
+        request = partial(self.client.delete, self.url, {'users': users}, format='json')
+        response = auth_and_request(self.client, self.lecturer_1, request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([outcome['outcome'] for outcome in response.data], ['removed', 'forbidden', 'not_member'])
+        self.assertEqual(list(self.test_course.users.all()), [self.lecturer_1])
+
+    def test_student_member_cannot_add_users(self):
+        request = partial(self.client.post, self.url, {'users': [self.student_1.pk]}, format='json')
+        response = auth_and_request(self.client, self.student_2, request)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_lecturer_stranger_cannot_add_users_to_inaccessible_course(self):
+        request = partial(self.client.post, self.url, {'users': [self.student_1.pk]}, format='json')
+        response = auth_and_request(self.client, self.lecturer_2, request)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_users_are_rejected(self):
+        request = partial(self.client.post, self.url, {'users': [{'pk': 1}]}, format='json')
+        response = auth_and_request(self.client, self.lecturer_1, request)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestGradebookCourses(CoursesTest):
+    """
+    /courses/<course_id>/gradebook endpoint test
+    """
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        lecture = models.Lecture.objects.create(theme='lecture', course=cls.test_course)
+        hometask = models.Hometask.objects.create(task='task', lecture=lecture)
+        cls.graded = models.FinishedTask.objects.create(task=hometask, user=cls.student_1, answer='answer', result=10)
+        cls.ungraded = models.FinishedTask.objects.create(task=hometask, user=cls.student_2, answer='answer')
+        cls.url = reverse('courses-gradebook', args=[cls.test_course.pk])
+
+    # =======================================================
+    #                      GET
+    # =======================================================
+
+    def test_lecturer_member_can_export_csv(self):
+        request = partial(self.client.get, self.url)
+        response = auth_and_request(self.client, self.lecturer_1, request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(b''.join(response.streaming_content).decode().splitlines(), [
+            'finished_task,lecture,theme,hometask,user,username,result',
+            f'{self.graded.pk},1,lecture,1,{self.student_1.pk},student_1,10',
+            f'{self.ungraded.pk},1,lecture,1,{self.student_2.pk},student_2,',
+        ])
+
+    def test_formulas_are_not_exported_to_csv(self):
+        hometask = models.Hometask.objects.get()
+        for username in ['=HYPERLINK("http://example.com")', '+1', '-1', '@SUM(A1)', '\tx', '\rx']:
+            user = models.User.objects.create_user(username=username, password='password', role='S')
+            models.FinishedTask.objects.create(task=hometask, user=user, answer='answer', result=-1)
+        request = partial(self.client.get, self.url)
+        response = auth_and_request(self.client, self.lecturer_1, request)
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines(keepends=True)))
+        self.assertEqual([(row[5], row[6]) for row in rows[3:]],
+                         [('\'=HYPERLINK("http://example.com")', '-1'), ("'+1", '-1'), ("'-1", '-1'),
+                          ("'@SUM(A1)", '-1'), ("'\tx", '-1'), ("'\rx", '-1')])
+
+    def test_lecturer_member_can_export_ndjson(self):
+        request = partial(self.client.get, self.url, {'output': 'ndjson'})
+        response = auth_and_request(self.client, self.lecturer_1, request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([(row['username'], row['result']) for row in rows], [('student_1', 10), ('student_2', None)])
+
+    def test_unknown_output_is_rejected(self):
+        request = partial(self.client.get, self.url, {'output': 'xml'})
+        response = auth_and_request(self.client, self.lecturer_1, request)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_lecturer_stranger_cannot_export_inaccessible_course(self):
+        request = partial(self.client.get, self.url)
+        response = auth_and_request(self.client, self.lecturer_2, request)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_student_member_cannot_export_gradebook(self):
+        request = partial(self.client.get, self.url)
+        response = auth_and_request(self.client, self.student_1, request,
+                                    {'user': self.student_1, 'course': self.test_course})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TestCachedCourses(CoursesTest):
+    """
+    Cached responses of /courses, /courses/{id}/lectures and /lectures/{id}/hometasks
+    """
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.lecture = models.Lecture.objects.create(course=cls.test_course, theme='lecture')
+        models.Hometask.objects.create(lecture=cls.lecture, task='hometask')
+        cls.urls = [reverse('courses-list'),
+                    reverse('courses-process-child', args=[cls.test_course.pk]),
+                    reverse('lectures-process-child', args=[cls.lecture.pk])]
+
+    def setUp(self):
+        self.client.force_authenticate(self.lecturer_1)
+
+    def test_repeated_requests_do_not_hit_database(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.client.get(url)
+                self.assertEqual(second.status_code, status.HTTP_200_OK)
+                self.assertEqual(second.data, first.data)
+
+    def test_new_lecture_invalidates_lectures(self):
+        url = self.urls[1]
+        self.client.get(url)
+        self.client.post(url, {'theme': 'new'}, format='json')
+        response = self.client.get(url)
+        self.assertEqual([lecture['theme'] for lecture in response.data], ['lecture', 'new'])
+
+    def test_changed_hometask_invalidates_hometasks(self):
+        url = self.urls[2]
+        self.client.get(url)
+        models.Hometask.objects.filter(lecture=self.lecture).get().delete()
+        self.assertEqual(self.client.get(url).data, [])
+
+    def test_renamed_course_invalidates_courses(self):
+        self.client.get(self.urls[0])
+        self.client.patch(reverse('courses-detail', args=[self.test_course.pk]), {'title': 'new'}, format='json')
+        self.assertEqual([course['title'] for course in self.client.get(self.urls[0]).data], ['new'])
+
+    def test_membership_invalidates_courses(self):
+        for url in self.urls:
+            self.client.get(url)
+        models.Membership.objects.filter(user=self.lecturer_1).delete()
+        self.assertEqual(self.client.get(self.urls[0]).data, [])
+        for url in self.urls[1:]:
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_bulk_membership_invalidates_courses(self):
+        self.client.force_authenticate(self.lecturer_2)
+        self.assertEqual(self.client.get(self.urls[0]).data, [])
+        self.client.force_authenticate(self.lecturer_1)
+        url = reverse('courses-move-users', args=[self.test_course.pk])
+        self.client.post(url, {'users': [self.lecturer_2.pk]}, format='json')
+        self.client.force_authenticate(self.lecturer_2)
+        self.assertEqual(len(self.client.get(self.urls[0]).data), 1)
+
+
+class TestImportCourses(CoursesTest):
+    """
+    /courses/import endpoint tests
+    """
+    def setUp(self):
+        self.url = reverse('courses-import')
+
+    @staticmethod
+    def tree(lectures: int, hometasks: int) -> dict:
+        return {'title': 'imported', 'lectures': [
+            {'theme': f'lecture {i}', 'hometasks': [{'task': f'task {i}.{j}'} for j in range(hometasks)]}
+            for i in range(lectures)]}
+
+    def import_tree(self, tree, user=None):
+        request = partial(self.client.post, self.url, tree, format='json')
+        return auth_and_request(self.client, user or self.lecturer_1, request)
+
+    # =======================================================
+    #                      POST
+    # =======================================================
+
+    def test_lecturer_can_import_course_tree(self):
+        response = self.import_tree(self.tree(2, 3))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        course = models.Course.objects.get(pk=response.data['id'])
+        self.assertEqual(course.lectures_count, 2)
+        self.assertTrue(models.Membership.objects.filter(user=self.lecturer_1, course=course).exists())
+        for lecture_data in response.data['lectures']:
+            lecture = models.Lecture.objects.get(pk=lecture_data['id'], course=course)
+            self.assertEqual(lecture.theme, lecture_data['theme'])
+            self.assertEqual(lecture.hometasks_count, 3)
+            hometasks = lecture.hometasks.filter(course=course).order_by('pk').values_list('pk', 'task')
+            self.assertEqual([(hometask['id'], hometask['task']) for hometask in lecture_data['hometasks']],
+                             list(hometasks))
+        self.assertEqual(response.data['lectures'][1]['hometasks'][2]['task'], 'task 1.2')
+
+    def test_imported_tree_is_available(self):
+        response = self.import_tree(self.tree(1, 1))
+        lecture = response.data['lectures'][0]
+        url = reverse('lectures-process-child', args=[lecture['id']])
+        response = self.client.get(url)
+        self.assertEqual([hometask['id'] for hometask in response.data], [lecture['hometasks'][0]['id']])
+
+    def test_course_tree_is_imported_in_constant_number_of_queries(self):
+        self.client.force_authenticate(self.lecturer_1)
+        with self.assertNumQueries(8):
+            self.client.post(self.url, self.tree(1, 1), format='json')
+        with self.assertNumQueries(8):
+            self.client.post(self.url, self.tree(20, 5), format='json')
+
+    def test_invalid_tree_is_not_imported(self):
+        tree = self.tree(2, 2)
+        tree['lectures'][1]['hometasks'][0]['task'] = ''
+        response = self.import_tree(tree)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(models.Course.objects.filter(title='imported').exists())
+
+    @override_settings(API_IMPORT_MAX_NODES=5)
+    def test_too_large_tree_is_not_imported(self):
+        response = self.import_tree(self.tree(2, 2))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(models.Course.objects.filter(title='imported').exists())
+
+    def test_student_cannot_import_course_tree(self):
+        response = self.import_tree(self.tree(1, 1), self.student_1)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,86 @@
+"""
+Routing of API reads to replicas. Primary is used as the only 'replica' here: router returns its alias
+for replica reads and None for primary ones, so decisions are told apart while queries keep working
+"""
+from unittest import mock
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from api import models
+from api.utils import db_router
+from .utils import BaseTestCase
+
+REPLICA, PRIMARY = 'default', None
+
+
+@override_settings(DATABASE_ROUTERS=['api.utils.db_router.ReplicaRouter'], API_READ_REPLICAS=['default'])
+class TestReplicaRouter(BaseTestCase):
+    def setUp(self):
+        self.client.force_authenticate(self.lecturer_1)
+        self.url = reverse('courses-detail', args=[self.test_course.pk])
+
+    def routes(self, request) -> tuple:
+        """
+        Response of request and (model, database) pairs its reads were routed to
+        """
+        routes = []
+        db_for_read = db_router.ReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            routes.append((model, db_for_read(router, model, **hints)))
+            return routes[-1][1]
+
+        with mock.patch.object(db_router.ReplicaRouter, 'db_for_read', spy):
+            response = request()
+        return response, set(routes)
+
+    def reads(self, request) -> set:
+        """
+        Databases which reads of request were routed to
+        """
+        response, routes = self.routes(request)
+        self.assertLess(response.status_code, status.HTTP_400_BAD_REQUEST)
+        return {database for _, database in routes}
+
+    def test_safe_requests_read_from_replicas(self):
+        self.assertEqual(self.reads(lambda: self.client.get(self.url)), {REPLICA})
+
+    def test_writes_read_from_primary(self):
+        self.assertEqual(self.reads(lambda: self.client.patch(self.url, {'title': 'new'}, format='json')),
+                         {PRIMARY})
+
+    def test_writer_reads_from_primary_for_a_while(self):
+        self.client.patch(self.url, {'title': 'new'}, format='json')
+        self.assertEqual(self.reads(lambda: self.client.get(self.url)), {PRIMARY})
+        self.client.force_authenticate(self.lecturer_2)
+        self.assertEqual(self.reads(lambda: self.client.get(reverse('lectures-list'))), {REPLICA})
+
+    def test_response_cache_is_filled_from_primary(self):
+        url = reverse('courses-list')
+        self.assertEqual(self.reads(lambda: self.client.get(url)), {PRIMARY})
+        self.assertEqual(self.reads(lambda: self.client.get(url)), set())
+
+    def test_removed_member_is_not_served_from_cache(self):
+        models.Membership.objects.create(user=self.student_1, course=self.test_course)
+        url = reverse('courses-process-child', args=[self.test_course.pk])
+        self.client.get(url)
+        self.client.delete(reverse('courses-move-user', args=[self.test_course.pk]), {'pk': self.student_1.pk},
+                           format='json')
+        self.client.force_authenticate(self.student_1)
+        response, routes = self.routes(lambda: self.client.get(url))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        #  Memberships which replica may still have aren't cached for later requests
+        self.assertNotIn((models.Membership, REPLICA), routes)
+
+    def test_reads_outside_requests_go_to_primary(self):
+        self.assertIsNone(db_router.ReplicaRouter().db_for_read(None))
+
+    def test_routing_state_is_reset_after_request(self):
+        self.client.get(self.url)
+        self.assertIsNone(db_router._request_state.get())
+
+    def test_replicas_are_not_migrated(self):
+        router = db_router.ReplicaRouter()
+        with self.settings(API_READ_REPLICAS=['replica_1']):
+            self.assertFalse(router.allow_migrate('replica_1', 'api'))
+            self.assertTrue(router.allow_migrate('default', 'api'))
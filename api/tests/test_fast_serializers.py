@@ -0,0 +1,71 @@
+"""
+Listings built by fast serializers are byte-identical to ones built by ModelSerializers
+"""
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import serializers as drf_serializers
+from api import models, serializers
+from api.utils.cache import get_cache
+from api.utils.fast_serializers import compile_serializer
+from .utils import BaseTestCase
+
+
+class TestFastSerializers(BaseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        models.Membership.objects.create(user=cls.student_1, course=cls.test_course)
+        cls.lecture = models.Lecture.objects.create(course=cls.test_course, theme='with presentation')
+        models.Lecture.objects.filter(pk=cls.lecture.pk).update(presentation='presentations/ab/ab.pdf')
+        models.Lecture.objects.create(course=cls.test_course, theme='without presentation')
+        cls.hometask = models.Hometask.objects.create(lecture=cls.lecture, task='task')
+        cls.finished_task = models.FinishedTask.objects.create(task=cls.hometask, user=cls.student_1, answer='answer')
+        models.FinishedTask.objects.create(task=cls.hometask, user=cls.student_2, answer='graded', result=5)
+        models.Comment.objects.create(finished_task=cls.finished_task, user=cls.student_1, comment='comment')
+
+    def get(self, url: str, fast: bool) -> bytes:
+        #  Otherwise the second listing would be served from response cache
+        get_cache().clear()
+        with override_settings(API_FAST_LISTINGS=fast):
+            response = self.client.get(url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.content
+
+    def assertSameListing(self, user, url):
+        self.client.force_authenticate(user)
+        self.assertEqual(self.get(url, fast=True), self.get(url, fast=False))
+
+    def test_serializers_of_listings_are_compiled(self):
+        for serializer_class in (serializers.CourseSerializer, serializers.LectureSerializer,
+                                 serializers.HometaskSerializer, serializers.FinishedTaskSerializer,
+                                 serializers.CommentSerializer):
+            with self.subTest(serializer=serializer_class.__name__):
+                self.assertIsNotNone(compile_serializer(serializer_class))
+
+    def test_serializer_with_method_field_is_not_compiled(self):
+        class MethodSerializer(drf_serializers.ModelSerializer):
+            title = drf_serializers.SerializerMethodField()
+
+            class Meta:
+                model = models.Course
+                fields = ['id', 'title']
+
+        self.assertIsNone(compile_serializer(MethodSerializer))
+
+    def test_presentation_is_absolute_url(self):
+        self.client.force_authenticate(self.lecturer_1)
+        self.assertIn(b'"http://testserver/media/presentations/ab/ab.pdf"', self.get(reverse('lectures-list'), True))
+
+    def test_lists_are_identical(self):
+        for route in ('courses-list', 'lectures-list', 'hometasks-list', 'finished_tasks-list', 'comments-list'):
+            with self.subTest(route=route):
+                self.assertSameListing(self.lecturer_1, reverse(route))
+
+    def test_children_are_identical(self):
+        self.assertSameListing(self.lecturer_1, reverse('courses-process-child', args=[self.test_course.pk]))
+        self.assertSameListing(self.lecturer_1, reverse('lectures-process-child', args=[self.lecture.pk]))
+        self.assertSameListing(self.lecturer_1, reverse('hometasks-process-child', args=[self.hometask.pk]))
+        self.assertSameListing(self.student_1, reverse('finished_tasks-process-child', args=[self.finished_task.pk]))
+
+    def test_pages_are_identical(self):
+        self.assertSameListing(self.lecturer_1, reverse('lectures-list') + '?page_size=1')
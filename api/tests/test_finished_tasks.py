@@ -1,3 +1,5 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from functools import partial
@@ -174,6 +176,48 @@ class TestDetailFinishedTasks(FinishedTasksTest):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
 
+class TestSparseFieldsFinishedTasks(FinishedTasksTest):
+    """
+    ?fields= query parameter of finished tasks
+    """
+    def get(self, url, fields):
+        self.client.force_authenticate(self.lecturer_1)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, {'fields': fields})
+        answer_read = any('"answer"' in query['sql'] for query in context.captured_queries)
+        return response, answer_read
+
+    def test_list_returns_requested_fields_only(self):
+        response, answer_read = self.get(reverse('finished_tasks-list'), 'id,result')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [{'id': self.test_finished_task.pk, 'result': None}])
+        self.assertFalse(answer_read)
+
+    def test_retrieve_returns_requested_fields_only(self):
+        response, answer_read = self.get(reverse('finished_tasks-detail', args=[self.test_finished_task.pk]),
+                                         'result,task')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(dict(response.data), {'task': self.test_hometask.pk, 'result': None})
+        self.assertFalse(answer_read)
+
+    def test_children_return_requested_fields_only(self):
+        response, _ = self.get(reverse('hometasks-process-child', args=[self.test_hometask.pk]), 'id')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [{'id': self.test_finished_task.pk}])
+
+    def test_unknown_fields_are_rejected(self):
+        response, _ = self.get(reverse('finished_tasks-list'), 'id,grade')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('grade', response.data['fields'])
+
+    def test_writes_return_all_fields(self):
+        self.client.force_authenticate(self.lecturer_1)
+        url = reverse('hometasks-detail', args=[self.test_hometask.pk])
+        response = self.client.patch(f'{url}?fields=id', {'task': 'new'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data), {'id', 'task', 'lecture'})
+
+
 class TestFinishedTasksComments(FinishedTasksTest):
     """
     /finished_tasks/<id>/comments endpoint test
@@ -246,3 +290,59 @@ class TestFinishedTasksComments(FinishedTasksTest):
         request = partial(self.client.get, self.url)
         response = auth_and_request(self.client, self.student_2, request)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestGradeFinishedTasks(FinishedTasksTest):
+    """
+    /finished_tasks/results endpoint test
+    """
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.another_finished_task = models.FinishedTask.objects.create(task=cls.test_hometask, user=cls.student_2,
+                                                                       answer='test')
+        cls.url = reverse('finished_tasks-grade')
+        cls.results = [{'id': cls.test_finished_task.pk, 'result': 10},
+                       {'id': cls.another_finished_task.pk, 'result': 5}]
+
+    # =======================================================
+    #                      PATCH
+    # =======================================================
+
+    def test_lecturer_member_can_set_results_for_available_finished_tasks(self):
+        request = partial(self.client.patch, self.url, self.results, format='json')
+        response = auth_and_request(self.client, self.lecturer_1, request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertCountEqual(response.data, self.results)
+        self.assertEqual(sorted(models.FinishedTask.objects.values_list('result', flat=True)), [5, 10])
+
+    def test_results_are_set_in_constant_number_of_queries(self):
+        request = partial(self.client.patch, self.url, self.results, format='json')
+        #  Claims, finished tasks, update, counters of hometasks and rollups of analytics inside transaction
+        with self.assertNumQueries(10):
+            auth_and_request(self.client, self.lecturer_1, request)
+
+    def test_results_change_etag_of_finished_task(self):
+        self.client.force_authenticate(self.lecturer_1)
+        detail_url = reverse('finished_tasks-detail', args=[self.test_finished_task.pk])
+        etag = self.client.get(detail_url)['ETag']
+        self.client.patch(self.url, self.results, format='json')
+        response = self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['result'], 10)
+
+    def test_nothing_is_updated_if_any_finished_task_is_inaccessible(self):
+        request = partial(self.client.patch, self.url, [*self.results, {'id': 100, 'result': 1}], format='json')
+        response = auth_and_request(self.client, self.lecturer_1, request)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(models.FinishedTask.objects.filter(result__isnull=False).exists())
+
+    def test_lecturer_stranger_cannot_set_results_for_inaccessible_finished_tasks(self):
+        request = partial(self.client.patch, self.url, self.results, format='json')
+        response = auth_and_request(self.client, self.lecturer_2, request)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_student_cannot_set_results(self):
+        request = partial(self.client.patch, self.url, self.results, format='json')
+        response = auth_and_request(self.client, self.student_1, request)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,131 @@
+from datetime import timedelta
+from unittest import mock
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from functools import partial
+from .utils import BaseTestCase, auth_and_request
+from api import models, serializers
+from api.utils import grading_queue
+
+
+class TestGradingQueue(BaseTestCase):
+    """
+    /finished_tasks/queue endpoints tests
+    """
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        models.Membership.objects.create(user=cls.lecturer_2, course=cls.test_course)
+        models.Membership.objects.create(user=cls.student_1, course=cls.test_course)
+        cls.test_lecture = models.Lecture.objects.create(course=cls.test_course, theme='test')
+        cls.test_hometask = models.Hometask.objects.create(lecture=cls.test_lecture, task='test')
+        cls.finished_tasks = [models.FinishedTask.objects.create(task=cls.test_hometask, user=cls.student_1,
+                                                                 answer=f'answer {i}') for i in range(4)]
+        models.FinishedTask.objects.filter(pk=cls.finished_tasks[0].pk).update(result=5)
+        cls.ungraded_ids = [finished_task.pk for finished_task in cls.finished_tasks[1:]]
+        cls.queue_url = reverse('finished_tasks-queue')
+        cls.claim_url = reverse('finished_tasks-claim')
+
+    def claim(self, user, limit: int):
+        request = partial(self.client.post, self.claim_url, {'limit': limit}, format='json')
+        response = auth_and_request(self.client, user, request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [finished_task['id'] for finished_task in response.data]
+
+    # =======================================================
+    #                      GET
+    # =======================================================
+
+    def test_queue_lists_the_oldest_ungraded_finished_tasks(self):
+        request = partial(self.client.get, self.queue_url, {'limit': 2})
+        response = auth_and_request(self.client, self.lecturer_1, request)
+        self.assertEqual([finished_task['id'] for finished_task in response.data], self.ungraded_ids[:2])
+
+    def test_listing_queue_does_not_claim(self):
+        auth_and_request(self.client, self.lecturer_1, partial(self.client.get, self.queue_url))
+        self.assertEqual(self.claim(self.lecturer_2, 10), self.ungraded_ids)
+
+    def test_lecturer_stranger_has_empty_queue(self):
+        models.Membership.objects.filter(user=self.lecturer_2).delete()
+        response = auth_and_request(self.client, self.lecturer_2, partial(self.client.get, self.queue_url))
+        self.assertEqual(response.data, [])
+
+    def test_student_cannot_see_queue(self):
+        response = auth_and_request(self.client, self.student_1, partial(self.client.get, self.queue_url))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    # =======================================================
+    #                      POST
+    # =======================================================
+
+    def test_graders_claim_different_finished_tasks(self):
+        self.assertEqual(self.claim(self.lecturer_1, 2), self.ungraded_ids[:2])
+        self.assertEqual(self.claim(self.lecturer_2, 2), self.ungraded_ids[2:])
+        self.assertEqual(self.claim(self.lecturer_2, 2), self.ungraded_ids[2:])
+
+    def test_claims_are_renewed(self):
+        self.claim(self.lecturer_1, 1)
+        models.FinishedTask.objects.update(claimed_until=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(self.claim(self.lecturer_1, 1), self.ungraded_ids[:1])
+        claimed_until = models.FinishedTask.objects.get(pk=self.ungraded_ids[0]).claimed_until
+        self.assertGreater(claimed_until, timezone.now() + timedelta(seconds=60))
+
+    def test_expired_claims_are_taken_by_other_graders(self):
+        self.claim(self.lecturer_1, 3)
+        models.FinishedTask.objects.update(claimed_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.claim(self.lecturer_2, 1), self.ungraded_ids[:1])
+
+    # =======================================================
+    #                      DELETE
+    # =======================================================
+
+    def test_released_finished_tasks_return_to_queue(self):
+        self.claim(self.lecturer_1, 3)
+        request = partial(self.client.delete, self.claim_url, {'ids': self.ungraded_ids[:1]}, format='json')
+        response = auth_and_request(self.client, self.lecturer_1, request)
+        self.assertEqual(response.data, {'released': 1})
+        self.assertEqual(self.claim(self.lecturer_2, 3), self.ungraded_ids[:1])
+        response = auth_and_request(self.client, self.lecturer_1, partial(self.client.delete, self.claim_url))
+        self.assertEqual(response.data, {'released': 2})
+
+    # =======================================================
+    #                      Grading
+    # =======================================================
+
+    def test_graded_finished_tasks_leave_queue(self):
+        self.claim(self.lecturer_1, 1)
+        request = partial(self.client.patch, reverse('finished_tasks-grade'),
+                          [{'id': self.ungraded_ids[0], 'result': 4}], format='json')
+        response = auth_and_request(self.client, self.lecturer_1, request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(models.FinishedTask.objects.filter(claimed_by__isnull=False).exists())
+        self.assertEqual(self.claim(self.lecturer_1, 10), self.ungraded_ids[1:])
+
+    def test_finished_task_claimed_by_another_grader_cannot_be_graded(self):
+        self.claim(self.lecturer_1, 1)
+        url = reverse('finished_tasks-detail', args=[self.ungraded_ids[0]])
+        response = auth_and_request(self.client, self.lecturer_2, partial(self.client.patch, url, {'result': 4}))
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        request = partial(self.client.patch, reverse('finished_tasks-grade'),
+                          [{'id': self.ungraded_ids[0], 'result': 4}], format='json')
+        self.assertEqual(request().status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(models.FinishedTask.objects.filter(pk=self.ungraded_ids[0], result__isnull=False).exists())
+        response = auth_and_request(self.client, self.lecturer_1, partial(self.client.patch, url, {'result': 4}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_finished_task_being_graded_is_not_claimed_by_another_grader(self):
+        url = reverse('finished_tasks-detail', args=[self.ungraded_ids[0]])
+        claimed = []
+
+        def validate(serializer, attrs):
+            #  Another grader claims tasks while the first one is grading
+            claimed.extend(finished_task.pk for finished_task in grading_queue.claim(self.lecturer_2, 10))
+            return attrs
+
+        with mock.patch.object(serializers.FinishedTaskResultSerializer, 'validate', validate):
+            response = auth_and_request(self.client, self.lecturer_1, partial(self.client.patch, url, {'result': 4}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(claimed, self.ungraded_ids[1:])
+        self.assertEqual(list(models.FinishedTask.objects.filter(claimed_by=self.lecturer_2)
+                              .order_by('pk').values_list('pk', flat=True)), self.ungraded_ids[1:])
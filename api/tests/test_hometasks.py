@@ -255,3 +255,47 @@ class TestHometasksFinishedTasks(HometasksTest):
         request = partial(self.client.get, self.url)
         response = auth_and_request(self.client, self.student_2, request)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestSubmitHometasks(HometasksTest):
+    """
+    /hometasks/finished_tasks endpoint test
+    """
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.another_hometask = models.Hometask.objects.create(lecture=cls.test_lecture, task='another')
+        cls.url = reverse('hometasks-submit')
+        cls.submissions = [{'task': cls.test_hometask.pk, 'answer': 'first'},
+                           {'task': cls.another_hometask.pk, 'answer': 'second'}]
+
+    # =======================================================
+    #                      POST
+    # =======================================================
+
+    def test_student_member_can_submit_several_finished_tasks(self):
+        request = partial(self.client.post, self.url, self.submissions, format='json')
+        response = auth_and_request(self.client, self.student_1, request,
+                                    {'user': self.student_1, 'course': self.test_course})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data, [{**submission, 'id': pk, 'user': self.student_1.pk, 'result': None}
+                                         for pk, submission in enumerate(self.submissions, start=1)])
+        self.assertEqual(set(models.FinishedTask.objects.values_list('course', flat=True)), {self.test_course.pk})
+
+    def test_nothing_is_created_if_any_hometask_is_inaccessible(self):
+        request = partial(self.client.post, self.url, [*self.submissions, {'task': 100, 'answer': 'third'}],
+                          format='json')
+        response = auth_and_request(self.client, self.student_1, request,
+                                    {'user': self.student_1, 'course': self.test_course})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(models.FinishedTask.objects.exists())
+
+    def test_student_stranger_cannot_submit_finished_tasks(self):
+        request = partial(self.client.post, self.url, self.submissions, format='json')
+        response = auth_and_request(self.client, self.student_1, request)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_lecturer_cannot_submit_finished_tasks(self):
+        request = partial(self.client.post, self.url, self.submissions, format='json')
+        response = auth_and_request(self.client, self.lecturer_1, request)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -1,8 +1,26 @@
+import hashlib
+import os
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
+from rest_framework.permissions import BasePermission
+from rest_framework.test import APITransactionTestCase
 from functools import partial
-from .utils import BaseTestCase, auth_and_request
-from api import models
+from .utils import BaseTestCase, TemporaryMediaMixin, auth_and_request
+from api import models, views
+from api.utils import uploads
+
+
+class DenyObjects(BasePermission):
+    def has_object_permission(self, request, view, obj):
+        return False
 
 
 class LecturesTest(BaseTestCase):
@@ -240,3 +258,439 @@ class TestHometasksLectures(LecturesTest):
         request = partial(self.client.get, self.url)
         response = auth_and_request(self.client, self.student_2, request)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_lecturer_member_can_list_hometasks_of_lecture_without_hometasks(self):
+        lecture = models.Lecture.objects.create(course=self.test_course, theme='empty')
+        request = partial(self.client.get, reverse('lectures-process-child', args=[lecture.pk]))
+        response = auth_and_request(self.client, self.lecturer_1, request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data)
+
+    def test_lecturer_cannot_list_hometasks_of_malformed_lecture(self):
+        request = partial(self.client.get, reverse('lectures-list') + 'abc/hometasks/')
+        response = auth_and_request(self.client, self.lecturer_1, request)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestCourseOfLectureChildren(LecturesTest):
+    """
+    Denormalized course of hometasks, finished tasks and comments follows their lecture
+    """
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.test_hometask = models.Hometask.objects.create(lecture=cls.test_lecture, task='test')
+        cls.test_finished_task = models.FinishedTask.objects.create(task=cls.test_hometask, user=cls.student_1,
+                                                                    answer='test')
+        cls.test_comment = models.Comment.objects.create(finished_task=cls.test_finished_task, user=cls.student_1,
+                                                         comment='test')
+        cls.another_course = models.Course.objects.create(title='another')
+        models.Membership.objects.create(user=cls.lecturer_1, course=cls.another_course)
+        models.Membership.objects.create(user=cls.lecturer_2, course=cls.another_course)
+        cls.url = reverse('lectures-detail', args=[cls.test_lecture.pk])
+
+    def test_children_are_attached_to_course_of_lecture(self):
+        self.assertEqual(models.Hometask.objects.get().course, self.test_course)
+        self.assertEqual(models.FinishedTask.objects.get().course, self.test_course)
+        self.assertEqual(models.Comment.objects.get().course, self.test_course)
+
+    def test_children_follow_lecture_to_another_course(self):
+        request = partial(self.client.patch, self.url, {'course': self.another_course.pk}, format='json')
+        response = auth_and_request(self.client, self.lecturer_1, request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(models.Hometask.objects.get().course, self.another_course)
+        self.assertEqual(models.FinishedTask.objects.get().course, self.another_course)
+        self.assertEqual(models.Comment.objects.get().course, self.another_course)
+
+    def test_children_become_available_to_members_of_another_course(self):
+        request = partial(self.client.patch, self.url, {'course': self.another_course.pk}, format='json')
+        auth_and_request(self.client, self.lecturer_1, request)
+        request = partial(self.client.get, reverse('hometasks-detail', args=[self.test_hometask.pk]))
+        response = auth_and_request(self.client, self.lecturer_2, request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class TestConditionalLectures(LecturesTest):
+    """
+    ETag and Last-Modified of /lectures, /lectures/{id} and /lectures/{id}/hometasks
+    """
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        models.Hometask.objects.create(lecture=cls.test_lecture, task='test')
+        cls.urls = [reverse('lectures-list'),
+                    reverse('lectures-detail', args=[cls.test_lecture.pk]),
+                    reverse('lectures-process-child', args=[cls.test_lecture.pk])]
+
+    def setUp(self):
+        self.client.force_authenticate(self.lecturer_1)
+
+    # =======================================================
+    #                      GET
+    # =======================================================
+
+    def test_responses_carry_validators(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response['ETag'].startswith('W/"'))
+                self.assertIn('Last-Modified', response)
+
+    def test_fresh_etag_is_answered_without_body(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+                self.assertEqual(response['ETag'], etag)
+                self.assertEqual(response.content, b'')
+
+    def test_not_modified_doesnt_load_objects(self):
+        url = self.urls[1]
+        etag = self.client.get(url)['ETag']
+        #  Aggregate query and object for permission checks, serializer doesn't run
+        with self.assertNumQueries(2):
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_fresh_last_modified_is_answered_without_body(self):
+        last_modified = self.client.get(self.urls[1])['Last-Modified']
+        response = self.client.get(self.urls[1], HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_change_invalidates_etag(self):
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+        models.Hometask.objects.create(lecture=self.test_lecture, task='new')
+        self.test_lecture.save()
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_etag_depends_on_query(self):
+        etag = self.client.get(self.urls[0])['ETag']
+        response = self.client.get(self.urls[0], {'page_size': 1}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_stranger_doesnt_get_not_modified(self):
+        etag = self.client.get(self.urls[1])['ETag']
+        self.client.force_authenticate(self.lecturer_2)
+        response = self.client.get(self.urls[1], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_denied_object_doesnt_get_not_modified(self):
+        etag = self.client.get(self.urls[1])['ETag']
+        with mock.patch.object(views.LectureViewSet, 'permission_classes',
+                               [*views.LectureViewSet.permission_classes, DenyObjects]):
+            response = self.client.get(self.urls[1], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TestPresentationUploadLectures(TemporaryMediaMixin, LecturesTest):
+    """
+    /lectures/{id}/presentation/uploads endpoint tests
+    """
+    content = b'0123456789' * 10
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.url = reverse('lectures-start-upload', args=[cls.test_lecture.pk])
+        cls.upload_data = {'filename': '../slides.pdf', 'size': len(cls.content),
+                           'checksum': hashlib.sha256(cls.content).hexdigest()}
+
+    def setUp(self):
+        self.client.force_authenticate(self.lecturer_1)
+
+    def start(self, **data) -> str:
+        response = self.client.post(self.url, {**self.upload_data, **data}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return reverse('lectures-upload-chunk', args=[self.test_lecture.pk, response.data['id']])
+
+    def send(self, url, first, last):
+        return self.client.put(url, self.content[first:last + 1], content_type='application/octet-stream',
+                               HTTP_CONTENT_RANGE=f'bytes {first}-{last}/{len(self.content)}')
+
+    # =======================================================
+    #                      POST
+    # =======================================================
+
+    def test_lecturer_member_can_start_upload(self):
+        response = self.client.post(self.url, self.upload_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['filename'], response.data['offset']), ('slides.pdf', 0))
+        upload = models.PresentationUpload.objects.get()
+        #  Disk space is taken by chunks as they arrive
+        self.assertEqual(os.path.getsize(uploads.temp_path(upload)), 0)
+
+    def test_number_of_unfinished_uploads_is_limited(self):
+        with override_settings(PRESENTATION_UPLOAD_MAX_OPEN=2):
+            self.start()
+            self.start()
+            response = self.client.post(self.url, self.upload_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(models.PresentationUpload.objects.count(), 2)
+
+    def test_expired_uploads_are_discarded(self):
+        url = self.start()
+        self.send(url, 0, 9)
+        expired = models.PresentationUpload.objects.get()
+        models.PresentationUpload.objects.update(updated_at=timezone.now() - timedelta(days=2))
+        with override_settings(PRESENTATION_UPLOAD_MAX_OPEN=1):
+            self.start()
+        self.assertFalse(models.PresentationUpload.objects.filter(pk=expired.pk).exists())
+        self.assertFalse(os.path.exists(uploads.temp_path(expired)))
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_purge_command_discards_only_expired_uploads(self):
+        self.start()
+        self.start()
+        models.PresentationUpload.objects.filter(pk=models.PresentationUpload.objects.first().pk).update(
+            updated_at=timezone.now() - timedelta(days=2))
+        stdout = StringIO()
+        call_command('purge_uploads', stdout=stdout)
+        self.assertEqual(stdout.getvalue().strip(), 'Discarded: 1')
+        self.assertEqual(models.PresentationUpload.objects.count(), 1)
+
+    def test_too_large_upload_is_rejected(self):
+        with override_settings(PRESENTATION_UPLOAD_MAX_SIZE=10):
+            response = self.client.post(self.url, self.upload_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_student_member_cannot_start_upload(self):
+        request = partial(self.client.post, self.url, self.upload_data, format='json')
+        response = auth_and_request(self.client, self.student_1, request,
+                                    {'user': self.student_1, 'course': self.test_course})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_lecturer_stranger_cannot_start_upload(self):
+        request = partial(self.client.post, self.url, self.upload_data, format='json')
+        response = auth_and_request(self.client, self.lecturer_2, request)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    # =======================================================
+    #                      PUT
+    # =======================================================
+
+    def test_chunks_are_attached_to_lecture(self):
+        url = self.start()
+        response = self.send(url, 0, 39)
+        self.assertEqual((response.status_code, response.data['offset']), (status.HTTP_200_OK, 40))
+        response = self.send(url, 40, 99)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.test_lecture.refresh_from_db()
+        with self.test_lecture.presentation.open('rb') as presentation:
+            self.assertEqual(presentation.read(), self.content)
+        self.assertFalse(models.PresentationUpload.objects.exists())
+        response = self.client.get(reverse('lectures-presentation', args=[self.test_lecture.pk]))
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="slides.pdf"')
+
+    def test_upload_is_resumed_from_offset(self):
+        url = self.start()
+        self.send(url, 0, 49)
+        response = self.send(url, 60, 99)
+        self.assertEqual((response.status_code, response.data['offset']), (status.HTTP_409_CONFLICT, 50))
+        self.assertEqual(self.client.get(url).data['offset'], 50)
+        self.assertEqual(self.send(url, 50, 99).status_code, status.HTTP_201_CREATED)
+
+    def test_chunk_overtaken_while_received_is_not_written(self):
+        url = self.start()
+        receive_chunk = uploads.receive_chunk
+
+        def overtaken(stream, length):
+            #  The same range is accepted from another request while this chunk is still being received
+            with mock.patch.object(uploads, 'receive_chunk', receive_chunk):
+                self.assertEqual(self.send(url, 0, 49).status_code, status.HTTP_200_OK)
+            return receive_chunk(stream, length)
+
+        with mock.patch.object(uploads, 'receive_chunk', overtaken):
+            response = self.client.put(url, b'x' * 50, content_type='application/octet-stream',
+                                       HTTP_CONTENT_RANGE=f'bytes 0-49/{len(self.content)}')
+        self.assertEqual((response.status_code, response.data['offset']), (status.HTTP_409_CONFLICT, 50))
+        self.assertEqual(self.send(url, 50, 99).status_code, status.HTTP_201_CREATED)
+        self.test_lecture.refresh_from_db()
+        with self.test_lecture.presentation.open('rb') as presentation:
+            self.assertEqual(presentation.read(), self.content)
+
+    def test_incomplete_chunk_is_not_counted(self):
+        url = self.start()
+        response = self.client.put(url, self.content[:10], content_type='application/octet-stream',
+                                   HTTP_CONTENT_RANGE=f'bytes 0-49/{len(self.content)}')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url).data['offset'], 0)
+
+    def test_invalid_range_is_rejected(self):
+        url = self.start()
+        for header in ['', 'bytes 0-9/10', 'bytes 10-5/100', 'bytes 0-100/100']:
+            with self.subTest(header=header):
+                response = self.client.put(url, b'', content_type='application/octet-stream',
+                                           HTTP_CONTENT_RANGE=header)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_checksum_mismatch_discards_upload(self):
+        url = self.start(checksum='0' * 64)
+        response = self.send(url, 0, 99)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(models.PresentationUpload.objects.exists())
+        self.test_lecture.refresh_from_db()
+        self.assertFalse(self.test_lecture.presentation)
+
+    def test_another_lecturer_cannot_continue_upload(self):
+        url = self.start()
+        models.Membership.objects.create(user=self.lecturer_2, course=self.test_course)
+        self.client.force_authenticate(self.lecturer_2)
+        self.assertEqual(self.send(url, 0, 99).status_code, status.HTTP_404_NOT_FOUND)
+
+    # =======================================================
+    #                      DELETE
+    # =======================================================
+
+    def test_cancelled_upload_is_discarded(self):
+        url = self.start()
+        path = uploads.temp_path(models.PresentationUpload.objects.get())
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(os.path.exists(path))
+
+
+class TestPresentationDownloadLectures(TemporaryMediaMixin, LecturesTest):
+    """
+    /lectures/{id}/presentation endpoint tests
+    """
+    content = b'0123456789' * 10
+
+    def setUp(self):
+        self.test_lecture.presentation.save('slides.pdf', ContentFile(self.content))
+        self.addCleanup(self.test_lecture.presentation.delete, save=False)
+        self.url = reverse('lectures-presentation', args=[self.test_lecture.pk])
+        self.client.force_authenticate(self.lecturer_1)
+
+    # =======================================================
+    #                      GET
+    # =======================================================
+
+    def test_lecturer_member_can_download_presentation(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_presentation_is_downloaded_under_original_name(self):
+        response = self.client.patch(reverse('lectures-detail', args=[self.test_lecture.pk]),
+                                     {'presentation': SimpleUploadedFile('Lecture 1.pdf', self.content)},
+                                     format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(self.url)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="Lecture 1.pdf"')
+
+    def test_student_member_can_download_presentation(self):
+        request = partial(self.client.get, self.url)
+        response = auth_and_request(self.client, self.student_1, request,
+                                    {'user': self.student_1, 'course': self.test_course})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_stranger_cannot_download_presentation(self):
+        request = partial(self.client.get, self.url)
+        response = auth_and_request(self.client, self.student_2, request)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_lecture_without_presentation(self):
+        self.test_lecture.presentation.delete()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_any_media_type_is_accepted(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='application/pdf')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_range_is_served_partially(self):
+        for header, first, last in [('bytes=10-19', 10, 19), ('bytes=90-', 90, 99), ('bytes=-5', 95, 99),
+                                    ('bytes=95-200', 95, 99)]:
+            with self.subTest(header=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+                self.assertEqual(response['Content-Range'], f'bytes {first}-{last}/100')
+                self.assertEqual(b''.join(response.streaming_content), self.content[first:last + 1])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_stale_if_range_gets_whole_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+
+    def test_fresh_etag_is_answered_without_body(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_download_is_handed_off_to_web_server(self):
+        with override_settings(PRESENTATION_SENDFILE_HEADER='X-Accel-Redirect'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected/{self.test_lecture.presentation.name}')
+        self.assertEqual(response.content, b'')
+        with override_settings(PRESENTATION_SENDFILE_HEADER='X-Sendfile'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], self.test_lecture.presentation.path)
+
+
+class TestPresentationStorageLectures(TemporaryMediaMixin, APITransactionTestCase):
+    """
+    Deduplicated storage of presentations. Blobs are collected after commit, so transactions are not rolled back
+    """
+    content = b'slides' * 100
+
+    def setUp(self):
+        self.course = models.Course.objects.create(title='test')
+        self.lectures = [models.Lecture.objects.create(course=self.course, theme=str(i)) for i in range(2)]
+        for lecture in self.lectures:
+            lecture.presentation.save('slides.pdf', ContentFile(self.content))
+
+    def test_identical_presentations_are_stored_once(self):
+        names = {lecture.presentation.name for lecture in self.lectures}
+        self.assertEqual(names, {f'presentations/{hashlib.sha256(self.content).hexdigest()[:2]}/'
+                                 f'{hashlib.sha256(self.content).hexdigest()}.pdf'})
+        self.assertEqual(models.PresentationBlob.objects.get().references, 2)
+
+    def test_blob_is_kept_while_referred_to(self):
+        path = self.lectures[0].presentation.path
+        self.lectures[0].delete()
+        self.assertTrue(os.path.exists(path))
+        self.lectures[1].presentation.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(models.PresentationBlob.objects.exists())
+
+    def test_replaced_presentation_is_released(self):
+        path = self.lectures[0].presentation.path
+        for lecture in self.lectures:
+            lecture.presentation.save('other.pdf', ContentFile(b'other'))
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(models.PresentationBlob.objects.get().references, 2)
+
+    def test_missing_blob_is_written_again(self):
+        path = self.lectures[0].presentation.path
+        os.remove(path)
+        lecture = models.Lecture.objects.create(course=self.course, theme='new')
+        lecture.presentation.save('slides.pdf', ContentFile(self.content))
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(), self.content)
+        self.assertEqual(models.PresentationBlob.objects.get().references, 3)
+
+    def test_collected_blob_is_kept_once_retained_again(self):
+        name = self.lectures[0].presentation.name
+        storage = self.lectures[0].presentation.storage
+        models.PresentationBlob.objects.update(references=0)
+        storage.retain(name)
+        storage.collect(name)
+        self.assertTrue(os.path.exists(self.lectures[0].presentation.path))
+        self.assertEqual(models.PresentationBlob.objects.get().references, 1)
+
+    def test_blob_is_collected_when_course_is_deleted(self):
+        path = self.lectures[0].presentation.path
+        self.course.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(models.PresentationBlob.objects.exists())
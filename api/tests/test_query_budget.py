@@ -0,0 +1,257 @@
+"""
+Query-count and wall time budget of every API route
+
+Routes are requested against large fixture, so N+1 regression in serializer or 'get_queryset' shows up as
+exceeded query budget. Fixture size is set by API_BUDGET_SCALE environment variable:
+'small' (default, fast enough for every test run) or 'full' (50 courses x 20 lectures x 10 hometasks x
+30 finished tasks). Wall time bound (in seconds) is set by API_BUDGET_SECONDS.
+"""
+import os
+import time
+from typing import Callable, NamedTuple, Optional
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from api import models
+from api.urls import router
+from api.utils.authentication import issue_token
+from api.utils import analytics, uploads
+from api.utils.cache import get_cache
+from .utils import BaseTestCase, TemporaryMediaMixin
+
+SCALES = {
+    #  courses, lectures per course, hometasks per lecture, students (finished tasks per hometask)
+    'small': (3, 4, 3, 10),
+    'full': (50, 20, 10, 30),
+}
+COURSES, LECTURES, HOMETASKS, STUDENTS = SCALES[os.environ.get('API_BUDGET_SCALE', 'small')]
+SECONDS = float(os.environ.get('API_BUDGET_SECONDS', 1))
+
+
+class Case(NamedTuple):
+    route: str
+    method: str
+    user: str
+    budget: int
+    #  Returns url args and request data. Runs before queries are counted
+    prepare: Callable[['TestQueryBudget'], tuple] = lambda test: ((), None)
+    token: bool = False
+    #  Raw request body is sent with this content type instead of JSON
+    content_type: Optional[str] = None
+    headers: dict = {}
+    #  Expected status of response
+    status_code: int = status.HTTP_200_OK
+    #  Rejected requests are named to tell them from regular request of the same route
+    name: Optional[str] = None
+
+
+def seed(lecturer, student):
+    """
+    Create courses tree with bulk inserts. Primary keys are not returned by bulk_create on SQLite,
+    so every level is queried back. Denormalized 'course_id' is set explicitly and rollups of analytics are rebuilt,
+    as bulk_create doesn't send signals
+    """
+    models.User.objects.bulk_create(
+        models.User(username=f'budget_student_{i}', password=make_password(None), role=models.User.STUDENT)
+        for i in range(STUDENTS - 1))
+    students = [student, *models.User.objects.filter(username__startswith='budget_student_')]
+    models.Course.objects.bulk_create(models.Course(title=f'course {i}') for i in range(COURSES))
+    courses = list(models.Course.objects.order_by('-pk')[:COURSES])[::-1]
+    models.Membership.objects.bulk_create(models.Membership(user=user, course=course)
+                                          for course in courses for user in [lecturer, *students])
+    models.Lecture.objects.bulk_create(models.Lecture(theme=f'lecture {i}', course=course)
+                                       for course in courses for i in range(LECTURES))
+    lectures = models.Lecture.objects.filter(course__in=courses).order_by('pk')
+    models.Hometask.objects.bulk_create(models.Hometask(task=f'hometask {i}', lecture=lecture,
+                                                        course_id=lecture.course_id)
+                                        for lecture in lectures for i in range(HOMETASKS))
+    hometasks = models.Hometask.objects.filter(course__in=courses)
+    models.FinishedTask.objects.bulk_create(models.FinishedTask(task=hometask, user=user, answer='answer',
+                                                                course_id=hometask.course_id)
+                                            for hometask in hometasks for user in students)
+    finished_tasks = models.FinishedTask.objects.filter(task__lecture=lectures[0])
+    models.Comment.objects.bulk_create(models.Comment(finished_task=finished_task, user=user, comment='comment',
+                                                      course_id=finished_task.course_id)
+                                       for finished_task in finished_tasks for user in (lecturer, student))
+    analytics.rebuild(course.pk for course in courses)
+    return courses[0]
+
+
+class TestQueryBudget(TemporaryMediaMixin, BaseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.course = seed(cls.lecturer_1, cls.student_1)
+        cls.lecture = cls.course.lectures.first()
+        cls.hometask = cls.lecture.hometasks.first()
+        cls.finished_task = cls.hometask.finished_tasks.get(user=cls.student_1)
+        cls.comment = cls.finished_task.comments.get(user=cls.student_1)
+
+    # =======================================================
+    #           Small objects for destructive requests
+    # =======================================================
+
+    def new_course(self):
+        course = models.Course.objects.create(title='new')
+        models.Membership.objects.create(user=self.lecturer_1, course=course)
+        return course
+
+    def new_lecture(self):
+        return models.Lecture.objects.create(course=self.course, theme='new')
+
+    def new_presentation(self):
+        lecture = self.new_lecture()
+        lecture.presentation.save('slides.pdf', ContentFile(b'slides'))
+        return lecture
+
+    def new_hometask(self):
+        return models.Hometask.objects.create(lecture=self.lecture, task='new')
+
+    def new_finished_task(self):
+        return models.FinishedTask.objects.create(task=self.new_hometask(), user=self.student_1, answer='new')
+
+    def new_upload(self):
+        upload = models.PresentationUpload.objects.create(lecture=self.lecture, user=self.lecturer_1,
+                                                          filename='new', size=8)
+        uploads.allocate(upload)
+        self.addCleanup(uploads.discard, upload)
+        return upload
+
+    def new_comment(self):
+        return models.Comment.objects.create(finished_task=self.finished_task, user=self.student_1, comment='new')
+
+    CASES = [
+        Case('courses-list', 'get', 'lecturer_1', 3),
+        Case('courses-list', 'post', 'lecturer_1', 3, lambda t: ((), {'title': 'new'}),
+             status_code=status.HTTP_201_CREATED),
+        #  Hometasks are inserted by batches of database's parameter limit, tree is kept within one batch
+        Case('courses-import', 'post', 'lecturer_1', 8, lambda t: ((), {'title': 'new', 'lectures': [
+            {'theme': f'lecture {i}', 'hometasks': [{'task': f'hometask {j}'} for j in range(10)]}
+            for i in range(10)]}), status_code=status.HTTP_201_CREATED),
+        Case('courses-detail', 'get', 'student_1', 2, lambda t: ((t.course.pk,), None)),
+        Case('courses-detail', 'put', 'lecturer_1', 2, lambda t: ((t.course.pk,), {'title': 'new'})),
+        Case('courses-detail', 'patch', 'lecturer_1', 2, lambda t: ((t.course.pk,), {'title': 'new'})),
+        Case('courses-detail', 'delete', 'lecturer_1', 11, lambda t: ((t.new_course().pk,), None),
+             status_code=status.HTTP_204_NO_CONTENT),
+        Case('courses-process-child', 'get', 'student_1', 3, lambda t: ((t.course.pk,), None)),
+        Case('courses-process-child', 'post', 'lecturer_1', 3, lambda t: ((t.course.pk,), {'theme': 'new'}),
+             status_code=status.HTTP_201_CREATED),
+        Case('courses-move-user', 'post', 'lecturer_1', 5,
+             lambda t: ((t.course.pk,), {'pk': t.lecturer_2.pk}), status_code=status.HTTP_201_CREATED),
+        Case('courses-move-user', 'delete', 'lecturer_1', 3,
+             lambda t: ((t.course.pk,), {'pk': t.student_2.pk}), status_code=status.HTTP_204_NO_CONTENT),
+        Case('courses-move-users', 'post', 'lecturer_1', 6,
+             lambda t: ((t.course.pk,), {'users': [t.lecturer_2.pk, t.student_2.username]})),
+        Case('courses-move-users', 'delete', 'lecturer_1', 7,
+             lambda t: ((t.course.pk,), {'users': [t.student_1.pk, 'budget_student_0']})),
+        Case('courses-gradebook', 'get', 'lecturer_1', 2, lambda t: ((t.course.pk,), None)),
+        Case('courses-analytics', 'get', 'lecturer_1', 6, lambda t: ((t.course.pk,), None)),
+        Case('lectures-list', 'get', 'student_1', 2),
+        Case('lectures-detail', 'get', 'student_1', 2, lambda t: ((t.lecture.pk,), None)),
+        Case('lectures-detail', 'put', 'lecturer_1', 3,
+             lambda t: ((t.lecture.pk,), {'theme': 'new', 'course': t.course.pk})),
+        Case('lectures-detail', 'patch', 'lecturer_1', 2, lambda t: ((t.lecture.pk,), {'theme': 'new'})),
+        Case('lectures-detail', 'delete', 'lecturer_1', 5, lambda t: ((t.new_lecture().pk,), None),
+             status_code=status.HTTP_204_NO_CONTENT),
+        Case('lectures-process-child', 'get', 'student_1', 4, lambda t: ((t.lecture.pk,), None)),
+        Case('lectures-process-child', 'post', 'lecturer_1', 3, lambda t: ((t.lecture.pk,), {'task': 'new'}),
+             status_code=status.HTTP_201_CREATED),
+        Case('lectures-presentation', 'get', 'student_1', 1, lambda t: ((t.new_presentation().pk,), None)),
+        Case('lectures-presentation', 'get', 'student_1', 1, lambda t: ((t.lecture.pk,), None),
+             status_code=status.HTTP_404_NOT_FOUND, name='no presentation'),
+        Case('lectures-start-upload', 'post', 'lecturer_1', 4,
+             lambda t: ((t.lecture.pk,), {'filename': 'new', 'size': 8}), status_code=status.HTTP_201_CREATED),
+        Case('lectures-upload-chunk', 'get', 'lecturer_1', 2,
+             lambda t: ((t.lecture.pk, t.new_upload().pk), None)),
+        Case('lectures-upload-chunk', 'put', 'lecturer_1', 5,
+             lambda t: ((t.lecture.pk, t.new_upload().pk), b'data'),
+             content_type='application/octet-stream', headers={'HTTP_CONTENT_RANGE': 'bytes 0-3/8'}),
+        Case('lectures-upload-chunk', 'delete', 'lecturer_1', 3,
+             lambda t: ((t.lecture.pk, t.new_upload().pk), None), status_code=status.HTTP_204_NO_CONTENT),
+        Case('hometasks-list', 'get', 'student_1', 2),
+        Case('hometasks-detail', 'get', 'student_1', 2, lambda t: ((t.hometask.pk,), None)),
+        Case('hometasks-detail', 'put', 'lecturer_1', 3,
+             lambda t: ((t.hometask.pk,), {'task': 'new', 'lecture': t.lecture.pk})),
+        Case('hometasks-detail', 'patch', 'lecturer_1', 2, lambda t: ((t.hometask.pk,), {'task': 'new'})),
+        Case('hometasks-detail', 'delete', 'lecturer_1', 6, lambda t: ((t.new_hometask().pk,), None),
+             status_code=status.HTTP_204_NO_CONTENT),
+        Case('hometasks-process-child', 'get', 'lecturer_1', 2, lambda t: ((t.hometask.pk,), None)),
+        Case('hometasks-process-child', 'post', 'student_1', 8, lambda t: ((t.hometask.pk,), {'answer': 'new'}),
+             status_code=status.HTTP_201_CREATED),
+        Case('hometasks-submit', 'post', 'student_1', 10,
+             lambda t: ((), [{'task': t.hometask.pk, 'answer': 'new'}, {'task': t.hometask.pk, 'answer': 'new'}]),
+             status_code=status.HTTP_201_CREATED),
+        Case('finished_tasks-list', 'get', 'lecturer_1', 2),
+        Case('finished_tasks-detail', 'get', 'student_1', 2, lambda t: ((t.finished_task.pk,), None)),
+        Case('finished_tasks-detail', 'put', 'lecturer_1', 0,
+             lambda t: ((t.finished_task.pk,), {'answer': 'new'}), status_code=status.HTTP_403_FORBIDDEN,
+             name='not allowed to anyone'),
+        Case('finished_tasks-detail', 'patch', 'lecturer_1', 11,
+             lambda t: ((t.finished_task.pk,), {'result': 10})),
+        Case('finished_tasks-detail', 'delete', 'student_1', 6,
+             lambda t: ((t.new_finished_task().pk,), None), status_code=status.HTTP_204_NO_CONTENT),
+        Case('finished_tasks-grade', 'patch', 'lecturer_1', 10,
+             lambda t: ((), [{'id': t.finished_task.pk, 'result': 10}, {'id': t.finished_task.pk + 1, 'result': 5}])),
+        Case('finished_tasks-queue', 'get', 'lecturer_1', 1),
+        Case('finished_tasks-claim', 'post', 'lecturer_1', 5, lambda t: ((), {'limit': 5})),
+        Case('finished_tasks-claim', 'delete', 'lecturer_1', 1, lambda t: ((), {})),
+        Case('finished_tasks-process-child', 'get', 'student_1', 2, lambda t: ((t.finished_task.pk,), None)),
+        Case('finished_tasks-process-child', 'post', 'student_1', 4,
+             lambda t: ((t.finished_task.pk,), {'comment': 'new'}), status_code=status.HTTP_201_CREATED),
+        Case('comments-list', 'get', 'lecturer_1', 2),
+        Case('comments-detail', 'get', 'student_1', 2, lambda t: ((t.comment.pk,), None)),
+        Case('comments-detail', 'put', 'student_1', 4,
+             lambda t: ((t.comment.pk,), {'comment': 'new', 'finished_task': t.finished_task.pk,
+                                          'user': t.student_1.pk})),
+        Case('comments-detail', 'patch', 'student_1', 2, lambda t: ((t.comment.pk,), {'comment': 'new'})),
+        Case('comments-detail', 'delete', 'student_1', 3, lambda t: ((t.new_comment().pk,), None),
+             status_code=status.HTTP_204_NO_CONTENT),
+        Case('search-list', 'get', 'student_1', 1, lambda t: ((), {'q': 'answer'})),
+        Case('users-list', 'post', None, 2,
+             lambda t: ((), {'username': 'new', 'password': 'new', 'role': models.User.STUDENT}),
+             status_code=status.HTTP_201_CREATED),
+        Case('users-login', 'post', None, 2,
+             lambda t: ((), {'username': 'student_1', 'password': 'student_1'}), status_code=status.HTTP_201_CREATED),
+        Case('users-logout', 'post', 'student_1', 3, token=True, status_code=status.HTTP_204_NO_CONTENT),
+    ]
+
+    def run_case(self, case: Case):
+        #  Budgets are set for cold response cache
+        get_cache().clear()
+        args, data = case.prepare(self)
+        user: Optional[models.User] = getattr(self, case.user) if case.user else None
+        client = self.client_class()
+        if case.token:
+            client.credentials(HTTP_AUTHORIZATION=f'Token {issue_token(user).key}')
+        elif user:
+            client.force_authenticate(user)
+        request = getattr(client, case.method)
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            if case.content_type:
+                response = request(reverse(case.route, args=args), data, content_type=case.content_type,
+                                   **case.headers)
+            else:
+                response = request(reverse(case.route, args=args), data, format='json', **case.headers)
+            if response.streaming:
+                #  Streamed rows are queried while response is consumed
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        self.assertEqual(response.status_code, case.status_code, getattr(response, 'data', None))
+        self.assertLessEqual(len(context.captured_queries), case.budget,
+                             '\n'.join(query['sql'] for query in context.captured_queries))
+        self.assertLess(elapsed, SECONDS)
+
+    def test_every_route_has_budget(self):
+        #  HEAD is served by the same handler as GET
+        routes = {(url.name, method) for url in router.urls for method in url.callback.actions if method != 'head'}
+        self.assertEqual(routes, {(case.route, case.method) for case in self.CASES})
+
+    def test_routes_fit_budget(self):
+        for case in self.CASES:
+            with self.subTest(route=case.route, method=case.method, name=case.name), transaction.atomic():
+                self.run_case(case)
+                transaction.set_rollback(True)
@@ -0,0 +1,65 @@
+import re
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from .utils import BaseTestCase
+from api import models
+
+
+class TestQueryPlans(BaseTestCase):
+    """
+    Every list/detail endpoint must be served by index lookups, not by full table scans
+    """
+    #  SQLite reports full table scan as 'SCAN <table>' ('SCAN TABLE <table>' in older versions)
+    TABLE_SCAN = re.compile(r'^SCAN (TABLE )?\w+$')
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        models.Membership.objects.create(user=cls.student_1, course=cls.test_course)
+        cls.test_lecture = models.Lecture.objects.create(course=cls.test_course, theme='test')
+        cls.test_hometask = models.Hometask.objects.create(lecture=cls.test_lecture, task='test')
+        cls.test_finished_task = models.FinishedTask.objects.create(task=cls.test_hometask, user=cls.student_1,
+                                                                    answer='test')
+        cls.test_comment = models.Comment.objects.create(finished_task=cls.test_finished_task, user=cls.student_1,
+                                                         comment='test')
+
+    def get_urls(self):
+        return [
+            reverse('courses-list'),
+            reverse('courses-detail', args=[self.test_course.pk]),
+            reverse('courses-process-child', args=[self.test_course.pk]),
+            reverse('lectures-list'),
+            reverse('lectures-detail', args=[self.test_lecture.pk]),
+            reverse('lectures-process-child', args=[self.test_lecture.pk]),
+            reverse('hometasks-list'),
+            reverse('hometasks-detail', args=[self.test_hometask.pk]),
+            reverse('hometasks-process-child', args=[self.test_hometask.pk]),
+            reverse('finished_tasks-list'),
+            reverse('finished_tasks-detail', args=[self.test_finished_task.pk]),
+            reverse('finished_tasks-process-child', args=[self.test_finished_task.pk]),
+            reverse('comments-list'),
+            reverse('comments-detail', args=[self.test_comment.pk]),
+        ]
+
+    def get_table_scans(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall() if self.TABLE_SCAN.match(row[-1])]
+
+    def assert_endpoints_use_indexes(self, user):
+        self.client.force_authenticate(user)
+        for url in self.get_urls():
+            with self.subTest(url=url), CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                for query in context.captured_queries:
+                    if query['sql'].startswith('SELECT'):
+                        self.assertFalse(self.get_table_scans(query['sql']), query['sql'])
+
+    def test_lecturer_endpoints_use_indexes(self):
+        self.assert_endpoints_use_indexes(self.lecturer_1)
+
+    def test_student_endpoints_use_indexes(self):
+        self.assert_endpoints_use_indexes(self.student_1)
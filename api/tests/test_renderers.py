@@ -0,0 +1,97 @@
+"""
+JSON renderers and parser give the same results as DRF's ones, with orjson and without it (float notation aside)
+"""
+import datetime
+import json
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+from unittest import mock
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import ErrorDetail
+from rest_framework.renderers import JSONRenderer
+from api import models
+from api.utils import renderers
+from .utils import BaseTestCase
+
+DATA = OrderedDict([
+    ('id', 1),
+    ('text', 'Лекция \u2028\u2029 "quoted"'),
+    ('created', datetime.datetime(2021, 1, 2, 3, 4, 5, 600000, tzinfo=timezone.utc)),
+    ('day', datetime.date(2021, 1, 2)),
+    ('price', Decimal('1.50')),
+    ('uuid', uuid.UUID(int=1)),
+    ('errors', {'field': [ErrorDetail('Required', code='required')]}),
+    (5, None),
+    ('items', [1.5, True, None, {'nested': []}]),
+])
+
+
+class TestFastJSONRenderer(BaseTestCase):
+    def test_output_is_identical_to_drf_renderer(self):
+        self.assertEqual(renderers.FastJSONRenderer().render(DATA), JSONRenderer().render(DATA))
+
+    def test_output_is_identical_without_orjson(self):
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(renderers.FastJSONRenderer().render(DATA), JSONRenderer().render(DATA))
+
+    def test_indent_is_left_to_drf_renderer(self):
+        media_type = 'application/json; indent=4'
+        self.assertEqual(renderers.FastJSONRenderer().render(DATA, media_type),
+                         JSONRenderer().render(DATA, media_type))
+
+    def test_big_integers_are_rendered_by_drf_renderer(self):
+        self.assertEqual(renderers.FastJSONRenderer().render([2 ** 70]), JSONRenderer().render([2 ** 70]))
+
+    def test_floats_keep_their_values(self):
+        data = [1e16, 1e-7, 0.1, -0.0, 2.5e300]
+        self.assertEqual(json.loads(renderers.FastJSONRenderer().render(data)), data)
+
+
+class TestNDJSONRenderer(BaseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for theme in ('first', 'second'):
+            models.Lecture.objects.create(course=cls.test_course, theme=theme)
+
+    def test_collection_is_rendered_line_by_line(self):
+        self.client.force_authenticate(self.lecturer_1)
+        response = self.client.get(reverse('lectures-list'), HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['theme'] for line in lines], ['first', 'second'])
+
+    def test_cached_collection_is_streamed_with_validators(self):
+        self.client.force_authenticate(self.lecturer_1)
+        url = reverse('courses-process-child', args=[self.test_course.pk])
+        self.client.get(url, HTTP_ACCEPT='application/x-ndjson')
+        response = self.client.get(url, HTTP_ACCEPT='application/x-ndjson')
+        self.assertTrue(response.streaming)
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 2)
+        response = self.client.get(url, HTTP_ACCEPT='application/x-ndjson', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_object_is_rendered_as_single_line(self):
+        self.client.force_authenticate(self.lecturer_1)
+        response = self.client.get(reverse('courses-detail', args=[self.test_course.pk]), {'format': 'ndjson'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, b'{"id":%d,"title":"test"}\n' % self.test_course.pk)
+
+
+class TestFastJSONParser(BaseTestCase):
+    def test_request_is_parsed(self):
+        self.client.force_authenticate(self.lecturer_1)
+        response = self.client.post(reverse('courses-list'), '{"title": "Курс"}', content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['title'], 'Курс')
+
+    def test_malformed_request_is_rejected(self):
+        self.client.force_authenticate(self.lecturer_1)
+        response = self.client.post(reverse('courses-list'), '{"title": ', content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(response.data['detail'].startswith('JSON parse error'))
@@ -0,0 +1,144 @@
+from unittest import skipUnless
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from functools import partial
+from .utils import BaseTestCase, auth_and_request
+from api import models
+from api.utils import search
+
+
+class SearchTest(BaseTestCase):
+    """
+    /search endpoint tests
+    """
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.url = reverse('search-list')
+        models.Membership.objects.create(user=cls.student_1, course=cls.test_course)
+        models.Membership.objects.create(user=cls.student_2, course=cls.test_course)
+        cls.test_lecture = models.Lecture.objects.create(course=cls.test_course, theme='test')
+        cls.test_hometask = models.Hometask.objects.create(lecture=cls.test_lecture, task='Prove the theorem')
+        cls.finished_task_1 = models.FinishedTask.objects.create(task=cls.test_hometask, user=cls.student_1,
+                                                                 answer='The theorem follows from the lemma')
+        cls.finished_task_2 = models.FinishedTask.objects.create(task=cls.test_hometask, user=cls.student_2,
+                                                                 answer='Counterexample to the theorem')
+        cls.comment = models.Comment.objects.create(finished_task=cls.finished_task_1, user=cls.lecturer_1,
+                                                    comment='Which lemma? The theorem needs a proof')
+
+    def found(self, user, **params) -> set:
+        response = auth_and_request(self.client, user, partial(self.client.get, self.url, params))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {(hit['kind'], hit['id']) for hit in response.data}
+
+
+class TestSearch(SearchTest):
+
+    # =======================================================
+    #                      GET
+    # =======================================================
+
+    def test_lecturer_finds_everything_in_available_courses(self):
+        self.assertEqual(self.found(self.lecturer_1, q='theorem'),
+                         {('hometask', self.test_hometask.pk), ('finished_task', self.finished_task_1.pk),
+                          ('finished_task', self.finished_task_2.pk), ('comment', self.comment.pk)})
+
+    def test_lecturer_stranger_finds_nothing(self):
+        self.assertFalse(self.found(self.lecturer_2, q='theorem'))
+
+    def test_student_finds_hometasks_and_own_finished_tasks(self):
+        self.assertEqual(self.found(self.student_2, q='theorem'),
+                         {('hometask', self.test_hometask.pk), ('finished_task', self.finished_task_2.pk)})
+        self.assertEqual(self.found(self.student_1, q='lemma'),
+                         {('finished_task', self.finished_task_1.pk), ('comment', self.comment.pk)})
+
+    def test_all_words_must_be_found(self):
+        self.assertEqual(self.found(self.lecturer_1, q='theorem lemma'),
+                         {('finished_task', self.finished_task_1.pk), ('comment', self.comment.pk)})
+
+    def test_search_is_restricted_to_kind(self):
+        self.assertEqual(self.found(self.lecturer_1, q='theorem', kind='comment'), {('comment', self.comment.pk)})
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertFalse(self.found(self.lecturer_1, q='theorem NOT lemma'))
+        self.assertFalse(self.found(self.lecturer_1, q='"*'))
+
+    def test_best_matches_come_first(self):
+        models.Hometask.objects.create(lecture=self.test_lecture, task='Lemma, lemma and lemma')
+        request = partial(self.client.get, self.url, {'q': 'lemma', 'kind': 'hometask'})
+        response = auth_and_request(self.client, self.lecturer_1, request)
+        self.assertEqual(len(response.data), 1)
+        request = partial(self.client.get, self.url, {'q': 'lemma'})
+        response = auth_and_request(self.client, self.lecturer_1, request)
+        self.assertEqual(response.data[0]['kind'], 'hometask')
+        self.assertEqual([hit['score'] for hit in response.data],
+                         sorted((hit['score'] for hit in response.data), reverse=True))
+
+    def test_results_are_paginated(self):
+        request = partial(self.client.get, self.url, {'q': 'theorem', 'page_size': 3})
+        response = auth_and_request(self.client, self.lecturer_1, request)
+        self.assertEqual(len(response.data), 3)
+        self.assertIn('page=2', response['Link'])
+        response = self.client.get(response['Link'].split(';')[0].strip('<>'))
+        self.assertEqual(len(response.data), 1)
+        self.assertIn('rel="prev"', response['Link'])
+        self.assertNotIn('rel="next"', response['Link'])
+
+    def test_query_is_required(self):
+        request = partial(self.client.get, self.url)
+        response = auth_and_request(self.client, self.lecturer_1, request)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_anonymous_cannot_search(self):
+        response = self.client.get(self.url, {'q': 'theorem'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TestSearchIndex(SearchTest):
+    """
+    Index follows changes of indexed objects, including bulk ones
+    """
+    def test_bulk_created_objects_are_found(self):
+        models.FinishedTask.objects.bulk_create([models.FinishedTask(
+            task=self.test_hometask, course=self.test_course, user=self.student_2, answer='Bulk submitted answer')])
+        self.assertEqual(len(self.found(self.lecturer_1, q='bulk')), 1)
+
+    def test_updated_objects_are_found_by_new_text(self):
+        models.Hometask.objects.filter(pk=self.test_hometask.pk).update(task='Solve the equation')
+        self.assertEqual(self.found(self.lecturer_1, q='equation'), {('hometask', self.test_hometask.pk)})
+        self.assertNotIn(('hometask', self.test_hometask.pk), self.found(self.lecturer_1, q='theorem'))
+
+    def test_deleted_objects_are_not_found(self):
+        self.finished_task_1.delete()
+        self.assertEqual(self.found(self.lecturer_1, q='lemma'), set())
+
+    @skipUnless(connection.vendor == 'sqlite', 'Index is kept on SQLite only')
+    def test_triggers_survive_migrations(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+            triggers = {name for name, in cursor.fetchall()}
+        self.assertLessEqual(set(search.TRIGGERS), triggers)
+
+    def test_moved_objects_are_found_in_new_course(self):
+        course = models.Course.objects.create(title='other')
+        models.Membership.objects.create(user=self.lecturer_2, course=course)
+        self.test_lecture.course = course
+        self.test_lecture.save()
+        self.assertEqual(len(self.found(self.lecturer_2, q='theorem')), 4)
+        self.assertFalse(self.found(self.lecturer_1, q='theorem'))
+
+
+@override_settings(API_SEARCH_BACKEND='api.utils.search.ScanBackend')
+class TestScanSearch(SearchTest):
+    """
+    Search without index finds the same objects
+    """
+    def test_lecturer_finds_everything_in_available_courses(self):
+        self.assertEqual(self.found(self.lecturer_1, q='theorem lemma'),
+                         {('finished_task', self.finished_task_1.pk), ('comment', self.comment.pk)})
+
+    def test_student_finds_hometasks_and_own_finished_tasks(self):
+        self.assertEqual(self.found(self.student_2, q='theorem'),
+                         {('hometask', self.test_hometask.pk), ('finished_task', self.finished_task_2.pk)})
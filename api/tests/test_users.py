@@ -1,4 +1,5 @@
 from api.models import User
+from api.utils.authentication import PrincipalCache
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -22,3 +23,83 @@ class TestCreateUsers(APITestCase):
         response = self.client.post(self.url, {**self.credentials, 'role': 'SL'})
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+
+class TestTokenUsers(APITestCase):
+    """
+    /users/login and /users/logout endpoints tests
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.login_url = reverse('users-login')
+        cls.logout_url = reverse('users-logout')
+        cls.courses_url = reverse('courses-list')
+        cls.credentials = {'username': 'test', 'password': 'password'}
+        cls.user = User.objects.create_user(**cls.credentials, role='S')
+
+    def login(self):
+        response = self.client.post(self.login_url, self.credentials)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['token']
+
+    def test_login_with_valid_credentials(self):
+        response = self.client.post(self.login_url, self.credentials)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['user'], self.user.pk)
+
+    def test_login_with_invalid_credentials(self):
+        response = self.client.post(self.login_url, {**self.credentials, 'password': 'invalid'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_token_authenticates_requests(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.login()}')
+        response = self.client.get(self.courses_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_cached_token_does_not_hit_database(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.login()}')
+        self.client.get(self.courses_url)
+        #  Token, user and courses are taken from cache
+        with self.assertNumQueries(0):
+            self.client.get(self.courses_url)
+
+    def test_invalid_token_is_rejected(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+        response = self.client.get(self.courses_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_revokes_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.login()}')
+        self.client.get(self.courses_url)
+        response = self.client.post(self.logout_url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.client.get(self.courses_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_revokes_token_cached_by_other_workers(self):
+        key = self.login()
+        #  Principal cache of another process
+        other_worker = PrincipalCache(ttl=300, max_size=10)
+        other_worker.set(key, self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+        self.client.post(self.logout_url)
+        self.assertIsNone(other_worker.get(key))
+
+    def test_changed_user_is_revoked_in_other_workers(self):
+        key = self.login()
+        other_worker = PrincipalCache(ttl=300, max_size=10)
+        other_worker.set(key, self.user)
+        User.objects.filter(pk=self.user.pk).update(role='L')
+        User.objects.get(pk=self.user.pk).save()
+        self.assertIsNone(other_worker.get(key))
+
+    def test_every_request_gets_own_user(self):
+        principal_cache = PrincipalCache(ttl=300, max_size=10)
+        principal_cache.set('key', self.user)
+        first, second = principal_cache.get('key'), principal_cache.get('key')
+        self.assertEqual((first.pk, second.pk), (self.user.pk, self.user.pk))
+        self.assertIsNot(first, second)
+        self.assertIsNot(first, self.user)
+
+    def test_logout_requires_token(self):
+        response = self.client.post(self.logout_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -1,10 +1,19 @@
+import shutil
+import tempfile
 from api import models
 from functools import partial
 from typing import Optional
+from django.test import override_settings
 from rest_framework.test import APITestCase
+from api.utils.cache import get_cache
 
 
 class BaseTestCase(APITestCase):
+    def _pre_setup(self):
+        #  Cached responses of previous test describe rows which are rolled back now
+        get_cache().clear()
+        super()._pre_setup()
+
     @classmethod
     def setUpTestData(cls):
         cls.lecturer_1 = models.User.objects.create_user(username='lecturer_1', password='lecturer_1', role='L')
@@ -15,8 +24,44 @@ class BaseTestCase(APITestCase):
         models.Membership.objects.create(user=cls.lecturer_1, course=cls.test_course)
 
 
+class TemporaryMediaMixin:
+    """
+    Presentations and uploads of test class are kept in temporary directory, which is removed afterwards
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.mkdtemp()
+        cls.temp_settings = override_settings(MEDIA_ROOT=cls.temp_dir, FILE_UPLOAD_TEMP_DIR=cls.temp_dir)
+        cls.temp_settings.enable()
+        try:
+            super().setUpClass()
+        except Exception:
+            cls.remove_temp_dir()
+            raise
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.remove_temp_dir()
+
+    @classmethod
+    def remove_temp_dir(cls):
+        cls.temp_settings.disable()
+        shutil.rmtree(cls.temp_dir, ignore_errors=True)
+
+
 def auth_and_request(client, user, request: partial, membership_args: Optional[dict] = None):
     client.force_authenticate(user)
     if membership_args:
         models.Membership.objects.create(**membership_args)
-    return request()
\ No newline at end of file
+    return request()
+
+
+def next_link(response) -> Optional[str]:
+    """
+    Get url of the next page from 'Link' header
+    """
+    for link in response.get('Link', '').split(', '):
+        url, _, rel = link.partition('; ')
+        if rel == 'rel="next"':
+            return url.strip('<>')
@@ -1,9 +1,11 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import SimpleRouter
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from . import views
+from .utils.async_views import async_read_urls
 
 schema_view = get_schema_view(
    openapi.Info(
@@ -22,8 +24,9 @@ router.register('hometasks', views.HometaskViewSet, basename='hometasks')
 router.register('comments', views.CommentViewSet, basename='comments')
 router.register('finished_tasks', views.FinishedTaskViewSet, basename='finished_tasks')
 router.register('users', views.UserViewSet, basename='users')
+router.register('search', views.SearchViewSet, basename='search')
 
 urlpatterns = [
-    path('', include(router.urls)),
+    path('', include(async_read_urls(router.urls) if settings.API_ASYNC_READS else router.urls)),
     path('', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
 ]
@@ -0,0 +1,300 @@
+"""
+Course analytics: submission rates, mean, median and percentiles of results, totals of students
+
+Statistics are read from rollups, which follow finished tasks:
+
+HometaskResult - number of finished tasks of hometask graded with given result, i.e. histogram of results
+StudentResult - numbers of submitted and graded finished tasks of student in course and sum of results
+HometaskStudent - number of finished tasks of student for hometask
+
+Rollups are changed incrementally when finished task is submitted, graded (one by one or in bulk) or deleted
+(see signals). Mean and percentiles of n results are computed from histogram, that is from distinct results
+and their counts, so they cost the same however many tasks are graded. Numbers of submissions come from
+counters of hometasks (see 'counters'). Submission rates count rows of HometaskStudent of students who are
+members of course, so they cost one row per student and hometask however many times hometask is resubmitted.
+
+Rollups of course are rebuilt from finished tasks when lectures move between courses and by
+'rebuild_analytics' command. Rebuild and percentiles are computed over arrays, by numpy if it's installed.
+"""
+import bisect
+import math
+from collections import defaultdict
+from functools import reduce
+from itertools import accumulate
+from operator import or_
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest
+from api import models
+from . import counters
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+#  Percentiles of results reported along with median
+PERCENTILES = (10, 25, 75, 90)
+#  Rollup rows changed by one UPDATE
+UPDATE_BATCH_SIZE = 250
+
+
+class Contribution(NamedTuple):
+    """
+    What finished task adds to rollups
+    """
+    course_id: int
+    hometask_id: int
+    user_id: int
+    result: Optional[int]
+
+
+def contribution(finished_task) -> Contribution:
+    return Contribution(finished_task.course_id, finished_task.task_id, finished_task.user_id, finished_task.result)
+
+
+def loaded_contribution(finished_task) -> Optional[Contribution]:
+    """
+    Contribution of finished task as it was loaded, None if it wasn't loaded from database
+    """
+    if getattr(finished_task, '_loaded_parent_id', None) is None:
+        return None
+    return Contribution(finished_task._loaded_course_id, finished_task._loaded_parent_id,
+                        finished_task._loaded_user_id, finished_task._loaded_result)
+
+
+def _add(model, differences: Dict[tuple, Dict[str, int]], key_fields: Sequence[str]):
+    """
+    Add differences to fields of rollup rows given by their keys. Missing rows are inserted empty (rows created
+    concurrently are kept as they are), then rows are updated by batches picking their differences by CASE
+    """
+    rows = {key: {field: difference for field, difference in fields.items() if difference}
+            for key, fields in differences.items()}
+    rows = {key: fields for key, fields in rows.items() if fields}
+    if not rows:
+        return
+
+    def matches(key) -> Q:
+        return Q(**dict(zip(key_fields, key)))
+
+    #  Row which only loses contributions must have been there already
+    model.objects.bulk_create([model(**dict(zip(key_fields, key))) for key, fields in rows.items()
+                               if any(difference > 0 for difference in fields.values())], ignore_conflicts=True)
+    #  Chains of OR and WHEN are parsed by SQLite into tree of limited depth, so large batches are split
+    keys = list(rows)
+    for start in range(0, len(keys), UPDATE_BATCH_SIZE):
+        batch = {key: rows[key] for key in keys[start:start + UPDATE_BATCH_SIZE]}
+        updates = {}
+        for field in {field for fields in batch.values() for field in fields}:
+            whens = [When(matches(key), then=Value(fields[field])) for key, fields in batch.items() if field in fields]
+            change = Case(*whens, default=Value(0), output_field=IntegerField())
+            #  Counter which has drifted below zero must not break constraint of the column
+            updates[field] = F(field) + change if field == 'total' else Greatest(F(field) + change, Value(0))
+        model.objects.filter(reduce(or_, map(matches, batch))).update(**updates)
+
+
+def record(removed: Iterable[Contribution] = (), added: Iterable[Contribution] = ()):
+    """
+    Replace contributions of finished tasks in rollups
+    """
+    histograms = defaultdict(lambda: defaultdict(int))
+    students = defaultdict(lambda: defaultdict(int))
+    submitters = defaultdict(lambda: defaultdict(int))
+    for sign, contributions in ((-1, removed), (1, added)):
+        for course_id, hometask_id, user_id, result in contributions:
+            totals = students[course_id, user_id]
+            totals['submitted'] += sign
+            submitters[hometask_id, course_id, user_id]['submitted'] += sign
+            if result is not None:
+                histograms[hometask_id, course_id, result]['count'] += sign
+                totals['graded'] += sign
+                totals['total'] += sign * result
+    #  Rollups of deleted hometask or course are deleted along with it
+    for model, rollup, key_fields in ((models.HometaskResult, histograms, ('hometask_id', 'course_id', 'result')),
+                                      (models.HometaskStudent, submitters, ('hometask_id', 'course_id', 'user_id'))):
+        _add(model, {
+            key: differences for key, differences in rollup.items()
+            if not counters.is_deleting('Hometask', key[0]) and not counters.is_deleting('Course', key[1])
+        }, key_fields)
+    _add(models.StudentResult, {key: differences for key, differences in students.items()
+                                if not counters.is_deleting('Course', key[0])}, ('course_id', 'user_id'))
+
+
+def record_changed(finished_tasks: Iterable):
+    """
+    Record finished tasks which have been graded (or changed otherwise) since they were loaded
+    """
+    removed, added = [], []
+    for finished_task in finished_tasks:
+        loaded, current = loaded_contribution(finished_task), contribution(finished_task)
+        if loaded is not None and loaded != current:
+            removed.append(loaded)
+            added.append(current)
+    record(removed, added)
+
+
+# =======================================================
+#                      Rebuild
+# =======================================================
+
+def _count_rows(rows: Sequence[Tuple[int, int, int, Optional[int]]]):
+    """
+    Histograms, student totals and students of hometasks of (course, hometask, user, result) rows
+    """
+    histograms, students, submitters = {}, {}, {}
+    if not rows:
+        return histograms, students, submitters
+    if numpy is not None:
+        #  Missing results become NaN
+        table = numpy.array(rows, dtype=float)
+        ids, results = table[:, :3].astype(numpy.int64), table[:, 3]
+        graded = ~numpy.isnan(results)
+        if graded.any():
+            keys = numpy.column_stack([ids[graded][:, :2], results[graded].astype(numpy.int64)])
+            keys, counts = numpy.unique(keys, axis=0, return_counts=True)
+            histograms = {tuple(key): count for key, count in zip(keys.tolist(), counts.tolist())}
+        keys, inverse = numpy.unique(ids[:, [0, 2]], axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        submitted = numpy.bincount(inverse)
+        graded_counts = numpy.bincount(inverse, weights=graded)
+        totals = numpy.bincount(inverse, weights=numpy.where(graded, results, 0))
+        students = {tuple(key): (int(submitted[i]), int(graded_counts[i]), int(totals[i]))
+                    for i, key in enumerate(keys.tolist())}
+        keys, counts = numpy.unique(ids, axis=0, return_counts=True)
+        submitters = {tuple(key): count for key, count in zip(keys.tolist(), counts.tolist())}
+        return histograms, students, submitters
+    histograms, totals, submitters = defaultdict(int), defaultdict(lambda: [0, 0, 0]), defaultdict(int)
+    for course, hometask, user, result in rows:
+        student = totals[course, user]
+        student[0] += 1
+        submitters[course, hometask, user] += 1
+        if result is not None:
+            histograms[course, hometask, result] += 1
+            student[1] += 1
+            student[2] += result
+    return dict(histograms), {key: tuple(value) for key, value in totals.items()}, dict(submitters)
+
+
+def rebuild(course_ids: Optional[Iterable[int]] = None, apps=global_apps):
+    """
+    Recompute rollups of given courses (all courses if None) from their finished tasks
+    """
+    FinishedTask = apps.get_model('api', 'FinishedTask')
+    HometaskResult = apps.get_model('api', 'HometaskResult')
+    StudentResult = apps.get_model('api', 'StudentResult')
+    HometaskStudent = apps.get_model('api', 'HometaskStudent')
+    querysets = [FinishedTask.objects.all(), HometaskResult.objects.all(), StudentResult.objects.all(),
+                 HometaskStudent.objects.all()]
+    if course_ids is not None:
+        course_ids = list(course_ids)
+        querysets = [queryset.filter(course_id__in=course_ids) for queryset in querysets]
+    finished_tasks, histograms, students, submitters = querysets
+    rows = list(finished_tasks.values_list('course_id', 'task_id', 'user_id', 'result'))
+    histogram_counts, student_totals, submitter_counts = _count_rows(rows)
+    with transaction.atomic():
+        histograms.delete()
+        students.delete()
+        submitters.delete()
+        HometaskResult.objects.bulk_create(
+            HometaskResult(course_id=course, hometask_id=hometask, result=result, count=count)
+            for (course, hometask, result), count in histogram_counts.items())
+        StudentResult.objects.bulk_create(
+            StudentResult(course_id=course, user_id=user, submitted=submitted, graded=graded, total=total)
+            for (course, user), (submitted, graded, total) in student_totals.items())
+        HometaskStudent.objects.bulk_create(
+            HometaskStudent(course_id=course, hometask_id=hometask, user_id=user, submitted=submitted)
+            for (course, hometask, user), submitted in submitter_counts.items())
+
+
+# =======================================================
+#                      Statistics
+# =======================================================
+
+def percentiles(values: Sequence[int], counts: Sequence[int], qs: Sequence[float]) -> List[float]:
+    """
+    Percentiles of results given by histogram (sorted distinct values and their counts), interpolated
+    linearly between order statistics as numpy.percentile does
+    """
+    n = sum(counts)
+    if numpy is not None:
+        cumulative = numpy.cumsum(counts)
+        positions = numpy.asarray(qs, dtype=float) / 100 * (n - 1)
+        lower, upper = numpy.floor(positions), numpy.ceil(positions)
+        values = numpy.asarray(values, dtype=float)
+        #  k-th order statistic is the first value whose cumulative count exceeds k
+        low = values[numpy.searchsorted(cumulative, lower, side='right')]
+        high = values[numpy.searchsorted(cumulative, upper, side='right')]
+        return (low + (high - low) * (positions - lower)).tolist()
+    cumulative = list(accumulate(counts))
+    result = []
+    for q in qs:
+        position = q / 100 * (n - 1)
+        lower, upper = math.floor(position), math.ceil(position)
+        low = values[bisect.bisect_right(cumulative, lower)]
+        high = values[bisect.bisect_right(cumulative, upper)]
+        result.append(low + (high - low) * (position - lower))
+    return result
+
+
+def summarize(histogram: Sequence[Tuple[int, int]]) -> dict:
+    """
+    Statistics of results given by histogram of (result, count) sorted by result
+    """
+    histogram = [(value, count) for value, count in histogram if count > 0]
+    graded = sum(count for _, count in histogram)
+    if not graded:
+        return {'graded': 0, 'mean': None, 'median': None, 'percentiles': {q: None for q in PERCENTILES}}
+    values, counts = [value for value, _ in histogram], [count for _, count in histogram]
+    median, *others = percentiles(values, counts, (50, *PERCENTILES))
+    return {
+        'graded': graded,
+        'mean': sum(value * count for value, count in histogram) / graded,
+        'median': median,
+        'percentiles': dict(zip(PERCENTILES, others)),
+    }
+
+
+def course_statistics(course) -> dict:
+    """
+    Statistics of course, its hometasks and students
+    """
+    members = models.Membership.objects.filter(course=course, user__role=models.User.STUDENT)
+    students = members.count()
+    hometasks = models.Hometask.objects.filter(course=course).order_by('pk').values_list('pk', 'finished_tasks_count')
+    #  Student may submit hometask several times, and who has left the course doesn't count
+    submitted_students = dict(models.HometaskStudent.objects.filter(course=course, submitted__gt=0,
+                                                                    user__in=members.values('user'))
+                              .order_by().values('hometask').annotate(students=Count('pk'))
+                              .values_list('hometask', 'students'))
+    histograms = defaultdict(list)
+    rows = (models.HometaskResult.objects.filter(course=course, count__gt=0).order_by('hometask_id', 'result')
+            .values_list('hometask_id', 'result', 'count'))
+    for hometask_id, result, count in rows:
+        histograms[hometask_id].append((result, count))
+    course_histogram = defaultdict(int)
+    for histogram in histograms.values():
+        for result, count in histogram:
+            course_histogram[result] += count
+    student_totals = (models.StudentResult.objects.filter(course=course).order_by('user_id')
+                      .values_list('user_id', 'submitted', 'graded', 'total'))
+    return {
+        'course': course.pk,
+        'students_count': students,
+        'results': summarize(sorted(course_histogram.items())),
+        'hometasks': [{
+            'id': hometask_id,
+            'submissions': submissions,
+            'submitted_students': submitted_students.get(hometask_id, 0),
+            'submission_rate': submitted_students.get(hometask_id, 0) / students if students else None,
+            **summarize(histograms.get(hometask_id, [])),
+        } for hometask_id, submissions in hometasks],
+        'students': [{
+            'user': user_id,
+            'submitted': submitted,
+            'graded': graded,
+            'total': total,
+            'mean': total / graded if graded else None,
+        } for user_id, submitted, graded, total in student_totals if submitted],
+    }
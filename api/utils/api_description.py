@@ -2,10 +2,12 @@
 Decorators to set proper description for Swagger UI
 """
 from django.utils.decorators import method_decorator
-from drf_yasg.utils import swagger_auto_schema
+from drf_yasg.utils import swagger_auto_schema, no_body
 from drf_yasg import openapi
 import types
 import functools
+from api.serializers import (SearchQuerySerializer, GradingClaimSerializer, GradingReleaseSerializer,
+                             CourseImportSerializer)
 
 
 def _copy_func(f):
@@ -72,6 +74,10 @@ def courses_api_description(model):
         klass.process_child = _copy_func(klass.process_child)
         klass.process_child = courses_lectures_api_description(klass.process_child)
         klass.move_user = courses_users_api_description(klass.move_user)
+        klass.move_users = courses_users_bulk_api_description(klass.move_users)
+        klass.gradebook = courses_gradebook_api_description(klass.gradebook)
+        klass.statistics = courses_analytics_api_description(klass.statistics)
+        klass.import_tree = courses_import_api_description(klass.import_tree)
         return klass
     return decorator
 
@@ -141,6 +147,81 @@ def courses_users_api_description(func):
             404: 'Could not delete user from available course by id provided.'})(func)
     return func
 
+
+def courses_users_bulk_api_description(func):
+    users_schema = openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        title='Users',
+        properties={
+            'users': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING),
+                                    description='Ids (numbers) or usernames (strings) of users', title='users')
+        },
+        required=['users']
+    )
+    func = swagger_auto_schema(
+        operation_description="Add several users to course. Outcome is reported for every user: "
+                              "'added', 'already_member' or 'not_found'.",
+        method='post',
+        request_body=users_schema,
+        responses={
+            200: 'Outcome for every user.',
+            400: 'Invalid list of users.',
+            403: 'You are not allowed to add users to courses.',
+            404: 'Could not add users to available course by id provided.'})(func)
+
+    func = swagger_auto_schema(
+        operation_description="Delete several users from course. Outcome is reported for every user: "
+                              "'removed', 'not_member', 'forbidden' (lecturers cannot be deleted) or 'not_found'.",
+        method='delete',
+        request_body=users_schema,
+        responses={
+            200: 'Outcome for every user.',
+            400: 'Invalid list of users.',
+            403: 'You are not allowed to delete users.',
+            404: 'Could not delete users from available course by id provided.'})(func)
+    return func
+
+
+def courses_gradebook_api_description(func):
+    func = swagger_auto_schema(
+        operation_description="Export results of all finished tasks of the course. "
+                              "Rows are streamed, one per finished task.",
+        method='get',
+        manual_parameters=[openapi.Parameter('output', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                                             enum=['csv', 'ndjson'], default='csv',
+                                             description='Output format')],
+        responses={
+            200: 'Gradebook is streamed.',
+            400: 'Unknown output format.',
+            403: 'Only lecturers can export gradebook.',
+            404: 'Could not export gradebook of available course by id provided.'})(func)
+    return func
+
+
+def courses_analytics_api_description(func):
+    func = swagger_auto_schema(
+        operation_description="Get analytics of the course: submission rates of hometasks, mean, median and "
+                              "percentiles of results of the course and of each hometask, totals of each student.",
+        method='get',
+        responses={
+            200: 'Analytics of the course.',
+            403: 'Only lecturers can get analytics.',
+            404: 'Could not get analytics of available course by id provided.'})(func)
+    return func
+
+
+def courses_import_api_description(func):
+    func = swagger_auto_schema(
+        operation_description="Create course with its lectures and their hometasks in one request. "
+                              "Nothing is created if any of them is invalid.",
+        method='post',
+        request_body=CourseImportSerializer,
+        responses={
+            201: CourseImportSerializer,
+            400: 'Invalid or too large course tree.',
+            403: 'You are not allowed to create new courses.'})(func)
+    return func
+
 # ================================================
 #           LECTURES
 # ================================================
@@ -182,6 +263,9 @@ def lectures_api_description(model):
         klass.get_queryset = _suppress_swagger_attribute_error(klass.get_queryset, model)
         klass.process_child = _copy_func(klass.process_child)
         klass.process_child = lectures_hometasks_api_description(klass.process_child)
+        klass.start_upload = lectures_start_upload_api_description(klass.start_upload)
+        klass.upload_chunk = lectures_upload_chunk_api_description(klass.upload_chunk)
+        klass.presentation = lectures_presentation_api_description(klass.presentation)
         return klass
     return decorator
 
@@ -213,6 +297,79 @@ def lectures_hometasks_api_description(func):
     return func
 
 
+def lectures_presentation_api_description(func):
+    func = swagger_auto_schema(
+        operation_description="Download presentation of available lecture. Single byte range ('Range' header) "
+                              "and conditional requests ('If-None-Match', 'If-Modified-Since', 'If-Range') "
+                              "are supported.",
+        method='get',
+        responses={
+            200: 'Presentation file.',
+            206: 'Requested range of presentation file.',
+            304: 'Presentation is not modified.',
+            404: 'Could not find presentation of available lecture by id provided.',
+            416: 'Requested range is not satisfiable.'})(func)
+    return func
+
+
+def lectures_start_upload_api_description(func):
+    func = swagger_auto_schema(
+        operation_description="Start resumable upload of lecture presentation. "
+                              "Chunks are sent to the returned upload. Upload which gets no chunks for "
+                              "PRESENTATION_UPLOAD_EXPIRY seconds is discarded, number of unfinished uploads "
+                              "of user is limited by PRESENTATION_UPLOAD_MAX_OPEN.",
+        method='post',
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            title='Upload',
+            properties={
+                'filename': openapi.Schema(type=openapi.TYPE_STRING, title='File name'),
+                'size': openapi.Schema(type=openapi.TYPE_INTEGER, title='Size in bytes'),
+                'checksum': openapi.Schema(type=openapi.TYPE_STRING, title='SHA-256 of the whole file'),
+            },
+            required=['filename', 'size']),
+        responses={
+            201: 'Upload started.',
+            400: 'Invalid file name or size, or too many unfinished uploads.',
+            403: 'You are not allowed to upload presentations.',
+            404: 'Could not upload presentation of available lecture by id provided.'})(func)
+    return func
+
+
+def lectures_upload_chunk_api_description(func):
+    func = swagger_auto_schema(
+        operation_description="Get offset from which upload must be continued.",
+        method='get',
+        responses={
+            200: 'Upload retrieved.',
+            404: 'Could not find your upload by id provided.'})(func)
+
+    func = swagger_auto_schema(
+        operation_description="Send next chunk of presentation as raw request body. Chunk is described by "
+                              "'Content-Range: bytes <first>-<last>/<size>' header and must start at "
+                              "the current offset. Presentation is attached to lecture when the last chunk arrives.",
+        method='put',
+        request_body=no_body,
+        manual_parameters=[openapi.Parameter('Content-Range', openapi.IN_HEADER, type=openapi.TYPE_STRING,
+                                             required=True, description='bytes <first>-<last>/<size>')],
+        responses={
+            200: 'Chunk accepted, upload is not complete yet.',
+            201: 'Last chunk accepted, presentation attached to lecture.',
+            400: 'Invalid range, incomplete chunk or checksum mismatch.',
+            403: 'You are not allowed to upload presentations.',
+            404: 'Could not find your upload by id provided.',
+            409: 'Chunk does not start at the current offset.'})(func)
+
+    func = swagger_auto_schema(
+        operation_description="Cancel upload.",
+        method='delete',
+        responses={
+            204: 'Upload cancelled.',
+            403: 'You are not allowed to upload presentations.',
+            404: 'Could not find your upload by id provided.'})(func)
+    return func
+
+
 # ================================================
 #           HOMETASKS
 # ================================================
@@ -253,6 +410,7 @@ def hometasks_api_description(model):
         klass.get_queryset = _suppress_swagger_attribute_error(klass.get_queryset, model)
         klass.process_child = _copy_func(klass.process_child)
         klass.process_child = hometasks_finished_tasks_api_description(klass.process_child)
+        klass.submit = hometasks_submit_api_description(klass.submit)
         return klass
     return decorator
 
@@ -284,6 +442,29 @@ def hometasks_finished_tasks_api_description(func):
     return func
 
 
+def hometasks_submit_api_description(func):
+    func = swagger_auto_schema(
+        operation_description="Add several finished tasks at once. "
+                              "Nothing is created if any of hometasks is not available.",
+        method='post',
+        request_body=openapi.Schema(
+            type=openapi.TYPE_ARRAY,
+            items=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                title='FinishedTask',
+                properties={
+                    'task': openapi.Schema(type=openapi.TYPE_INTEGER, title='Hometask'),
+                    'answer': openapi.Schema(type=openapi.TYPE_STRING, title='Answer'),
+                },
+                required=['task', 'answer'])),
+        responses={
+            201: 'Added finished tasks.',
+            400: 'Invalid list of finished tasks.',
+            403: 'You are not allowed to add finished tasks.',
+            404: 'Could not find some of available hometasks by ids provided.'})(func)
+    return func
+
+
 # ================================================
 #           FINISHED TASKS
 # ================================================
@@ -318,7 +499,8 @@ def finished_task_api_description(model):
                                 responses={
                                     200: 'Result updated.',
                                     403: 'You are not allowed to modify finished tasks.',
-                                    404: 'Could not update available finished task by id provided.'})
+                                    404: 'Could not update available finished task by id provided.',
+                                    409: 'Finished task is claimed by another grader.'})
                                  )(klass)
         klass = method_decorator(name='update', decorator=swagger_auto_schema(
                                 operation_description="PUT method is not allowed.",
@@ -336,6 +518,9 @@ def finished_task_api_description(model):
         klass.get_queryset = _suppress_swagger_attribute_error(klass.get_queryset, model)
         klass.process_child = _copy_func(klass.process_child)
         klass.process_child = finished_tasks_comments_api_description(klass.process_child)
+        klass.grade = finished_tasks_grade_api_description(klass.grade)
+        klass.queue = finished_tasks_queue_api_description(klass.queue)
+        klass.claim = finished_tasks_claim_api_description(klass.claim)
         return klass
     return decorator
 
@@ -367,6 +552,62 @@ def finished_tasks_comments_api_description(func):
     return func
 
 
+def finished_tasks_grade_api_description(func):
+    func = swagger_auto_schema(
+        operation_description="Set results of several finished tasks at once. "
+                              "Nothing is updated if any of finished tasks is not available.",
+        method='patch',
+        request_body=openapi.Schema(
+            type=openapi.TYPE_ARRAY,
+            items=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                title='Result',
+                properties={
+                    'id': openapi.Schema(type=openapi.TYPE_INTEGER, title='Finished task'),
+                    'result': openapi.Schema(type=openapi.TYPE_INTEGER, title='Result'),
+                },
+                required=['id', 'result'])),
+        responses={
+            200: 'Results updated.',
+            400: 'Invalid list of results.',
+            403: 'You are not allowed to set results.',
+            404: 'Could not find some of available finished tasks by ids provided.',
+            409: 'Some of finished tasks are claimed by other graders.'})(func)
+    return func
+
+
+def finished_tasks_queue_api_description(func):
+    func = swagger_auto_schema(
+        operation_description="List the oldest ungraded finished tasks of available courses, which are not "
+                              "claimed by other graders. Tasks are not claimed by listing.",
+        method='get',
+        query_serializer=GradingClaimSerializer,
+        responses={
+            200: 'Ungraded finished tasks returned.',
+            403: 'You must be lecturer.'})(func)
+    return func
+
+
+def finished_tasks_claim_api_description(func):
+    func = swagger_auto_schema(
+        operation_description="Claim the oldest ungraded finished tasks for grading. Claimed tasks are skipped "
+                              "by other graders until the lease ends or results are set. "
+                              "Your current claims are renewed and returned too.",
+        method='post',
+        request_body=GradingClaimSerializer,
+        responses={
+            200: 'Claimed finished tasks returned.',
+            403: 'You must be lecturer.'})(func)
+    func = swagger_auto_schema(
+        operation_description="Give claimed finished tasks back to the queue.",
+        method='delete',
+        request_body=GradingReleaseSerializer,
+        responses={
+            200: 'Number of released finished tasks returned.',
+            403: 'You must be lecturer.'})(func)
+    return func
+
+
 # ================================================
 #           COMMENTS
 # ================================================
@@ -412,6 +653,22 @@ def comments_api_description(model):
     return decorator
 
 
+# ================================================
+#           SEARCH
+# ================================================
+
+def search_api_description(klass):
+    klass = method_decorator(name='list', decorator=swagger_auto_schema(
+                            operation_description="Search available hometasks, finished tasks and comments. "
+                                                  "Best matches come first, pages are linked in 'Link' header.",
+                            query_serializer=SearchQuerySerializer,
+                            responses={
+                                200: 'Found objects.',
+                                400: 'Invalid query.'})
+                             )(klass)
+    return klass
+
+
 # ================================================
 #           USERS
 # ================================================
@@ -421,4 +678,35 @@ def users_api_description(klass):
                             operation_description="Create new lecturer or student.",
                             responses={201: 'User created'})
                              )(klass)
-    return klass
\ No newline at end of file
+    klass.login = users_login_api_description(klass.login)
+    klass.logout = users_logout_api_description(klass.logout)
+    return klass
+
+
+def users_login_api_description(func):
+    func = swagger_auto_schema(
+        operation_description="Log in and get token. Pass it in 'Authorization: Token <token>' header.",
+        method='post',
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            title='Credentials',
+            properties={
+                'username': openapi.Schema(type=openapi.TYPE_STRING, title='Username'),
+                'password': openapi.Schema(type=openapi.TYPE_STRING, title='Password'),
+            },
+            required=['username', 'password']),
+        responses={
+            201: 'Token issued.',
+            400: 'Invalid credentials.'})(func)
+    return func
+
+
+def users_logout_api_description(func):
+    func = swagger_auto_schema(
+        operation_description="Revoke token used for this request.",
+        method='post',
+        request_body=no_body,
+        responses={
+            204: 'Token revoked.',
+            401: 'Token is invalid or already revoked.'})(func)
+    return func
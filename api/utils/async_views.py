@@ -0,0 +1,78 @@
+"""
+Async read path for ASGI deployments
+
+Django 3.1 has no async ORM and DRF views are synchronous, so under ASGI every request is passed to
+the single thread shared by sync views. Most of reads are answered from response cache though (see 'cache'),
+and such answer needs no database: token owner, membership set, course versions and payload are all in cache.
+
+Views of parents' listings are wrapped into async views, which first run DRF view with 'cache_only' set.
+Cache client is synchronous too, so the view is run in a thread of executor pool rather than in the event loop,
+and doesn't wait for database-bound requests holding the sync views' thread. Whatever is missing in cache raises
+CacheMiss before the database is touched, and then request is passed to the sync view as Django does for any
+sync view.
+
+Only 'list' and child listings of ParentModelViewSet are served this way, as only they are kept in response cache.
+Retrieve of single object, reads of other viewsets and writes always go to the sync view.
+
+Enabled by API_ASYNC_READS setting. Under WSGI async views are run in a new event loop per request,
+so it must be enabled for ASGI deployments only.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.urls import URLPattern
+from . import cache
+from .base_viewsets import ParentModelViewSet
+
+#  Actions which can be served from response cache
+CACHED_ACTIONS = ('list', ParentModelViewSet.CHILD_ACTION_NAME)
+
+
+def serve_from_cache(view, request, *args, **kwargs):
+    """
+    Response of the view if it can be given without database, otherwise None
+    """
+    if request.META.get('HTTP_AUTHORIZATION', '').split(' ')[0] != 'Token':
+        #  Only token owners are cached, password is checked in database
+        return None
+    token = cache.cache_only.set(True)
+    try:
+        response = view(request, *args, **kwargs)
+    except cache.CacheMiss:
+        return None
+    finally:
+        cache.cache_only.reset(token)
+    if not hasattr(response, 'render'):
+        return response
+    #  Rendered here, Django would render template-like response in a thread
+    response.render()
+    plain = HttpResponse(response.content, status=response.status_code)
+    for header, value in response.items():
+        plain[header] = value
+    return plain
+
+
+def as_async_view(view):
+    """
+    Async view which serves GET from cache apart from the sync views' thread and passes everything else to it
+    """
+    async def async_view(request, *args, **kwargs):
+        if request.method == 'GET' and view.actions.get('get') in CACHED_ACTIONS:
+            response = await sync_to_async(serve_from_cache, thread_sensitive=False)(view, request, *args, **kwargs)
+            if response is not None:
+                return response
+        return await sync_to_async(view, thread_sensitive=True)(request, *args, **kwargs)
+
+    #  Router and schema generator introspect these
+    async_view.cls, async_view.initkwargs, async_view.actions = view.cls, view.initkwargs, view.actions
+    #  'csrf_exempt' decorator would turn it into sync view
+    async_view.csrf_exempt = True
+    return async_view
+
+
+def async_read_urls(urls):
+    """
+    Url patterns with parents' views wrapped into async views
+    """
+    return [URLPattern(url.pattern, as_async_view(url.callback), url.default_args, url.name)
+            if issubclass(getattr(url.callback, 'cls', object), ParentModelViewSet) else url
+            for url in urls]
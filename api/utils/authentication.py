@@ -0,0 +1,127 @@
+"""
+Token authentication with in-memory cache of authenticated principals
+
+Password is checked only once, when the token is issued. After that every request is authenticated
+by the token key, and successful lookups are kept in process memory for API_TOKEN_CACHE_TTL seconds,
+so most requests are authenticated without touching the database.
+
+Revocation has to reach every worker: revoked token and changed user leave a mark in the shared Django cache
+(API_RESPONSE_CACHE alias), which is checked on every hit of process memory. Every request gets its own copy
+of cached user.
+"""
+import copy
+import threading
+import time
+import uuid
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+from api import models
+from . import cache
+
+
+class PrincipalCache:
+    """
+    Thread-safe mapping 'token key -> user' with per-entry TTL. Entry is valid while token isn't marked as revoked
+    and generation of user's tokens is the same as when entry was stored
+    """
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _revoked_key(key) -> str:
+        return f'api:token-revoked:{key}'
+
+    @staticmethod
+    def _generation_key(user_id) -> str:
+        return f'api:token-generation:{user_id}'
+
+    def _generation(self, user_id) -> str:
+        """
+        Current generation of user's tokens, created if it's missing
+        """
+        shared, key = cache.get_cache(), self._generation_key(user_id)
+        generation = shared.get(key)
+        if generation is None:
+            generation = uuid.uuid4().hex
+            #  Existing generation (set concurrently) is kept
+            if not shared.add(key, generation, None):
+                generation = shared.get(key, generation)
+        return generation
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        user, generation, expires = entry
+        if expires < time.monotonic():
+            self._forget(key)
+            return None
+        marks = cache.get_cache().get_many([self._revoked_key(key), self._generation_key(user.pk)])
+        if self._revoked_key(key) in marks or marks.get(self._generation_key(user.pk)) != generation:
+            self._forget(key)
+            return None
+        return copy.copy(user)
+
+    def set(self, key, user):
+        entry = (copy.copy(user), self._generation(user.pk), time.monotonic() + self.ttl)
+        with self._lock:
+            if len(self._entries) >= self.max_size:
+                #  Cache is full, drop the oldest entry
+                self._entries.pop(next(iter(self._entries)), None)
+            self._entries[key] = entry
+
+    def revoke(self, key):
+        #  Mark outlives entries cached by other processes
+        cache.get_cache().set(self._revoked_key(key), True, self.ttl)
+        self._forget(key)
+
+    def revoke_user(self, user_id):
+        cache.get_cache().set(self._generation_key(user_id), uuid.uuid4().hex, None)
+        with self._lock:
+            for key in [key for key, (user, _, _) in self._entries.items() if user.pk == user_id]:
+                del self._entries[key]
+
+    def _forget(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache(ttl=getattr(settings, 'API_TOKEN_CACHE_TTL', 300),
+                                 max_size=getattr(settings, 'API_TOKEN_CACHE_SIZE', 10000))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication ('Authorization: Token <key>' header) backed by principal cache
+    """
+    model = models.Token
+
+    def authenticate_credentials(self, key):
+        user = principal_cache.get(key)
+        if user is None:
+            cache.check_database()
+            user, token = super().authenticate_credentials(key)
+            principal_cache.set(key, user)
+        return user, key
+
+
+def issue_token(user):
+    """
+    Create new token for user
+    """
+    return models.Token.objects.create(user=user)
+
+
+def revoke_token(key):
+    """
+    Delete token, so it can no longer be used
+    """
+    models.Token.objects.filter(key=key).delete()
+    principal_cache.revoke(key)
@@ -18,11 +18,137 @@ from rest_framework.mixins import ListModelMixin
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.serializers import ModelSerializer
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Exists, OuterRef, QuerySet
+from django.http import Http404, StreamingHttpResponse
+from django.utils.http import parse_http_date_safe
+from typing import Optional
+from . import cache, conditional, db_router, fast_serializers, sparse_fields
+from .renderers import NDJSONRenderer
 
 
 class BaseModelViewSet(RetrieveUpdateDestroyAPIView, ListModelMixin, GenericViewSet):
-    pass
+    """
+    Base class for project ViewSet classes. Answers conditional GET of objects and listings
+    """
+    #  Token of database routing state of current request, see 'db_router'
+    routing = None
+    #  Fields requested by client, None if all fields are, see 'sparse_fields'
+    sparse_fields = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.routing = db_router.start_request(request.user.pk, request.method in SAFE_METHODS)
+        self.sparse_fields = self.get_sparse_fields()
+
+    def get_sparse_fields(self):
+        serializer_class = self.get_read_serializer_class()
+        if self.request.method not in ('GET', 'HEAD') or serializer_class is None:
+            return None
+        return sparse_fields.parse(self.request.query_params.get(sparse_fields.QUERY_PARAM), serializer_class)
+
+    def get_read_serializer_class(self):
+        """
+        Serializer of objects which current action reads, None if their fields can't be restricted
+        """
+        return self.get_serializer_class() if self.action in ('list', 'retrieve') else None
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'fields': self.sparse_fields}
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action in ('list', 'retrieve'):
+            queryset = sparse_fields.project(queryset, self.get_serializer_class(), self.sparse_fields)
+        return queryset
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self.routing is not None:
+                db_router.finish_request(self.routing)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """
+        Streams listing requested as NDJSON line by line instead of rendering it into one body
+        """
+        response = super().finalize_response(request, response, *args, **kwargs)
+        renderer = getattr(response, 'accepted_renderer', None)
+        if not isinstance(renderer, NDJSONRenderer) or not isinstance(response.data, list) \
+                or response.status_code != status.HTTP_200_OK:
+            return response
+        streaming = StreamingHttpResponse(renderer.render_lines(response.data), content_type=renderer.media_type)
+        for header, value in response.items():
+            #  Content type of not yet rendered response is the default one
+            if header != 'Content-Type':
+                streaming[header] = value
+        return streaming
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (TypeError, ValueError, ValidationError):
+            #  Malformed lookup, let 'get_object' answer it
+            queryset = None
+        get_response = lambda: super(BaseModelViewSet, self).retrieve(request, *args, **kwargs)
+        return get_response() if queryset is None else self.conditional_response(queryset, get_response, many=False)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.conditional_response(queryset, lambda: self.serialize_listing(
+            queryset, self.get_serializer_class(), self.get_serializer_context()))
+
+    def serialize_listing(self, queryset: QuerySet, serializer_class, context: dict):
+        """
+        Paginated response with serialized queryset. Rows are serialized by fast serializer if it's enabled
+        by API_FAST_LISTINGS setting and serializer can be compiled (see 'fast_serializers')
+        """
+        fast_serializer = fast_serializers.compile_serializer(serializer_class) \
+            if getattr(settings, 'API_FAST_LISTINGS', False) else None
+        if fast_serializer is not None:
+            fast_serializer = fast_serializer.restrict(context.get('fields'))
+            queryset = queryset.values(*fast_serializer.columns)
+        page = self.paginate_queryset(queryset)
+        rows = queryset if page is None else page
+        if fast_serializer is not None:
+            data = fast_serializer.serialize(rows, context)
+        else:
+            data = serializer_class(rows, many=True, context=context).data
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data, status=status.HTTP_200_OK)
+
+    def conditional_response(self, queryset: QuerySet, get_response, many: bool = True, check_empty=None):
+        """
+        Answers 304 if client's copy of the queryset is fresh, otherwise gets response and sets validators on it.
+        Single object (not many) is validated only if it exists, and object permissions are checked before
+        answering without 'get_response'. 'check_empty' is called if queryset is empty and may raise exception
+        instead of answering
+        """
+        if self.request.method not in ('GET', 'HEAD'):
+            return get_response()
+        variant = f'{self.request.query_params.urlencode()}:{self.request.META.get("HTTP_ACCEPT", "")}'
+        etag, last_modified = conditional.get_validators(queryset, variant)
+        if last_modified is None and check_empty is not None:
+            check_empty()
+        if not many and last_modified is None:
+            return get_response()
+        response = conditional.not_modified(self.request, etag, last_modified)
+        if response is not None and not many:
+            #  'get_object' is skipped, and 304 would tell denied client that object exists and is unchanged
+            self.check_object_permissions(self.request, queryset.get())
+        if response is None:
+            response = get_response()
+            if response.status_code == status.HTTP_200_OK:
+                conditional.set_validators(response, etag, last_modified)
+        return response
 
 
 class ParentModelViewSet(BaseModelViewSet):
@@ -40,6 +166,13 @@ class ParentModelViewSet(BaseModelViewSet):
     foreign_key_field_name: str = None
     #  Child's serializer
     child_serializer_class: ModelSerializer = None
+    #  Headers which are kept along with cached response
+    CACHED_HEADERS = ('Link', 'ETag', 'Last-Modified')
+    #  Parent fetched by 'get_parent'
+    _parent = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached(lambda: super(ParentModelViewSet, self).list(request, *args, **kwargs))
 
     @action(methods=['GET', 'POST'],  detail=True)
     def process_child(self, *args, **kwargs):
@@ -47,21 +180,84 @@ class ParentModelViewSet(BaseModelViewSet):
         Lists all parent's children or creates a new one
         """
         if self.request.method == 'GET':
-            serializer = self.child_serializer_class(self.get_children(), many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return self.cached(self.list_children)
         else:
-            #  Populate foreign key for child object
-            self.request.data.update({self.foreign_key_field_name: self.get_object().pk})
-            serializer = self.child_serializer_class(data=self.request.data)
+            #  Populate foreign key for child object. Serializer takes the parent from context instead of querying it
+            parent = self.get_parent()
+            self.request.data.update({self.foreign_key_field_name: parent.pk})
+            serializer = self.child_serializer_class(data=self.request.data, context={'parent': parent})
             serializer.is_valid(raise_exception=True)
-            serializer.save()
+            #  Child is saved along with everything its signals write (e.g. references to presentation blobs)
+            with transaction.atomic(savepoint=False):
+                serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    def list_children(self):
+        """
+        Lists all parent's children
+        """
+        children = sparse_fields.project(self.get_children(), self.child_serializer_class, self.sparse_fields)
+        #  Children of unavailable parent can't be found, but only empty listing needs to tell it from childless one
+        return self.conditional_response(children, lambda: self.serialize_listing(
+            children, self.child_serializer_class, {'fields': self.sparse_fields}), check_empty=self.get_parent)
+
+    def get_read_serializer_class(self):
+        if self.action == self.CHILD_ACTION_NAME:
+            return self.child_serializer_class
+        return super().get_read_serializer_class()
+
+    def get_parent(self):
+        """
+        Get parent object, it's fetched once per request
+        """
+        if self._parent is None:
+            self._parent = self.get_object()
+        return self._parent
+
     def get_children(self):
         """
-        Get all children
+        Get all children. Parent row isn't loaded, its availability is checked by EXISTS subquery
+        """
+        queryset = self.get_queryset()
+        child_model = queryset.model._meta.get_field(self.related_name).related_model
+        parents = queryset.filter(pk=OuterRef(self.foreign_key_field_name))
+        parent_id = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        try:
+            return child_model.objects.filter(Exists(parents), **{self.foreign_key_field_name: parent_id})
+        except (TypeError, ValueError, ValidationError):
+            raise Http404
+
+    def get_cache_key(self) -> Optional[str]:
+        """
+        Key of cached response to current GET request. Responses are not cached if None is returned
+        """
+        return None
+
+    def cached(self, get_response):
+        """
+        Returns cached response if there is one, otherwise gets response and caches it
         """
-        return getattr(self.get_object(), self.related_name).all()
+        #  Optional fields (counters of children) change without dropping cached responses
+        optional = sparse_fields.optional_fields(self.get_read_serializer_class())
+        cacheable = self.request.method == 'GET' and not set(self.sparse_fields or ()) & set(optional)
+        key = self.get_cache_key() if cacheable else None
+        if key is None:
+            cache.check_database()
+            return get_response()
+        payload = cache.get_payload(key)
+        if payload is None:
+            cache.check_database()
+            #  Payload must not be older than version token of its key, while replica may lag behind it
+            db_router.use_primary()
+            response = get_response()
+            if response.status_code == status.HTTP_200_OK:
+                headers = {header: response[header] for header in self.CACHED_HEADERS if response.has_header(header)}
+                cache.set_payload(key, (response.data, headers))
+            return response
+        data, headers = payload
+        etag, last_modified = headers.get('ETag'), parse_http_date_safe(headers.get('Last-Modified', ''))
+        response = conditional.not_modified(self.request, etag, last_modified)
+        return response or Response(data, status=status.HTTP_200_OK, headers=headers)
 
     @classmethod
     def get_extra_actions(cls):
@@ -0,0 +1,148 @@
+"""
+Response cache for course trees
+
+Serialized payloads of course lists and of course's lectures / lecture's hometasks are kept in Django cache
+(API_RESPONSE_CACHE alias). Every course has a version token, payloads are stored under keys which include it:
+
+courses:<user id>:<digest of (course id, version) of all user's courses>:<query string>
+lectures:<course id>:<course version>:<query string>
+hometasks:<course id>:<course version>:<lecture id>:<query string>
+
+Writes don't touch payloads, they only drop version token of affected course (or user's membership set),
+so stale payloads are never read again and expire by timeout. Membership sets and lecture -> course mapping
+are cached too, so cache hit doesn't touch the database at all. They are shared by all requests and outlive
+replication lag by far, so they are always read from primary, never from read replica (see 'db_router').
+
+Requests served by async read path (see 'async_views') set 'cache_only', then anything missing in cache
+raises CacheMiss instead of querying the database, and request is handed over to synchronous view.
+"""
+import hashlib
+import uuid
+from contextvars import ContextVar
+from typing import Iterable, Optional
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from api import models
+
+TIMEOUT = getattr(settings, 'API_RESPONSE_CACHE_TIMEOUT', 300)
+
+
+#  Database must not be queried by current request
+cache_only = ContextVar('cache_only', default=False)
+
+
+class CacheMiss(Exception):
+    pass
+
+
+def check_database():
+    """
+    Raises CacheMiss if database must not be queried by current request
+    """
+    if cache_only.get():
+        raise CacheMiss()
+
+
+def parse_id(value) -> Optional[int]:
+    """
+    Id from url kwargs, or None if it's not a number
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def get_cache():
+    return caches[getattr(settings, 'API_RESPONSE_CACHE', 'default')]
+
+
+def user_course_ids(user_id: int) -> frozenset:
+    """
+    Ids of courses available for user
+    """
+    cache = get_cache()
+    key = f'api:memberships:{user_id}'
+    course_ids = cache.get(key)
+    if course_ids is None:
+        check_database()
+        memberships = models.Membership.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user_id)
+        course_ids = frozenset(memberships.values_list('course_id', flat=True))
+        cache.set(key, course_ids, TIMEOUT)
+    return course_ids
+
+
+def course_versions(course_ids: Iterable[int]) -> dict:
+    """
+    Current version tokens of courses. Missing tokens are created
+    """
+    cache = get_cache()
+    keys = {f'api:course:{course_id}': course_id for course_id in course_ids}
+    versions = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys.keys() - versions.keys()}
+    if missing:
+        cache.set_many(missing, TIMEOUT)
+        versions.update(missing)
+    return {course_id: versions[key] for key, course_id in keys.items()}
+
+
+def lecture_course_id(lecture_id: int) -> Optional[int]:
+    """
+    Id of course of lecture, or None if there is no such lecture
+    """
+    cache = get_cache()
+    key = f'api:lecture:{lecture_id}'
+    course_id = cache.get(key)
+    if course_id is None:
+        check_database()
+        lectures = models.Lecture.objects.using(DEFAULT_DB_ALIAS).filter(pk=lecture_id)
+        course_id = lectures.values_list('course_id', flat=True).first()
+        if course_id is not None:
+            cache.set(key, course_id, TIMEOUT)
+    return course_id
+
+
+def get_payload(key: str):
+    return get_cache().get(f'api:payload:{key}')
+
+
+def set_payload(key: str, payload):
+    get_cache().set(f'api:payload:{key}', payload, TIMEOUT)
+
+
+def courses_key(user_id: int, query: str) -> str:
+    versions = course_versions(user_course_ids(user_id))
+    digest = hashlib.md5(repr(sorted(versions.items())).encode()).hexdigest()
+    return f'{user_id}:{digest}:{query}'
+
+
+def course_key(course_id: int, *parts) -> str:
+    version = course_versions([course_id])[course_id]
+    return ':'.join(map(str, (course_id, version, *parts)))
+
+
+def _on_commit_too(invalidate):
+    """
+    Invalidate right away and once again after commit, so payload read from not yet committed data
+    by concurrent request doesn't survive
+    """
+    def wrapper(*args):
+        invalidate(*args)
+        transaction.on_commit(lambda: invalidate(*args))
+    return wrapper
+
+
+@_on_commit_too
+def invalidate_user(user_id: int):
+    get_cache().delete(f'api:memberships:{user_id}')
+
+
+@_on_commit_too
+def invalidate_course(course_id: int):
+    get_cache().delete(f'api:course:{course_id}')
+
+
+@_on_commit_too
+def invalidate_lecture(lecture_id: int):
+    get_cache().delete(f'api:lecture:{lecture_id}')
@@ -0,0 +1,46 @@
+"""
+Conditional GET (RFC 7232) for objects and listings
+
+Validators are computed by single aggregate query over the queryset which is going to be serialized:
+latest 'updated_at' and number of rows. Changed row moves the maximum, deleted row changes the count,
+so the pair describes current state of the listing without serializing it. Listing depends on query string
+(pages, filters) and on requested format too, they are mixed into ETag.
+
+Client which sends 'If-None-Match' (or 'If-Modified-Since') with fresh validators gets 304 before
+any serializer runs.
+"""
+import hashlib
+from typing import Optional, Tuple
+from django.db.models import Count, Max, QuerySet
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def get_validators(queryset: QuerySet, variant: str) -> Tuple[str, Optional[int]]:
+    """
+    ETag and last modification timestamp of the queryset. Timestamp is None if queryset is empty
+    """
+    aggregate = queryset.order_by().aggregate(last_modified=Max('updated_at'), count=Count('pk'))
+    last_modified = aggregate['last_modified']
+    state = f'{aggregate["count"]}:{last_modified.isoformat() if last_modified else ""}:{variant}'
+    #  Weak, as equal tags don't guarantee byte-identical bodies (e.g. rendered in another format)
+    etag = f'W/{quote_etag(hashlib.md5(state.encode()).hexdigest())}'
+    return etag, int(last_modified.timestamp()) if last_modified else None
+
+
+def not_modified(request, etag: Optional[str], last_modified: Optional[int]):
+    """
+    Response to conditional request if client's copy is fresh (or precondition failed), otherwise None
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag: Optional[str], last_modified: Optional[int]):
+    if etag is not None:
+        response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
@@ -0,0 +1,180 @@
+"""
+Denormalized counters of children on parent objects
+
+Parents carry numbers of their children, so badges like "12 lectures, 40 hometasks, 15 ungraded" are read
+along with parent instead of counting its children:
+
+Course.lectures_count - lectures of the course
+Lecture.hometasks_count - hometasks of the lecture
+Hometask.finished_tasks_count, Hometask.ungraded_count - finished tasks of the hometask, all and without result
+FinishedTask.comments_count - comments to the finished task
+
+Counters are changed by atomic F() updates when child is created, deleted or moved to another parent
+(see signals). Bulk operations, which don't send signals, call 'count_created' and 'count_graded' themselves.
+Change of saved child is the difference from the values it was loaded with, so concurrent saves must not both
+count it: saved child reads them again under lock of its row (see 'CourseTrackingModel.save'), bulk grading
+loads finished tasks under lock.
+Changed counter moves 'updated_at' of parent, so validators of parent (see 'conditional') change too.
+Counters which have drifted anyway (e.g. after raw SQL) are fixed by 'reconcile_counters' command.
+"""
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+from django.apps import apps as global_apps
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+
+class Counter(NamedTuple):
+    #  Name of parent model
+    parent: str
+    #  Foreign key of child to parent
+    foreign_key: str
+    #  Counter field of parent
+    field: str
+    #  Child is counted only while this field is NULL
+    null_field: Optional[str] = None
+
+    def counts(self, child) -> bool:
+        return self.null_field is None or getattr(child, self.null_field) is None
+
+    def counted(self, child) -> bool:
+        """
+        Whether child was counted as it was loaded. Field which wasn't loaded is taken as unchanged
+        """
+        loaded = f'_loaded_{self.null_field}'
+        if self.null_field is None:
+            return True
+        if not hasattr(child, loaded):
+            return self.counts(child)
+        return getattr(child, loaded) is None
+
+
+#  Child model -> its counters
+COUNTERS = {
+    'Lecture': [Counter('Course', 'course', 'lectures_count')],
+    'Hometask': [Counter('Lecture', 'lecture', 'hometasks_count')],
+    'FinishedTask': [Counter('Hometask', 'task', 'finished_tasks_count'),
+                     Counter('Hometask', 'task', 'ungraded_count', null_field='result')],
+    'Comment': [Counter('FinishedTask', 'finished_task', 'comments_count')],
+}
+
+#  Parents being deleted along with their children, (model name, id)
+_deleting: ContextVar = ContextVar('deleting', default=frozenset())
+
+
+class Changes:
+    """
+    Differences of counters of several parents
+    """
+    def __init__(self):
+        #  (parent model, parent id) -> counter field -> difference
+        self.parents: Dict[Tuple[str, int], Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def add(self, counter: Counter, parent_id: Optional[int], difference: int):
+        if parent_id is not None and difference:
+            self.parents[counter.parent, parent_id][counter.field] += difference
+
+    def apply(self):
+        #  Parents with the same differences (e.g. +1 for batch of submissions) are updated at once
+        groups = defaultdict(list)
+        for (parent, pk), fields in self.parents.items():
+            differences = tuple(sorted((field, difference) for field, difference in fields.items() if difference))
+            if differences:
+                groups[parent, differences].append(pk)
+        now = timezone.now()
+        for (parent, differences), pks in groups.items():
+            #  Counter which has drifted below zero must not break constraint of the column
+            updates = {field: F(field) + difference if difference > 0 else Greatest(F(field) + difference, Value(0))
+                       for field, difference in differences}
+            global_apps.get_model('api', parent).objects.filter(pk__in=pks).update(updated_at=now, **updates)
+
+
+def count_created(children: Iterable):
+    """
+    Count new children in their parents
+    """
+    changes = Changes()
+    for child in children:
+        for counter in COUNTERS[type(child).__name__]:
+            changes.add(counter, getattr(child, f'{counter.foreign_key}_id'), int(counter.counts(child)))
+    changes.apply()
+
+
+def count_saved(child):
+    """
+    Recount child which has moved to another parent or has stopped (started) being counted
+    """
+    loaded_parent_id = getattr(child, '_loaded_parent_id', None)
+    if loaded_parent_id is None:
+        #  It's unknown what has been counted for child which wasn't loaded from database
+        return
+    changes = Changes()
+    for counter in COUNTERS[type(child).__name__]:
+        parent_id = getattr(child, f'{counter.foreign_key}_id')
+        counted, counts = counter.counted(child), counter.counts(child)
+        if loaded_parent_id != parent_id or counted != counts:
+            changes.add(counter, loaded_parent_id, -int(counted))
+            changes.add(counter, parent_id, int(counts))
+    changes.apply()
+
+
+def count_deleted(child):
+    changes = Changes()
+    deleting = _deleting.get()
+    for counter in COUNTERS[type(child).__name__]:
+        parent_id = getattr(child, f'{counter.foreign_key}_id')
+        #  Counter of parent which is deleted along with child isn't worth updating
+        if (counter.parent, parent_id) not in deleting:
+            changes.add(counter, parent_id, -int(counter.counts(child)))
+    changes.apply()
+
+
+def count_graded(finished_tasks: Iterable):
+    """
+    Recount finished tasks whose results have been changed by bulk update. Tasks must have been loaded under lock
+    of their rows in the same transaction
+    """
+    changes = Changes()
+    for finished_task in finished_tasks:
+        for counter in COUNTERS['FinishedTask']:
+            difference = int(counter.counts(finished_task)) - int(counter.counted(finished_task))
+            changes.add(counter, finished_task.task_id, difference)
+    changes.apply()
+
+
+def is_deleting(model_name: str, pk: int) -> bool:
+    """
+    Whether object is being deleted along with its children
+    """
+    return (model_name, pk) in _deleting.get()
+
+
+def start_deleting(parent):
+    _deleting.set(_deleting.get() | {(type(parent).__name__, parent.pk)})
+
+
+def finish_deleting(parent):
+    _deleting.set(_deleting.get() - {(type(parent).__name__, parent.pk)})
+
+
+def reconcile(apps=global_apps, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Recount all counters. Returns numbers of parents whose counters were wrong
+    """
+    wrong_counts = {}
+    for child_name, counters in COUNTERS.items():
+        child_model = apps.get_model('api', child_name)
+        for counter in counters:
+            parent_model = apps.get_model('api', counter.parent)
+            children = child_model.objects.filter(**{counter.foreign_key: OuterRef('pk')})
+            if counter.null_field is not None:
+                children = children.filter(**{f'{counter.null_field}__isnull': True})
+            children = children.order_by().values(counter.foreign_key).annotate(count=Count('pk')).values('count')
+            actual = Coalesce(Subquery(children), Value(0))
+            wrong = parent_model.objects.annotate(actual=actual).exclude(**{counter.field: F('actual')})
+            wrong_counts[f'{counter.parent}.{counter.field}'] = wrong.count()
+            if not dry_run:
+                parent_model.objects.filter(pk__in=wrong.values('pk')).update(**{counter.field: actual})
+    return wrong_counts
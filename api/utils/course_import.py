@@ -0,0 +1,54 @@
+"""
+Import of whole course tree: course, its lectures and their hometasks in one request
+
+POST /courses/import {"title": "...", "lectures": [{"theme": "...", "hometasks": [{"task": "..."}, ...]}, ...]}
+
+Tree is validated at once (see 'CourseImportSerializer'), then every level is inserted by bulk_create inside
+one transaction, so number of queries depends on depth of tree rather than on number of its objects (very large
+levels are split by bulk_create into batches the database accepts). Nothing is created if any object is invalid.
+Counters of children are known beforehand and are written along with parents, search index is filled by triggers
+of database.
+"""
+from typing import List
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from api import models
+
+
+def _insert(objects: List, inserted: QuerySet) -> List:
+    """
+    Bulk insert objects of new parent. Primary keys are read back (in order of insertion) on databases
+    which don't return them from bulk insert
+    """
+    objects = inserted.model.objects.bulk_create(objects)
+    if objects and not connection.features.can_return_rows_from_bulk_insert:
+        for obj, pk in zip(objects, inserted.order_by('pk').values_list('pk', flat=True)):
+            obj.pk = pk
+    return objects
+
+
+def import_course(user: models.User, tree: dict) -> dict:
+    """
+    Create validated course tree, user becomes member of the course. Returns tree with ids of created objects
+    """
+    lectures_data = tree.get('lectures', [])
+    with transaction.atomic():
+        course = models.Course.objects.create(title=tree['title'], lectures_count=len(lectures_data))
+        models.Membership.objects.create(user=user, course=course)
+        lectures = _insert([models.Lecture(course=course, theme=lecture['theme'],
+                                           hometasks_count=len(lecture.get('hometasks', [])))
+                            for lecture in lectures_data], course.lectures.all())
+        hometasks = _insert([models.Hometask(lecture=lecture, course=course, task=hometask['task'])
+                             for lecture, lecture_data in zip(lectures, lectures_data)
+                             for hometask in lecture_data.get('hometasks', [])], course.hometasks.all())
+    hometasks = iter(hometasks)
+    return {
+        'id': course.pk,
+        'title': course.title,
+        'lectures': [{
+            'id': lecture.pk,
+            'theme': lecture.theme,
+            'hometasks': [{'id': hometask.pk, 'task': hometask.task}
+                          for hometask in (next(hometasks) for _ in lecture_data.get('hometasks', []))],
+        } for lecture, lecture_data in zip(lectures, lectures_data)],
+    }
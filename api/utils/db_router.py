@@ -0,0 +1,77 @@
+"""
+Database router which sends reads of safe API requests to read replicas
+
+Replicas are aliases listed in API_READ_REPLICAS setting. Queries go to primary ('default') unless request
+of API viewset is being processed with safe method (GET, HEAD, OPTIONS), then reads go to random replica.
+
+Replicas lag behind primary, so client must see its own writes (read-after-write):
+- once anything is written during request, the rest of request is read from primary;
+- user who has written something reads from primary for API_REPLICA_PIN_SECONDS after that.
+
+Data read from replica may be older than current version token of course (see 'cache'), so request which is going
+to fill response cache is switched to primary by 'use_primary'. Requests answered from cache don't read at all.
+"""
+import random
+from contextvars import ContextVar
+from typing import Optional
+from django.conf import settings
+from .cache import get_cache
+
+#  Routing state of request being processed, None outside API requests
+_request_state = ContextVar('request_state', default=None)
+
+
+class _RequestState:
+    def __init__(self, user_id: Optional[int], use_replicas: bool):
+        self.user_id = user_id
+        self.use_replicas = use_replicas
+
+
+def _pin_key(user_id: int) -> str:
+    return f'api:pinned:{user_id}'
+
+
+def start_request(user_id: Optional[int], safe: bool):
+    """
+    Route reads of request. Returns token to pass to 'finish_request'
+    """
+    replicas_allowed = safe and getattr(settings, 'API_READ_REPLICAS', None)
+    pinned = user_id is not None and replicas_allowed and get_cache().get(_pin_key(user_id))
+    return _request_state.set(_RequestState(user_id, bool(replicas_allowed) and not pinned))
+
+
+def finish_request(token):
+    _request_state.reset(token)
+
+
+def use_primary():
+    """
+    Read the rest of current request from primary
+    """
+    state = _request_state.get()
+    if state is not None:
+        state.use_replicas = False
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        if state is not None and state.use_replicas:
+            return random.choice(settings.API_READ_REPLICAS)
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.use_replicas = False
+            if state.user_id is not None:
+                get_cache().set(_pin_key(state.user_id), True, getattr(settings, 'API_REPLICA_PIN_SECONDS', 5))
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        #  Replicas hold the same data as primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        #  Replicas are copies of migrated primary
+        return db not in getattr(settings, 'API_READ_REPLICAS', [])
@@ -0,0 +1,145 @@
+"""
+Downloads of lecture presentations
+
+Access is checked by the view, transfer itself is handed off to web server when
+PRESENTATION_SENDFILE_HEADER is set:
+
+'X-Sendfile' - absolute path of the file is passed (Apache mod_xsendfile, lighttpd)
+'X-Accel-Redirect' - file name under PRESENTATION_ACCEL_REDIRECT_PREFIX is passed, nginx location
+                     with this prefix must be 'internal' and aliased to MEDIA_ROOT
+
+Web server answers Range requests itself then. Otherwise file is served by FileResponse, which is sent
+by wsgi.file_wrapper (sendfile) when WSGI server has it. Single byte range (RFC 7233) is served as
+206 Partial Content, several ranges or stale If-Range are answered with the whole file.
+
+Both ways conditional requests are answered with 304 by the view, validators are taken from file's
+size and modification time.
+"""
+import mimetypes
+import os
+import re
+from typing import Optional, Tuple
+from urllib.parse import quote
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.http import parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from . import conditional
+
+BYTE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class DownloadRenderer(JSONRenderer):
+    """
+    Accepts any media type client asks for, so download isn't refused by content negotiation.
+    Only errors are rendered by it
+    """
+    media_type = '*/*'
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class _RangeFile:
+    """
+    Part of opened file, read from the first byte of the range up to its end
+    """
+    def __init__(self, file, first: int, length: int):
+        self.file = file
+        self.file.seek(first)
+        self.remaining = length
+
+    def read(self, size: int = -1) -> bytes:
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        block = self.file.read(size)
+        self.remaining -= len(block)
+        return block
+
+    def close(self):
+        self.file.close()
+
+
+def get_validators(path: str) -> Tuple[str, int, int]:
+    """
+    ETag, modification timestamp and size of file
+    """
+    stat = os.stat(path)
+    return quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}'), int(stat.st_mtime), stat.st_size
+
+
+def parse_range(request, etag: str, last_modified: int, size: int) -> Optional[Tuple[int, int]]:
+    """
+    First byte and length of requested range, or None if the whole file must be sent
+    """
+    header = request.META.get('HTTP_RANGE')
+    match = BYTE_RANGE.match(header or '')
+    if match is None or not any(match.groups()) or not _if_range_passes(request, etag, last_modified):
+        return None
+    first, last = match.groups()
+    if not first:
+        #  Suffix range: last N bytes
+        first, last = max(size - int(last), 0), size - 1
+    else:
+        first, last = int(first), min(int(last), size - 1) if last else size - 1
+    if first > last or first >= size:
+        raise RangeNotSatisfiable()
+    return first, last - first + 1
+
+
+def _if_range_passes(request, etag: str, last_modified: int) -> bool:
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        #  Only strong comparison is allowed here
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def content_disposition(filename: str) -> str:
+    try:
+        filename.encode('ascii')
+        return f'attachment; filename="{filename}"'
+    except UnicodeEncodeError:
+        return f"attachment; filename*=utf-8''{quote(filename)}"
+
+
+def serve(request, field_file, filename: Optional[str] = None):
+    """
+    Response with the file of FileField, or 304 if client's copy is fresh. File is offered to be saved
+    under 'filename', under its name in storage if it's not given
+    """
+    path = field_file.path
+    etag, last_modified, size = get_validators(path)
+    response = conditional.not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+    filename = filename or os.path.basename(field_file.name)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    header = getattr(settings, 'PRESENTATION_SENDFILE_HEADER', None)
+    if header:
+        response = HttpResponse(content_type=content_type)
+        if header.lower() == 'x-accel-redirect':
+            response[header] = quote(settings.PRESENTATION_ACCEL_REDIRECT_PREFIX + field_file.name)
+        else:
+            response[header] = path
+        response['Content-Disposition'] = content_disposition(filename)
+        return conditional.set_validators(response, etag, last_modified)
+    try:
+        byte_range = parse_range(request, etag, last_modified, size)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if byte_range is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type, as_attachment=True, filename=filename)
+    else:
+        first, length = byte_range
+        response = FileResponse(_RangeFile(open(path, 'rb'), first, length), content_type=content_type,
+                                as_attachment=True, filename=filename, status=status.HTTP_206_PARTIAL_CONTENT)
+        response['Content-Range'] = f'bytes {first}-{first + length - 1}/{size}'
+        response['Content-Length'] = length
+    response['Accept-Ranges'] = 'bytes'
+    return conditional.set_validators(response, etag, last_modified)
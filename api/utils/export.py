@@ -0,0 +1,70 @@
+"""
+Streaming export of course data
+
+Rows are read from database by server-side cursor in chunks and written to response one by one,
+so memory usage doesn't depend on the size of the course.
+
+Text cells of CSV which spreadsheet would take for formula (CSV injection) are prefixed with apostrophe,
+so names and themes given by users are shown as they are.
+"""
+import csv
+import json
+from typing import Iterable, Iterator, Sequence
+from api import models
+
+GRADEBOOK_CHUNK_SIZE = 2000
+
+#  Spreadsheets evaluate cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+GRADEBOOK_COLUMNS = {
+    'finished_task': 'pk',
+    'lecture': 'task__lecture_id',
+    'theme': 'task__lecture__theme',
+    'hometask': 'task_id',
+    'user': 'user_id',
+    'username': 'user__username',
+    'result': 'result',
+}
+
+
+class _Echo:
+    """
+    File-like object which returns written value instead of storing it
+    """
+    def write(self, value):
+        return value
+
+
+def gradebook_rows(course: models.Course) -> Iterator[tuple]:
+    """
+    Results of all finished tasks of the course, in order of submission
+    """
+    queryset = (models.FinishedTask.objects.filter(course=course).order_by('pk')
+                .values_list(*GRADEBOOK_COLUMNS.values()))
+    return queryset.iterator(chunk_size=GRADEBOOK_CHUNK_SIZE)
+
+
+def _csv_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(header: Sequence[str], rows: Iterable[tuple]) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([_csv_cell(value) for value in row])
+
+
+def stream_ndjson(header: Sequence[str], rows: Iterable[tuple]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(dict(zip(header, row)), ensure_ascii=False) + '\n'
+
+
+#  Output type -> (content type, file extension, stream function)
+OUTPUTS = {
+    'csv': ('text/csv', 'csv', stream_csv),
+    'ndjson': ('application/x-ndjson', 'ndjson', stream_ndjson),
+}
@@ -0,0 +1,124 @@
+"""
+Fast read-only serialization of listings
+
+ModelSerializer builds every row field by field: gets attribute of model instance, checks it for None and calls
+field's 'to_representation'. For listings of thousands of rows this dominates CPU time of request.
+
+Serializer consisting of plain fields is compiled once into list of (name, getter): rows are fetched by
+'.values()' and every item of listing is built by dict comprehension over the getters. Getters do exactly
+what 'to_representation' of the field does, so output is identical to serializer's one.
+Serializers with any other field (nested, method fields, dotted sources) or custom 'to_representation' are
+not compiled and are used as usual.
+"""
+from functools import lru_cache
+from typing import Callable, Iterable, List, Optional, Tuple
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+from . import sparse_fields
+
+#  Fields which are represented by converting value of model field
+CONVERTERS = {
+    serializers.IntegerField: int,
+    serializers.CharField: str,
+}
+
+
+def _column_getter(column: str, convert: Optional[Callable] = None):
+    """
+    Getter of field's representation from '.values()' row. 'convert' takes value and serializer context
+    """
+    if convert is None:
+        return lambda row, context: row[column]
+
+    def get(row, context):
+        value = row[column]
+        return None if value is None else convert(value, context)
+    return get
+
+
+def _file_converter(storage, use_url: bool):
+    def convert(name, context):
+        if not name:
+            return None
+        if not use_url:
+            return name
+        url = storage.url(name)
+        request = context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+    return convert
+
+
+def _compile_field(model, field) -> Optional[Tuple[str, Callable]]:
+    """
+    Column and getter of the field, None if field isn't plain
+    """
+    if field.source == '*' or '.' in field.source:
+        return None
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        if type(field).to_representation is not serializers.PrimaryKeyRelatedField.to_representation \
+                or field.pk_field is not None:
+            return None
+        column = f'{field.source}_id'
+        return column, _column_getter(column)
+    if type(field) is serializers.FileField:
+        use_url = getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL)
+        storage = model._meta.get_field(field.source).storage
+        return field.source, _column_getter(field.source, _file_converter(storage, use_url))
+    convert = CONVERTERS.get(type(field))
+    if convert is None:
+        return None
+    #  Primary key is fetched as 'pk', which keyset pagination reads
+    column = 'pk' if field.source == model._meta.pk.attname else field.source
+    return column, _column_getter(column, lambda value, context: convert(value))
+
+
+class FastSerializer:
+    """
+    Compiled read-only serializer
+    """
+    def __init__(self, fields: List[Tuple[str, str, Callable]], optional: Iterable[str] = ()):
+        #  Name, column and getter of every field
+        self.fields = fields
+        #  Names of fields which are serialized only if they are requested
+        self.optional = frozenset(optional)
+        #  Columns to fetch by '.values()'
+        self.columns = tuple(dict.fromkeys(['pk'] + [column for _, column, _ in fields]))
+        self.getters = [(name, get) for name, _, get in fields]
+        #  Serializer of fields which aren't optional
+        self._default = None
+
+    def restrict(self, names: Optional[Iterable[str]]) -> 'FastSerializer':
+        """
+        Serializer of given fields only (see 'sparse_fields'). Fields which aren't optional are kept
+        if names are None
+        """
+        if names is None:
+            if self._default is None:
+                self._default = FastSerializer([field for field in self.fields if field[0] not in self.optional]) \
+                    if self.optional else self
+            return self._default
+        return FastSerializer([field for field in self.fields if field[0] in names])
+
+    def serialize(self, rows: Iterable[dict], context: dict) -> List[dict]:
+        getters = self.getters
+        return [{name: get(row, context) for name, get in getters} for row in rows]
+
+
+@lru_cache(maxsize=None)
+def compile_serializer(serializer_class) -> Optional[FastSerializer]:
+    """
+    Fast serializer doing the same as given ModelSerializer, None if it can't be compiled
+    """
+    if not issubclass(serializer_class, serializers.ModelSerializer) \
+            or serializer_class.to_representation is not serializers.ModelSerializer.to_representation:
+        return None
+    model = serializer_class.Meta.model
+    fields = []
+    for field in sparse_fields.available_fields(serializer_class).values():
+        if field.write_only:
+            continue
+        compiled = _compile_field(model, field)
+        if compiled is None:
+            return None
+        fields.append((field.field_name, *compiled))
+    return FastSerializer(fields, sparse_fields.optional_fields(serializer_class))
@@ -0,0 +1,106 @@
+"""
+Queue of ungraded finished tasks
+
+Lecturer takes the oldest ungraded finished tasks of their courses by claiming them: claimed tasks are leased
+to them for API_GRADING_LEASE seconds and are skipped by other graders until the lease ends. So several
+lecturers grade in parallel without grading the same task twice:
+
+POST /finished_tasks/queue/claim {"limit": 10} - claim (or renew) up to 10 tasks
+PATCH /finished_tasks/results [{"id": 1, "result": 5}, ...] - set results, which releases claims
+DELETE /finished_tasks/queue/claim - give unfinished tasks back to the queue
+
+Setting result of task claimed by another grader is refused (see 'Claimed'): grader takes the claim
+by conditional update before the task is loaded, checked and graded in the same transaction (see 'hold'),
+so graders of the same task are serialized by the database. Lecturer who doesn't come back simply lets the lease
+expire. Queue is read from partial index 'finishedtask_ungraded_idx'.
+"""
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from api import models
+
+
+class Claimed(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Finished task is claimed by another grader'
+    default_code = 'claimed'
+
+
+def lease_duration() -> timedelta:
+    return timedelta(seconds=getattr(settings, 'API_GRADING_LEASE', 600))
+
+
+def claimable(user: models.User, now: datetime) -> Q:
+    """
+    Finished tasks which aren't leased to other graders
+    """
+    return Q(claimed_until__isnull=True) | Q(claimed_until__lte=now) | Q(claimed_by=user)
+
+
+def available(user: models.User, now: datetime) -> QuerySet:
+    """
+    Ungraded finished tasks of user's courses which can be claimed by user, the oldest first
+    """
+    return (models.FinishedTask.objects.filter(course_id__in=user.available_course_ids, result__isnull=True)
+            .filter(claimable(user, now)).order_by('pk'))
+
+
+def claim(user: models.User, limit: int) -> List[models.FinishedTask]:
+    """
+    Lease the oldest available finished tasks to user. Current claims of user are renewed and returned too
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        candidates = available(user, now)
+        if connection.features.has_select_for_update_skip_locked:
+            #  Graders claiming at the same time take different rows instead of waiting for each other
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(candidates.values_list('pk', flat=True)[:limit])
+        #  Task which has been claimed since it was selected is skipped, condition is checked by the update itself
+        models.FinishedTask.objects.filter(claimable(user, now), pk__in=ids, result__isnull=True).update(
+            claimed_by=user, claimed_until=now + lease_duration())
+    return list(models.FinishedTask.objects.filter(pk__in=ids, claimed_by=user, result__isnull=True).order_by('pk'))
+
+
+def release(user: models.User, ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Give tasks claimed by user back to the queue, all of them if ids are None. Returns number of released tasks
+    """
+    claimed = models.FinishedTask.objects.filter(claimed_by=user)
+    if ids is not None:
+        claimed = claimed.filter(pk__in=ids)
+    return claimed.update(claimed_by=None, claimed_until=None)
+
+
+def hold(user: models.User, finished_tasks: QuerySet):
+    """
+    Lease finished tasks to user till they're graded in current transaction. Claim is taken by the update itself,
+    so rows are locked (whole database is on SQLite) until commit, and tasks loaded after it show their final claims
+    to 'check_claims'
+    """
+    now = timezone.now()
+    finished_tasks.filter(claimable(user, now)).update(claimed_by=user, claimed_until=now + lease_duration())
+
+
+def check_claims(user: models.User, finished_tasks: Iterable[models.FinishedTask]):
+    """
+    Raise Claimed if any of finished tasks is leased to another grader. Tasks must be loaded after 'hold'
+    """
+    now = timezone.now()
+    claimed = sorted(finished_task.pk for finished_task in finished_tasks
+                     if finished_task.claimed_by_id not in (None, user.pk)
+                     and finished_task.claimed_until is not None and finished_task.claimed_until > now)
+    if claimed:
+        raise Claimed(f'Finished tasks are claimed by other graders: {claimed}')
+
+
+def unclaim(finished_task: models.FinishedTask):
+    """
+    Drop claim of graded finished task (it's saved by caller)
+    """
+    finished_task.claimed_by, finished_task.claimed_until = None, None
@@ -0,0 +1,23 @@
+"""
+Keyset (cursor) pagination for list endpoints and parent's children
+
+Pages are taken by primary key, so fetching page doesn't depend on how deep it is and pages stay stable
+while new rows are being inserted. Response body is still a plain list, links to neighbour pages are
+passed in 'Link' header (RFC 8288):
+
+Link: <http://host/api/courses?cursor=cD0xMDA%3D>; rel="next"
+"""
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(CursorPagination):
+    ordering = 'pk'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def get_paginated_response(self, data):
+        links = [f'<{url}>; rel="{rel}"'
+                 for url, rel in ((self.get_next_link(), 'next'), (self.get_previous_link(), 'prev')) if url]
+        headers = {'Link': ', '.join(links)} if links else None
+        return Response(data, headers=headers)
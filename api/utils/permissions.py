@@ -1,32 +1,70 @@
+"""
+Permissions of API viewsets
+
+Every permission is a row of capability matrix: set of (role, method) pairs it allows. Role of the user is
+resolved once per request and each check is a single set lookup, so permissions can be evaluated many times
+(e.g. for every user of bulk request) at no cost.
+
+Object-level checks only use columns loaded with the object itself (foreign keys are compared by id),
+so denied object costs the same single query which has found it.
+"""
+from typing import FrozenSet, Optional, Tuple
 from rest_framework import permissions
+from ..models import User
 
+UNSAFE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+ALL_METHODS = permissions.SAFE_METHODS + UNSAFE_METHODS
+
+
+def get_role(request) -> Optional[str]:
+    """
+    Role of the user who makes request, None if user is anonymous. Resolved once per request
+    """
+    try:
+        return request.api_role
+    except AttributeError:
+        request.api_role = request.user.role if request.user.is_authenticated else None
+        return request.api_role
 
-class IsLecturerOrStudent(permissions.BasePermission):
-    message = 'You must be either student or lecturer'
+
+def capabilities(student: Tuple[str, ...] = (), lecturer: Tuple[str, ...] = ()) -> FrozenSet[Tuple[str, str]]:
+    """
+    Row of capability matrix: methods allowed to each role
+    """
+    return frozenset([(User.STUDENT, method) for method in student] +
+                     [(User.LECTURER, method) for method in lecturer])
+
+
+class CapabilityPermission(permissions.BasePermission):
+    """
+    Allows request if (role, method) pair is in 'capabilities'
+    """
+    capabilities: FrozenSet[Tuple[str, str]] = frozenset()
 
     def has_permission(self, request, view):
-        if request.user.is_authenticated:
-            is_student, is_lecturer = request.user.is_student, request.user.is_lecturer
-            return is_student or is_lecturer
+        return (get_role(request), request.method) in self.capabilities
+
+
+class IsLecturerOrStudent(CapabilityPermission):
+    message = 'You must be either student or lecturer'
+    capabilities = capabilities(student=ALL_METHODS, lecturer=ALL_METHODS)
+
+
+class IsLecturer(CapabilityPermission):
+    message = 'You must be lecturer'
+    capabilities = capabilities(lecturer=ALL_METHODS)
 
 
 class CommentsAccess(IsLecturerOrStudent):
     message = 'Only author of the comment can modify it.'
 
     def has_object_permission(self, request, view, obj):
-        if request.user == obj.user:
-            return True
-        return request.method in permissions.SAFE_METHODS
+        return request.method in permissions.SAFE_METHODS or obj.user_id == request.user.pk
 
 
-class IsLecturerOrStudentSafe(permissions.BasePermission):
+class IsLecturerOrStudentSafe(CapabilityPermission):
     message = 'You must be lecturer or perform read only operation as a student'
-
-    def has_permission(self, request, view):
-        if request.user.is_authenticated:
-            is_student, is_lecturer = request.user.is_student, request.user.is_lecturer
-            is_safe = is_student and request.method in permissions.SAFE_METHODS
-            return is_lecturer or is_safe
+    capabilities = capabilities(student=permissions.SAFE_METHODS, lecturer=ALL_METHODS)
 
 
 class MoveUserPermission(IsLecturerOrStudentSafe):
@@ -36,18 +74,12 @@ class MoveUserPermission(IsLecturerOrStudentSafe):
             self.message = 'You cannot delete another lecturer'
             return not user.is_lecturer
         else:
-            return not request.user.is_student
+            return get_role(request) != User.STUDENT
 
 
-class FinishedTasksAccess(permissions.BasePermission):
+class FinishedTasksAccess(CapabilityPermission):
     message = 'Only students can finish hometasks and only lecturers can set results'
 
     LECTURER_AVAILABLE_METHODS = permissions.SAFE_METHODS + ('PATCH',)
     STUDENT_AVAILABLE_METHODS = permissions.SAFE_METHODS + ('POST', 'DELETE')
-
-    def has_permission(self, request, view):
-        if request.user.is_authenticated:
-            is_lecturer, is_student = request.user.is_lecturer, request.user.is_student
-            first_condition = is_lecturer and request.method in self.LECTURER_AVAILABLE_METHODS
-            second_condition = is_student and request.method in self.STUDENT_AVAILABLE_METHODS
-            return first_condition or second_condition
+    capabilities = capabilities(student=STUDENT_AVAILABLE_METHODS, lecturer=LECTURER_AVAILABLE_METHODS)
@@ -0,0 +1,96 @@
+"""
+JSON renderers and parser of the API
+
+If orjson is installed, JSON is encoded and decoded by it, otherwise by standard 'json' module as DRF does.
+Either way output is compact UTF-8, datetimes and other non-JSON types are converted by DRF's encoder,
+U+2028 and U+2029 are escaped. Output of orjson differs from DRF's one in floats only:
+- exponent is written without '+' and leading zeros (1e16, not 1e+16), value is the same;
+- NaN and infinities are rendered as null, while DRF fails on them (STRICT_JSON).
+Data which orjson can't encode (e.g. integers which don't fit into 64 bits) is rendered by DRF.
+Indented output (e.g. 'Accept: application/json; indent=4') is left to DRF.
+
+NDJSON renderer writes collection as one JSON document per line, so client can process items as they arrive
+instead of waiting for the closing bracket of the array:
+
+GET /api/lectures
+Accept: application/x-ndjson
+
+Listings of API viewsets are streamed line by line (see 'BaseModelViewSet.finalize_response'), as gradebook export is.
+"""
+from typing import Iterable, Iterator
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+#  Datetimes are left to DRF's encoder (orjson formats them differently), keys of dicts may be non-strings as in 'json'
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+
+def _default(obj):
+    return JSONEncoder().default(obj)
+
+
+def _escape_separators(content: bytes) -> bytes:
+    #  Line and paragraph separators are valid in JSON strings, but not in JavaScript ones
+    return content.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON renderer which uses orjson if it's installed
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            return _escape_separators(orjson.dumps(data, default=_default, option=ORJSON_OPTIONS))
+        except orjson.JSONEncodeError:
+            #  E.g. integers which don't fit into 64 bits
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class NDJSONRenderer(FastJSONRenderer):
+    """
+    Renders collection as newline delimited JSON, one item per line. Anything else is rendered as single line
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return b''.join(self.render_lines(data if isinstance(data, list) else [data]))
+
+    def render_lines(self, items: Iterable) -> Iterator[bytes]:
+        """
+        Lines of collection, each is rendered when it's requested
+        """
+        for item in items:
+            #  Neither media type nor context is passed on, so items are never indented
+            yield super().render(item) + b'\n'
+
+
+class FastJSONParser(JSONParser):
+    """
+    JSON parser which uses orjson if it's installed
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
@@ -0,0 +1,185 @@
+"""
+Full-text search of hometasks, finished tasks and comments
+
+Search is done by backend set in API_SEARCH_BACKEND setting:
+
+- FTS5Backend searches SQLite FTS5 index 'api_search' (see migration 0009_search_index). Index is updated
+by triggers on every insert, update and delete, and results are ranked by BM25;
+- ScanBackend scans tables with 'icontains' lookups, for databases without FTS5. Newest objects come first.
+
+Results are visible to user the same way objects are visible through their endpoints: lecturers find
+everything in their courses, students find hometasks of their courses, their own finished tasks and
+comments to them.
+
+Triggers are defined here, as SQLite schema editor remakes altered tables and triggers referring to them don't
+survive that. So every migration which adds, alters or removes fields of indexed tables (hometask, finished task,
+comment) must run 'drop_triggers' before its operations and 'create_triggers' after them:
+
+    migrations.RunPython(search.drop_triggers, search.create_triggers),
+    migrations.AddField(model_name='hometask', ...),
+    migrations.RunPython(search.create_triggers, search.drop_triggers),
+
+Tests check that all triggers exist once migrations are applied.
+"""
+import re
+from typing import List, NamedTuple, Optional
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Q
+from django.utils.module_loading import import_string
+from api import models
+
+#  Index of kind is stored in row id of index: rowid = id * 4 + kind
+KINDS = {'hometask': 1, 'finished_task': 2, 'comment': 3}
+#  Table of FTS5 index
+TABLE = 'api_search'
+#  kind, table, text column, owner expression, columns whose update must be reflected in index
+SOURCES = [
+    (KINDS['hometask'], 'api_hometask', 'task', 'NULL', 'task, course_id'),
+    (KINDS['finished_task'], 'api_finishedtask', 'answer', 'new.user_id', 'answer, course_id, user_id'),
+    (KINDS['comment'], 'api_comment', 'comment',
+     '(SELECT user_id FROM api_finishedtask WHERE id = new.finished_task_id)', 'comment, course_id, finished_task_id'),
+]
+#  Names of triggers which keep index in sync
+TRIGGERS = [f'{table}_search_{event}' for _, table, *_ in SOURCES
+            for event in ('insert', 'update', 'delete')] + ['api_finishedtask_search_owner']
+#  Search terms are words of query, the rest is ignored. All terms must be found
+MAX_TERMS = 10
+#  Words of context around found terms
+SNIPPET_WORDS = 16
+
+
+class Hit(NamedTuple):
+    kind: str
+    id: int
+    course: int
+    snippet: str
+    score: float
+
+
+def terms(query: str) -> List[str]:
+    return re.findall(r'\w+', query)[:MAX_TERMS]
+
+
+def triggers_sql() -> List[str]:
+    statements = []
+    for kind, table, column, owner, updated in SOURCES:
+        statements += [
+            f'CREATE TRIGGER {table}_search_insert AFTER INSERT ON {table} BEGIN '
+            f'INSERT INTO {TABLE}(rowid, body, course_id, owner_id) '
+            f'VALUES (new.id * 4 + {kind}, new.{column}, new.course_id, {owner}); END',
+            f'CREATE TRIGGER {table}_search_update AFTER UPDATE OF {updated} ON {table} BEGIN '
+            f'UPDATE {TABLE} SET body = new.{column}, course_id = new.course_id, owner_id = {owner} '
+            f'WHERE rowid = new.id * 4 + {kind}; END',
+            f'CREATE TRIGGER {table}_search_delete AFTER DELETE ON {table} BEGIN '
+            f'DELETE FROM {TABLE} WHERE rowid = old.id * 4 + {kind}; END',
+        ]
+    #  Comments are owned by owner of their finished task
+    statements.append(
+        f'CREATE TRIGGER api_finishedtask_search_owner AFTER UPDATE OF user_id ON api_finishedtask BEGIN '
+        f'UPDATE {TABLE} SET owner_id = new.user_id '
+        f'WHERE rowid IN (SELECT id * 4 + 3 FROM api_comment WHERE finished_task_id = new.id); END')
+    return statements
+
+
+def drop_triggers_sql() -> List[str]:
+    return [f'DROP TRIGGER IF EXISTS {trigger}' for trigger in TRIGGERS]
+
+
+def create_triggers(apps, schema_editor):
+    """
+    Create triggers of index, to be run by migration. Other databases are searched without index
+    """
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in triggers_sql():
+            schema_editor.execute(statement)
+
+
+def drop_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in drop_triggers_sql():
+            schema_editor.execute(statement)
+
+
+class SearchBackend:
+    def search(self, user: models.User, query: str, kind: Optional[str], offset: int, limit: int) -> List[Hit]:
+        raise NotImplementedError
+
+
+class FTS5Backend(SearchBackend):
+    TABLE = TABLE
+
+    def search(self, user, query, kind, offset, limit):
+        words = terms(query)
+        if not words:
+            return []
+        #  Quoted terms are matched as they are, operators of FTS5 query syntax can't be injected
+        match = ' '.join(f'"{word}"' for word in words)
+        memberships = f'SELECT course_id FROM {models.Membership._meta.db_table} WHERE user_id = %s'
+        if user.is_student:
+            visible = (f'((rowid %% 4 = {KINDS["hometask"]} AND course_id IN ({memberships})) '
+                       f'OR (rowid %% 4 != {KINDS["hometask"]} AND owner_id = %s))')
+            params = [match, user.pk, user.pk]
+        else:
+            visible = f'course_id IN ({memberships})'
+            params = [match, user.pk]
+        if kind is not None:
+            visible += f' AND rowid %% 4 = {KINDS[kind]}'
+        sql = (f"SELECT rowid, course_id, snippet({self.TABLE}, 0, '', '', '…', {SNIPPET_WORDS}), rank "
+               f"FROM {self.TABLE} WHERE {self.TABLE} MATCH %s AND {visible} ORDER BY rank LIMIT %s OFFSET %s")
+        kinds = {code: name for name, code in KINDS.items()}
+        with connections[router.db_for_read(models.Hometask)].cursor() as cursor:
+            cursor.execute(sql, params + [limit, offset])
+            #  BM25 rank is negative, the better the match the lower it is
+            return [Hit(kinds[rowid % 4], rowid // 4, course_id, snippet, -rank)
+                    for rowid, course_id, snippet, rank in cursor.fetchall()]
+
+
+class ScanBackend(SearchBackend):
+    #  kind -> (model, text field)
+    SOURCES = {
+        'hometask': (models.Hometask, 'task'),
+        'finished_task': (models.FinishedTask, 'answer'),
+        'comment': (models.Comment, 'comment'),
+    }
+
+    def search(self, user, query, kind, offset, limit):
+        words = terms(query)
+        if not words:
+            return []
+        hits = []
+        for name, (model, field) in self.SOURCES.items():
+            if kind is not None and name != kind:
+                continue
+            condition = Q()
+            for word in words:
+                condition &= Q(**{f'{field}__icontains': word})
+            rows = (self.visible(name, user).filter(condition).order_by('-updated_at')
+                    .values_list('pk', 'course_id', field, 'updated_at')[:offset + limit])
+            hits += [(updated_at, Hit(name, pk, course_id, self.snippet(text, words), 0.0))
+                     for pk, course_id, text, updated_at in rows]
+        hits.sort(key=lambda hit: hit[0], reverse=True)
+        return [hit for _, hit in hits[offset:offset + limit]]
+
+    @staticmethod
+    def visible(kind: str, user: models.User):
+        available = Q(course_id__in=user.available_course_ids)
+        if kind == 'hometask':
+            return models.Hometask.objects.filter(available)
+        if kind == 'finished_task':
+            return user.finished.all() if user.is_student else models.FinishedTask.objects.filter(available)
+        return (models.Comment.objects.filter(finished_task__user=user) if user.is_student
+                else models.Comment.objects.filter(available))
+
+    @staticmethod
+    def snippet(text: str, words: List[str]) -> str:
+        text_words = text.split()
+        lowered = [word.lower() for word in text_words]
+        first = next((i for i, word in enumerate(lowered) if any(term.lower() in word for term in words)), 0)
+        start = max(first - SNIPPET_WORDS // 2, 0)
+        snippet = ' '.join(text_words[start:start + SNIPPET_WORDS])
+        return ('…' if start > 0 else '') + snippet + ('…' if start + SNIPPET_WORDS < len(text_words) else '')
+
+
+def get_backend() -> SearchBackend:
+    return import_string(getattr(settings, 'API_SEARCH_BACKEND', 'api.utils.search.FTS5Backend'))()
@@ -0,0 +1,63 @@
+"""
+Sparse fieldsets
+
+Client which needs only some fields of objects lists them in query string:
+
+GET /api/courses?fields=id,title
+GET /api/finished_tasks?fields=id,result
+
+Serializers drop the other fields (see 'serializers.SparseFieldsSerializer') and querysets are restricted
+by '.only()', so columns which aren't requested (e.g. large texts of answers) aren't read at all.
+Only reads of objects and listings are restricted, writes always take and return all fields.
+
+Fields listed in serializer's 'Meta.optional_fields' (e.g. counters of children) are returned only when
+they are requested.
+"""
+from typing import Optional, Tuple
+from django.db.models import QuerySet
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import ALL_FIELDS
+
+#  Query parameter with comma separated names of fields
+QUERY_PARAM = 'fields'
+
+
+def available_fields(serializer_class) -> dict:
+    """
+    Fields of serializer which can be requested, optional ones included
+    """
+    return serializer_class(context={QUERY_PARAM: ALL_FIELDS}).fields
+
+
+def optional_fields(serializer_class) -> Tuple[str, ...]:
+    return tuple(getattr(getattr(serializer_class, 'Meta', None), 'optional_fields', ()))
+
+
+def parse(value: Optional[str], serializer_class) -> Optional[Tuple[str, ...]]:
+    """
+    Names of requested fields, None if default fields are requested
+    """
+    if not value:
+        return None
+    fields = tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    available = available_fields(serializer_class)
+    unknown = [name for name in fields if name not in available or available[name].write_only]
+    if unknown:
+        raise ValidationError({QUERY_PARAM: f'Unknown fields: {", ".join(unknown)}. '
+                                            f'Available: {", ".join(available)}'})
+    return fields or None
+
+
+def project(queryset: QuerySet, serializer_class, fields: Optional[Tuple[str, ...]]) -> QuerySet:
+    """
+    Queryset which loads only columns of given fields (and primary key)
+    """
+    if fields is None:
+        return queryset
+    available = available_fields(serializer_class)
+    sources = [available[name].source for name in fields]
+    columns = {field.name for field in queryset.model._meta.concrete_fields}
+    if any(source not in columns for source in sources):
+        #  Field is built from several columns, from related object or by method
+        return queryset
+    return queryset.only('pk', *sources)
@@ -0,0 +1,115 @@
+"""
+Content-addressed storage of lecture presentations
+
+File is hashed (SHA-256) while it's streamed to temporary file next to the blobs, then stored under its digest:
+
+presentations/<first two hex digits>/<digest><extension>
+
+If such blob already exists, the new copy is dropped, so identical decks uploaded to many courses take disk
+space once. Lectures referring to a blob are counted in PresentationBlob rows (see 'retain' and 'release',
+called by Lecture signals). When the last reference is released, blob is deleted after transaction commit,
+deleting file through the storage doesn't touch blobs which are still referred to. Saving and collecting blob
+lock its row, so lecture referring to a new presentation is saved in one transaction with the file.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+#  Size of blocks in which files are read for hashing
+BLOCK_SIZE = 64 * 1024
+
+
+class _HashedFile(File):
+    """
+    Temporary file which has been hashed already. Storage moves it instead of copying
+    """
+    def temporary_file_path(self):
+        return self.name
+
+
+def _blobs():
+    #  Models module refers to the storage, so model is looked up lazily
+    return apps.get_model('api', 'PresentationBlob').objects
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    def _save(self, name, content):
+        directory, extension = posixpath.dirname(name), os.path.splitext(name)[1].lower()
+        if hasattr(content, 'temporary_file_path'):
+            #  File is on disk already, it's only read once more to hash it
+            path = content.temporary_file_path()
+            digest = hashlib.sha256()
+            with open(path, 'rb') as file:
+                for block in iter(lambda: file.read(BLOCK_SIZE), b''):
+                    digest.update(block)
+        else:
+            path, digest = self._stream_to_temporary_file(directory, content)
+        name = posixpath.join(directory, digest.hexdigest()[:2], digest.hexdigest() + extension)
+        #  Row of the blob is locked against 'collect' till the end of transaction, which should retain the blob too
+        with transaction.atomic(savepoint=False):
+            self._lock(name)
+            if self.exists(name):
+                os.remove(path)
+                return name
+            #  Blob which is new or has been collected meanwhile is written
+            return super()._save(name, _HashedFile(None, name=path))
+
+    def _stream_to_temporary_file(self, directory, content):
+        location = self.path(directory)
+        os.makedirs(location, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, path = tempfile.mkstemp(dir=location, suffix='.part')
+        with os.fdopen(fd, 'wb') as file:
+            for chunk in content.chunks():
+                chunk = chunk.encode() if isinstance(chunk, str) else chunk
+                digest.update(chunk)
+                file.write(chunk)
+        return path, digest
+
+    def delete(self, name):
+        if not _blobs().filter(name=name, references__gt=0).exists():
+            super().delete(name)
+
+    def _lock(self, name):
+        """
+        Lock row of the blob, it's created if there is none (rows created concurrently are kept)
+        """
+        _blobs().bulk_create([_blobs().model(name=name, references=0)], ignore_conflicts=True)
+        _blobs().select_for_update().get(name=name)
+
+    def retain(self, name):
+        """
+        Count one more lecture referring to the blob
+        """
+        _blobs().bulk_create([_blobs().model(name=name, references=0)], ignore_conflicts=True)
+        _blobs().filter(name=name).update(references=F('references') + 1)
+
+    def release(self, name):
+        """
+        Count one lecture less referring to the blob. Unreferenced blob is deleted after commit
+        """
+        _blobs().filter(name=name, references__gt=0).update(references=F('references') - 1)
+        transaction.on_commit(lambda: self.collect(name))
+
+    def collect(self, name):
+        """
+        Delete unreferenced blob. References are checked and file is deleted under lock of the row,
+        so blob being saved once more at the same time is either kept or written anew (see '_save')
+        """
+        with transaction.atomic():
+            blob = _blobs().select_for_update().filter(name=name, references=0).first()
+            if blob is not None:
+                blob.delete()
+                super().delete(name)
+
+
+presentation_storage = ContentAddressedStorage()
@@ -0,0 +1,36 @@
+"""
+Inspectors for Swagger UI. Kept apart from api_description, because drf_yasg imports them from its settings
+"""
+from drf_yasg import openapi
+from drf_yasg.inspectors import PaginatorInspector, NotHandled, SwaggerAutoSchema
+from . import sparse_fields
+from .pagination import KeysetPagination
+
+
+class LinkHeaderPaginatorInspector(PaginatorInspector):
+    """
+    Keyset pagination keeps response body as a plain list and passes page links in 'Link' header
+    """
+    def get_paginated_response(self, paginator, response_schema):
+        if isinstance(paginator, KeysetPagination):
+            return response_schema
+        return NotHandled
+
+
+class SparseFieldsAutoSchema(SwaggerAutoSchema):
+    """
+    Documents 'fields' query parameter of reads which can be restricted to some fields (see 'sparse_fields')
+    """
+    def get_query_parameters(self):
+        parameters = super().get_query_parameters()
+        get_read_serializer_class = getattr(self.view, 'get_read_serializer_class', None)
+        serializer_class = get_read_serializer_class() if get_read_serializer_class and self.method == 'GET' else None
+        if serializer_class is not None:
+            description = ('Comma separated fields to return, of: '
+                           f'{", ".join(sparse_fields.available_fields(serializer_class))}')
+            optional = sparse_fields.optional_fields(serializer_class)
+            if optional:
+                description += f'. Returned only if requested: {", ".join(optional)}'
+            parameters.append(openapi.Parameter(
+                sparse_fields.QUERY_PARAM, openapi.IN_QUERY, type=openapi.TYPE_STRING, description=description))
+        return parameters
@@ -0,0 +1,157 @@
+"""
+Chunked, resumable uploads of lecture presentations
+
+Upload is started with declared file size and empty temporary file, which grows as chunks arrive.
+Every chunk is sent as raw request body with 'Content-Range' header (bytes <first>-<last>/<size>)
+and is copied from request stream to temporary file of its own, so neither chunk nor file is kept in memory.
+Chunk must start at the current offset of the upload. Chunk moves the offset by conditional update and is
+appended to temporary file of the upload in the same transaction, so of concurrent requests sending the same
+range only one writes to the file, and the next chunk is accepted only after the previous one is written.
+After connection failure client asks for the offset and resends the rest from there.
+
+When the last chunk arrives, file is checksummed (SHA-256) and moved into storage (rename on the same
+file system), then lecture is pointed to it in one transaction.
+
+User may have at most PRESENTATION_UPLOAD_MAX_OPEN unfinished uploads. Uploads which have got no chunks for
+PRESENTATION_UPLOAD_EXPIRY seconds are discarded when uploads are started and by 'purge_uploads' command.
+"""
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from datetime import timedelta
+from typing import IO, Optional, Tuple
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+from api import models
+
+#  Size of blocks in which request stream is copied and file is checksummed
+BLOCK_SIZE = 64 * 1024
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class UploadError(Exception):
+    pass
+
+
+class _PartFile(File):
+    """
+    Completed temporary file. Storage moves it instead of copying
+    """
+    def temporary_file_path(self):
+        return self.name
+
+
+def temp_dir() -> str:
+    return getattr(settings, 'FILE_UPLOAD_TEMP_DIR', None) or tempfile.gettempdir()
+
+
+def temp_path(upload: models.PresentationUpload) -> str:
+    return os.path.join(temp_dir(), f'presentation-upload-{upload.pk}.part')
+
+
+def allocate(upload: models.PresentationUpload):
+    """
+    Create empty temporary file of upload. Disk space is taken by chunks, not by declared size
+    """
+    open(temp_path(upload), 'wb').close()
+
+
+def expired() -> QuerySet:
+    """
+    Uploads which have got no chunks for PRESENTATION_UPLOAD_EXPIRY seconds
+    """
+    idle = timedelta(seconds=getattr(settings, 'PRESENTATION_UPLOAD_EXPIRY', 24 * 60 * 60))
+    return models.PresentationUpload.objects.filter(updated_at__lt=timezone.now() - idle)
+
+
+def purge_expired() -> int:
+    """
+    Discard expired uploads along with their temporary files (see signals). Returns number of discarded uploads
+    """
+    return expired().delete()[1].get(models.PresentationUpload._meta.label, 0)
+
+
+def check_open(user: models.User):
+    """
+    Raise UploadError if user can't start one more upload
+    """
+    max_open = getattr(settings, 'PRESENTATION_UPLOAD_MAX_OPEN', 5)
+    if models.PresentationUpload.objects.filter(user=user).count() >= max_open:
+        raise UploadError(f'At most {max_open} unfinished uploads are allowed, finish or cancel some of them')
+
+
+def discard(upload: models.PresentationUpload):
+    try:
+        os.remove(temp_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+def parse_content_range(header: Optional[str], size: int) -> Tuple[int, int]:
+    """
+    First byte and length of the chunk
+    """
+    match = CONTENT_RANGE.match(header or '')
+    if match is None:
+        raise UploadError("'Content-Range' header must look like 'bytes <first>-<last>/<size>'")
+    first, last, total = map(int, match.groups())
+    if total != size or first > last or last >= size:
+        raise UploadError(f'Range {first}-{last} does not fit file of {size} bytes')
+    return first, last - first + 1
+
+
+def receive_chunk(stream, length: int) -> Tuple[IO, int]:
+    """
+    Copy chunk from stream to temporary file of its own, which is removed when closed. Returns the file
+    and number of bytes received, which is less than length if stream ended early
+    """
+    chunk = tempfile.TemporaryFile(dir=temp_dir())
+    received = 0
+    #  Request may have no body
+    while stream is not None and received < length:
+        block = stream.read(min(BLOCK_SIZE, length - received))
+        if not block:
+            break
+        chunk.write(block)
+        received += len(block)
+    chunk.seek(0)
+    return chunk, received
+
+
+def append_chunk(upload: models.PresentationUpload, chunk: IO, first: int):
+    """
+    Write received chunk to its offset in temporary file of upload. Offset must have been claimed by the chunk
+    """
+    with open(temp_path(upload), 'r+b') as file:
+        file.seek(first)
+        shutil.copyfileobj(chunk, file, BLOCK_SIZE)
+
+
+def checksum(upload: models.PresentationUpload) -> str:
+    digest = hashlib.sha256()
+    with open(temp_path(upload), 'rb') as file:
+        for block in iter(lambda: file.read(BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def attach(upload: models.PresentationUpload) -> models.Lecture:
+    """
+    Check completed upload and make it presentation of the lecture
+    """
+    if upload.checksum and checksum(upload) != upload.checksum.lower():
+        upload.delete()
+        raise UploadError('Checksum of uploaded file does not match, upload is discarded')
+    with transaction.atomic():
+        lecture = models.Lecture.objects.select_for_update().get(pk=upload.lecture_id)
+        with _PartFile(open(temp_path(upload), 'rb'), name=temp_path(upload)) as file:
+            lecture.presentation.save(upload.filename, file, save=False)
+        lecture.presentation_name = upload.filename
+        lecture.save(update_fields=['presentation', 'presentation_name', 'updated_at'])
+        upload.delete()
+    return lecture
@@ -5,10 +5,18 @@ from rest_framework import status, mixins
 from rest_framework.viewsets import GenericViewSet
 from rest_framework.generics import CreateAPIView
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.utils.urls import replace_query_param
+from django.db import connection, transaction
+from django.db.models import Q
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from . import serializers, models
-from .utils import api_description, base_viewsets, permissions
+from .utils import (api_description, base_viewsets, permissions, authentication, export, cache, uploads, downloads,
+                    renderers, search, counters, grading_queue, analytics, course_import)
 
 
 @api_description.courses_api_description(models.Course)
@@ -49,9 +57,97 @@ class CourseViewSet(base_viewsets.ParentModelViewSet, mixins.CreateModelMixin):
             models.Membership.objects.filter(user=user, course=course).delete()
             return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(methods=['POST', 'DELETE'], detail=True, url_path='users/bulk',
+            permission_classes=[permissions.MoveUserPermission])
+    def move_users(self, *args, **kwargs):
+        """
+        Add several users to course or remove them from course. Reports outcome for every user
+        """
+        course = get_object_or_404(self.get_queryset(), pk=self.kwargs[self.lookup_field])
+        serializer = serializers.BulkMembershipSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        identifiers = serializer.validated_data['users']
+        users = models.User.objects.filter(
+            Q(pk__in=[i for i in identifiers if isinstance(i, int)]) |
+            Q(username__in=[i for i in identifiers if isinstance(i, str)]))
+        users_by_identifier = {identifier: user for user in users for identifier in (user.pk, user.username)}
+        members = set(models.Membership.objects.filter(course=course, user__in=users_by_identifier.values())
+                      .values_list('user_id', flat=True))
+        adding = self.request.method == 'POST'
+        checks = self.get_permissions()
+        outcomes, affected = [], {}
+        for identifier in identifiers:
+            user = users_by_identifier.get(identifier)
+            if user is None:
+                outcome = 'not_found'
+            elif not all(check.has_object_permission(self.request, self, user) for check in checks):
+                outcome = 'forbidden'
+            elif (user.pk in members) == adding:
+                outcome = 'already_member' if adding else 'not_member'
+            else:
+                outcome = 'added' if adding else 'removed'
+                affected[user.pk] = user
+                members.symmetric_difference_update({user.pk})
+            outcomes.append({'user': identifier, 'outcome': outcome})
+        with transaction.atomic():
+            if adding:
+                models.Membership.objects.bulk_create(
+                    [models.Membership(user=user, course=course) for user in affected.values()],
+                    ignore_conflicts=True)
+                #  bulk_create doesn't send signals which drop cached membership sets
+                for user_id in affected:
+                    cache.invalidate_user(user_id)
+            else:
+                models.Membership.objects.filter(course=course, user__in=affected).delete()
+        return Response(outcomes, status=status.HTTP_200_OK)
+
+    @action(methods=['GET'], detail=True, permission_classes=[permissions.IsLecturer])
+    def gradebook(self, *args, **kwargs):
+        """
+        Stream results of all finished tasks of the course as CSV or NDJSON
+        """
+        course = get_object_or_404(self.get_queryset(), pk=self.kwargs[self.lookup_field])
+        output = self.request.query_params.get('output', 'csv')
+        if output not in export.OUTPUTS:
+            raise ValidationError({'output': f'Must be one of: {", ".join(export.OUTPUTS)}'})
+        content_type, extension, stream = export.OUTPUTS[output]
+        rows = stream(list(export.GRADEBOOK_COLUMNS), export.gradebook_rows(course))
+        response = StreamingHttpResponse(rows, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="course-{course.pk}-gradebook.{extension}"'
+        return response
+
+    @action(methods=['GET'], detail=True, url_path='analytics', url_name='analytics',
+            permission_classes=[permissions.IsLecturer])
+    def statistics(self, *args, **kwargs):
+        """
+        Submission rates and statistics of results of the course, its hometasks and students
+        """
+        course = get_object_or_404(self.get_queryset(), pk=self.kwargs[self.lookup_field])
+        return Response(analytics.course_statistics(course), status=status.HTTP_200_OK)
+
+    @action(methods=['POST'], detail=False, url_path='import', url_name='import',
+            permission_classes=[permissions.IsLecturer])
+    def import_tree(self, *args, **kwargs):
+        """
+        Create course with its lectures and hometasks at once
+        """
+        serializer = serializers.CourseImportSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        tree = course_import.import_course(self.request.user, serializer.validated_data)
+        return Response(serializers.CourseImportSerializer(tree).data, status=status.HTTP_201_CREATED)
+
     def get_queryset(self):
         return self.request.user.available_courses.all()
 
+    def get_cache_key(self):
+        query = self.request.query_params.urlencode()
+        if self.action == 'list':
+            return 'courses:' + cache.courses_key(self.request.user.pk, query)
+        course_id = cache.parse_id(self.kwargs.get(self.lookup_field))
+        if course_id in cache.user_course_ids(self.request.user.pk):
+            return 'lectures:' + cache.course_key(course_id, query)
+        return None
+
     def perform_create(self, serializer):
         course = serializer.save()
         models.Membership.objects.create(user=self.request.user, course=course)
@@ -71,9 +167,98 @@ class LectureViewSet(base_viewsets.ParentModelViewSet):
     serializer_class = serializers.LectureSerializer
     permission_classes = [permissions.IsLecturerOrStudentSafe]
 
+    @action(methods=['POST'], detail=True, url_path='presentation/uploads')
+    def start_upload(self, *args, **kwargs):
+        """
+        Start resumable upload of lecture's presentation
+        """
+        lecture = self.get_object()
+        serializer = serializers.PresentationUploadSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        uploads.purge_expired()
+        try:
+            uploads.check_open(self.request.user)
+        except uploads.UploadError as error:
+            raise ValidationError(str(error))
+        upload = serializer.save(lecture=lecture, user=self.request.user)
+        uploads.allocate(upload)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(methods=['GET', 'PUT', 'DELETE'], detail=True, url_path=r'presentation/uploads/(?P<upload_pk>[0-9]+)')
+    def upload_chunk(self, *args, **kwargs):
+        """
+        Get offset of the upload, send next chunk of it or cancel it.
+        Presentation is attached to lecture when the last chunk arrives
+        """
+        lecture = self.get_object()
+        upload = get_object_or_404(lecture.presentation_uploads, pk=self.kwargs['upload_pk'], user=self.request.user)
+        if self.request.method == 'GET':
+            return Response(serializers.PresentationUploadSerializer(upload).data, status=status.HTTP_200_OK)
+        if self.request.method == 'DELETE':
+            upload.delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        try:
+            first, length = uploads.parse_content_range(self.request.META.get('HTTP_CONTENT_RANGE'), upload.size)
+        except uploads.UploadError as error:
+            raise ValidationError({'Content-Range': str(error)})
+        if first != upload.offset:
+            return self.upload_conflict(upload)
+        chunk, received = uploads.receive_chunk(self.request.stream, length)
+        with chunk:
+            if received < length:
+                raise ValidationError(f'Chunk is incomplete: {received} of {length} bytes received')
+            #  Offset is moved only if no other chunk was accepted meanwhile, and is held till the chunk is written
+            with transaction.atomic():
+                claimed = models.PresentationUpload.objects.filter(pk=upload.pk, offset=first).update(
+                    offset=first + length, updated_at=timezone.now())
+                if claimed:
+                    uploads.append_chunk(upload, chunk, first)
+        if not claimed:
+            upload.refresh_from_db(fields=['offset'])
+            return self.upload_conflict(upload)
+        upload.offset = first + length
+        if upload.offset < upload.size:
+            return Response(serializers.PresentationUploadSerializer(upload).data, status=status.HTTP_200_OK)
+        try:
+            lecture = uploads.attach(upload)
+        except uploads.UploadError as error:
+            raise ValidationError(str(error))
+        return Response(self.get_serializer(lecture).data, status=status.HTTP_201_CREATED)
+
+    @action(methods=['GET'], detail=True, renderer_classes=[renderers.FastJSONRenderer, downloads.DownloadRenderer])
+    def presentation(self, *args, **kwargs):
+        """
+        Download presentation of the lecture. Supports Range and conditional requests
+        """
+        lecture = self.get_object()
+        try:
+            if lecture.presentation:
+                return downloads.serve(self.request, lecture.presentation, lecture.presentation_name)
+        except FileNotFoundError:
+            pass
+        raise NotFound('Lecture has no presentation')
+
+    @staticmethod
+    def upload_conflict(upload):
+        return Response({'detail': f'Chunk must start at offset {upload.offset}', 'offset': upload.offset},
+                        status=status.HTTP_409_CONFLICT)
+
+    def perform_update(self, serializer):
+        #  Blob of new presentation stays locked till it's retained by lecture (see 'utils.storage')
+        with transaction.atomic(savepoint=False):
+            serializer.save()
+
     def get_queryset(self):
-        courses = self.request.user.available_courses.all()
-        return models.Lecture.objects.filter(course__in=courses)
+        return models.Lecture.objects.filter(course_id__in=self.request.user.available_course_ids)
+
+    def get_cache_key(self):
+        if self.action != self.CHILD_ACTION_NAME:
+            return None
+        lecture_id = cache.parse_id(self.kwargs.get(self.lookup_field))
+        course_id = cache.lecture_course_id(lecture_id) if lecture_id is not None else None
+        if course_id in cache.user_course_ids(self.request.user.pk):
+            return 'hometasks:' + cache.course_key(course_id, lecture_id, self.request.query_params.urlencode())
+        return None
 
 
 @api_description.hometasks_api_description(models.Hometask)
@@ -95,9 +280,36 @@ class HometaskViewSet(base_viewsets.ParentModelViewSet):
         self.request.data.update({'user': self.request.user.pk})
         return super().process_child()
 
+    @action(methods=['POST'], detail=False, url_path='finished_tasks',
+            permission_classes=[permissions.FinishedTasksAccess])
+    def submit(self, *args, **kwargs):
+        """
+        Create several finished tasks at once
+        """
+        serializer = serializers.FinishedTaskSubmissionSerializer(data=self.request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        submissions = serializer.validated_data
+        courses = dict(self.get_queryset().filter(pk__in={submission['task'] for submission in submissions})
+                       .values_list('pk', 'course_id'))
+        missing = sorted({submission['task'] for submission in submissions} - courses.keys())
+        if missing:
+            raise NotFound(f'Could not find available hometasks: {missing}')
+        finished_tasks = [models.FinishedTask(task_id=submission['task'], course_id=courses[submission['task']],
+                                              user=self.request.user, answer=submission['answer'])
+                          for submission in submissions]
+        with transaction.atomic():
+            finished_tasks = models.FinishedTask.objects.bulk_create(finished_tasks)
+            #  bulk_create doesn't send signals which count new children and record them in analytics
+            counters.count_created(finished_tasks)
+            analytics.record(added=[analytics.contribution(finished_task) for finished_task in finished_tasks])
+            if not connection.features.can_return_rows_from_bulk_insert:
+                #  Primary keys are not set by bulk_create, rows are read back in order of insertion
+                finished_tasks = self.request.user.finished.order_by('-pk')[:len(finished_tasks)][::-1]
+        serializer = serializers.FinishedTaskSerializer(finished_tasks, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
     def get_queryset(self):
-        courses = self.request.user.available_courses.all()
-        return models.Hometask.objects.filter(lecture__course__in=courses)
+        return models.Hometask.objects.filter(course_id__in=self.request.user.available_course_ids)
 
     def get_children(self):
         queryset = super().get_children()
@@ -129,12 +341,80 @@ class FinishedTaskViewSet(base_viewsets.ParentModelViewSet):
         self.serializer_class = serializers.FinishedTaskResultSerializer
         return super().partial_update(request, *args, **kwargs)
 
+    def update(self, request, *args, **kwargs):
+        #  Finished task is loaded after its claim is held, see 'grading_queue.hold'
+        with transaction.atomic():
+            finished_task = self.get_queryset().filter(pk=cache.parse_id(self.kwargs[self.lookup_field]))
+            grading_queue.hold(self.request.user, finished_task)
+            return super().update(request, *args, **kwargs)
+
+    def perform_update(self, serializer):
+        grading_queue.check_claims(self.request.user, [serializer.instance])
+        serializer.save(claimed_by=None, claimed_until=None)
+
+    @action(methods=['PATCH'], detail=False, url_path='results')
+    def grade(self, *args, **kwargs):
+        """
+        Set results of several finished tasks at once
+        """
+        serializer = serializers.FinishedTaskGradeSerializer(data=self.request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        results = {grade['id']: grade['result'] for grade in serializer.validated_data}
+        with transaction.atomic():
+            #  Finished tasks are loaded after their claims are held, see 'grading_queue.hold'
+            grading_queue.hold(self.request.user, self.get_queryset().filter(pk__in=list(results)))
+            finished_tasks = self.get_queryset().select_for_update().in_bulk(list(results))
+            missing = sorted(results.keys() - finished_tasks.keys())
+            if missing:
+                raise NotFound(f'Could not find available finished tasks: {missing}')
+            grading_queue.check_claims(self.request.user, finished_tasks.values())
+            now = timezone.now()
+            for pk, finished_task in finished_tasks.items():
+                finished_task.result, finished_task.updated_at = results[pk], now
+                grading_queue.unclaim(finished_task)
+            #  'updated_at' is not touched by bulk_update itself
+            models.FinishedTask.objects.bulk_update(finished_tasks.values(),
+                                                    ['result', 'updated_at', 'claimed_by', 'claimed_until'])
+            counters.count_graded(finished_tasks.values())
+            analytics.record_changed(finished_tasks.values())
+        serializer = serializers.FinishedTaskResultSerializer(finished_tasks.values(), many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(methods=['GET'], detail=False, url_path='queue', permission_classes=[permissions.IsLecturer],
+            pagination_class=None)
+    def queue(self, *args, **kwargs):
+        """
+        List the oldest ungraded finished tasks which can be claimed, without claiming them
+        """
+        serializer = serializers.GradingClaimSerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        finished_tasks = grading_queue.available(self.request.user, timezone.now())
+        serializer = serializers.GradingQueueSerializer(finished_tasks[:serializer.validated_data['limit']], many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(methods=['POST', 'DELETE'], detail=False, url_path='queue/claim',
+            permission_classes=[permissions.IsLecturer])
+    def claim(self, *args, **kwargs):
+        """
+        Claim the oldest ungraded finished tasks for grading or give claimed ones back
+        """
+        if self.request.method == 'POST':
+            serializer = serializers.GradingClaimSerializer(data=self.request.data)
+            serializer.is_valid(raise_exception=True)
+            finished_tasks = grading_queue.claim(self.request.user, serializer.validated_data['limit'])
+            serializer = serializers.GradingQueueSerializer(finished_tasks, many=True)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        else:
+            serializer = serializers.GradingReleaseSerializer(data=self.request.data)
+            serializer.is_valid(raise_exception=True)
+            released = grading_queue.release(self.request.user, serializer.validated_data.get('ids'))
+            return Response({'released': released}, status=status.HTTP_200_OK)
+
     def get_queryset(self):
         if self.request.user.is_student:
             return self.request.user.finished.all()
         else:
-            courses = self.request.user.available_courses.all()
-            return models.FinishedTask.objects.filter(task__lecture__course__in=courses)
+            return models.FinishedTask.objects.filter(course_id__in=self.request.user.available_course_ids)
 
 
 @api_description.comments_api_description(models.Comment)
@@ -148,17 +428,60 @@ class CommentViewSet(base_viewsets.BaseModelViewSet):
 
     def get_queryset(self):
         if self.request.user.is_student:
-            finished_tasks = self.request.user.finished.all()
-            return models.Comment.objects.filter(finished_task__in=finished_tasks)
+            return models.Comment.objects.filter(finished_task__user=self.request.user)
         else:
-            courses = self.request.user.available_courses.all()
-            return models.Comment.objects.filter(finished_task__task__lecture__course__in=courses)
+            return models.Comment.objects.filter(course_id__in=self.request.user.available_course_ids)
+
+
+@api_description.search_api_description
+class SearchViewSet(GenericViewSet):
+    """
+    Search available hometasks, finished tasks and comments
+    """
+    serializer_class = serializers.SearchHitSerializer
+    permission_classes = [permissions.IsLecturerOrStudent]
+    pagination_class = None
+
+    def list(self, *args, **kwargs):
+        query = serializers.SearchQuerySerializer(data=self.request.query_params)
+        query.is_valid(raise_exception=True)
+        page, page_size = query.validated_data['page'], query.validated_data['page_size']
+        #  One more hit tells whether there is next page
+        hits = search.get_backend().search(self.request.user, query.validated_data['q'],
+                                           query.validated_data.get('kind'), (page - 1) * page_size, page_size + 1)
+        url = self.request.build_absolute_uri()
+        links = [f'<{replace_query_param(url, "page", number)}>; rel="{rel}"'
+                 for number, rel, exists in ((page + 1, 'next', len(hits) > page_size), (page - 1, 'prev', page > 1))
+                 if exists]
+        headers = {'Link': ', '.join(links)} if links else None
+        return Response(self.get_serializer(hits[:page_size], many=True).data, status=status.HTTP_200_OK,
+                        headers=headers)
 
 
 @api_description.users_api_description
 class UserViewSet(CreateAPIView, GenericViewSet):
     """
     Create new user
+    Log in and log out
     """
     authentication_classes = []
-    serializer_class = serializers.UserSerializer
\ No newline at end of file
+    serializer_class = serializers.UserSerializer
+
+    @action(methods=['POST'], detail=False)
+    def login(self, *args, **kwargs):
+        """
+        Check credentials and issue new token
+        """
+        serializer = serializers.LoginSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        token = authentication.issue_token(serializer.validated_data['user'])
+        return Response(serializers.TokenSerializer(token).data, status=status.HTTP_201_CREATED)
+
+    @action(methods=['POST'], detail=False, permission_classes=[IsAuthenticated],
+            authentication_classes=[authentication.CachedTokenAuthentication])
+    def logout(self, *args, **kwargs):
+        """
+        Revoke token used for this request
+        """
+        authentication.revoke_token(self.request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
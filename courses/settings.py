@@ -70,12 +70,80 @@ STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+#  Largest presentation (in bytes) accepted by chunked upload. Temporary file grows in FILE_UPLOAD_TEMP_DIR
+#  (system temporary directory by default) as chunks arrive
+PRESENTATION_UPLOAD_MAX_SIZE = 500 * 1024 * 1024
+#  Seconds upload may stay without new chunks before it's discarded, and how many unfinished uploads user may have
+PRESENTATION_UPLOAD_EXPIRY = 24 * 60 * 60
+PRESENTATION_UPLOAD_MAX_OPEN = 5
+
+#  Header which hands presentation downloads off to web server: 'X-Sendfile' (Apache mod_xsendfile, lighttpd)
+#  or 'X-Accel-Redirect' (nginx). Files are sent by Django if it's None
+PRESENTATION_SENDFILE_HEADER = None
+#  Internal nginx location aliased to MEDIA_ROOT, used with 'X-Accel-Redirect'
+PRESENTATION_ACCEL_REDIRECT_PREFIX = '/protected/'
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'api.utils.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.BasicAuthentication',
-    ]
+    ],
+    #  orjson is used if it's installed, see api/utils/renderers.py
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.utils.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'api.utils.renderers.NDJSONRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.utils.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'api.utils.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
+}
+
+#  How long (in seconds) authenticated token owner is kept in memory. Revoked tokens are marked in API_RESPONSE_CACHE,
+#  which must be shared by workers for logout to take effect in all of them at once
+API_TOKEN_CACHE_TTL = 300
+API_TOKEN_CACHE_SIZE = 10000
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
 }
 
+#  Cache alias for course, lecture and hometask listings, and how long (in seconds) they are kept.
+#  Local memory cache is per process: with several workers use shared backend (e.g. Memcached or Redis),
+#  otherwise writes handled by one worker don't invalidate listings cached by others
+API_RESPONSE_CACHE = 'default'
+API_RESPONSE_CACHE_TIMEOUT = 300
+
+#  Serve cached listings apart from sync views' thread (see api/utils/async_views.py). For ASGI deployments only
+API_ASYNC_READS = False
+
+#  Full-text search backend (see api/utils/search.py). 'api.utils.search.ScanBackend' for databases without FTS5
+API_SEARCH_BACKEND = 'api.utils.search.FTS5Backend'
+
+#  Build listings from '.values()' rows instead of model instances (see api/utils/fast_serializers.py)
+API_FAST_LISTINGS = True
+
+#  Seconds finished task claimed from grading queue stays leased to grader (see api/utils/grading_queue.py)
+API_GRADING_LEASE = 600
+
+#  Maximal number of objects (course, lectures and hometasks) in one imported tree (see api/utils/course_import.py)
+API_IMPORT_MAX_NODES = 10000
+
 SWAGGER_SETTINGS = {
-   'USE_SESSION_AUTH': False
+   'USE_SESSION_AUTH': False,
+   'SECURITY_DEFINITIONS': {
+      'Basic': {'type': 'basic'},
+      'Token': {'type': 'apiKey', 'name': 'Authorization', 'in': 'header'},
+   },
+   'DEFAULT_AUTO_SCHEMA_CLASS': 'api.utils.swagger_inspectors.SparseFieldsAutoSchema',
+   'DEFAULT_PAGINATOR_INSPECTORS': [
+      'api.utils.swagger_inspectors.LinkHeaderPaginatorInspector',
+      'drf_yasg.inspectors.CoreAPICompatInspector',
+   ],
 }
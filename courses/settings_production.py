@@ -0,0 +1,47 @@
+"""
+Production profile: DJANGO_SETTINGS_MODULE=courses.settings_production
+
+SQLite primary runs in WAL mode, so readers don't block the writer, and writers wait for the lock
+instead of failing with 'database is locked'. Connections are kept open between requests (CONN_MAX_AGE),
+Django keeps one connection per worker thread, so it's as much pooling as Django itself has, external
+pooler (e.g. pgbouncer) is needed to share connections between processes.
+
+Read replicas are listed in API_READ_REPLICA_PATHS environment variable (comma separated SQLite files),
+reads of safe API requests are sent to them by 'api.utils.db_router.ReplicaRouter'. Locally replica files
+are refreshed from primary by 'manage.py sync_replicas'.
+"""
+import os
+from .settings import *  # noqa: F401,F403
+
+DEBUG = False
+
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', SECRET_KEY)
+ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', 'localhost').split(',')
+
+#  Seconds to wait for the write lock, and to keep connection open between requests
+SQLITE_TIMEOUT = 20
+CONN_MAX_AGE = 600
+
+#  Enables WAL journal on every new SQLite connection (see api/signals.py)
+API_SQLITE_WAL = True
+
+
+def sqlite_database(path):
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+        'OPTIONS': {'timeout': SQLITE_TIMEOUT},
+    }
+
+
+DATABASES = {
+    'default': sqlite_database(os.environ.get('API_DATABASE_PATH', BASE_DIR / 'db.sqlite3')),
+}
+for number, path in enumerate(filter(None, os.environ.get('API_READ_REPLICA_PATHS', '').split(',')), start=1):
+    DATABASES[f'replica_{number}'] = {**sqlite_database(path), 'TEST': {'MIRROR': 'default'}}
+
+API_READ_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+#  Seconds for which user who has written something reads from primary
+API_REPLICA_PIN_SECONDS = 5
+DATABASE_ROUTERS = ['api.utils.db_router.ReplicaRouter']